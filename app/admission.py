@@ -0,0 +1,130 @@
+import hashlib
+import math
+import time
+from typing import Callable, Dict, Optional
+
+from redis.exceptions import RedisError
+from starlette.responses import JSONResponse
+
+from app.metrics import ADMISSION_REJECTIONS
+from app.repositories.async_rate_limit_repository import AsyncRateLimitRepository
+
+API_KEY_HEADER = b"x-api-key"
+EXEMPT_PATHS = ("/metrics", "/health")
+UNCOUNTED_PATHS = ("/cart/events",)
+LATENCY_SMOOTHING = 0.2
+MAX_BLOCKED_CLIENTS = 10000
+
+
+class AdmissionController:
+    def __init__(
+            self,
+            rate_limit_repo: Optional[AsyncRateLimitRepository] = None,
+            max_in_flight: Optional[int] = None,
+            redis_latency_limit: Optional[float] = None
+    ):
+        self._rate_limit_repo = rate_limit_repo
+        self._max_in_flight = max_in_flight
+        self._redis_latency_limit = redis_latency_limit
+        self._blocked_until: Dict[str, float] = {}
+        self.in_flight = 0
+        self.redis_latency = 0.0
+
+    def reserve(self) -> Optional[JSONResponse]:
+        if self._max_in_flight is not None and self.in_flight >= self._max_in_flight:
+            return rejection("in_flight", 503, "Server is overloaded, retry later.", retry_after=1)
+        self.in_flight += 1
+        return None
+
+    def release(self):
+        self.in_flight -= 1
+
+    async def check_rate(self, client_id: str) -> Optional[JSONResponse]:
+        if self._rate_limit_repo is None:
+            return None
+
+        # A client that Redis has already turned away is refused locally until its tokens refill, so a client that
+        # keeps hammering costs no Redis round trips.
+        now = time.monotonic()
+        blocked_until = self._blocked_until.get(client_id)
+        if blocked_until is not None:
+            if blocked_until > now:
+                return rejection("rate_limit", 429, "Rate limit exceeded.", retry_after=blocked_until - now)
+            del self._blocked_until[client_id]
+
+        try:
+            retry_after = await self._rate_limit_repo.take_token(client_id)
+        except RedisError:
+            # Failing open keeps a Redis hiccup in the limiter from turning away every request.
+            return None
+        finally:
+            elapsed = time.monotonic() - now
+            self.redis_latency += LATENCY_SMOOTHING * (elapsed - self.redis_latency)
+
+        if retry_after > 0:
+            self._block(client_id, now + retry_after)
+            return rejection("rate_limit", 429, "Rate limit exceeded.", retry_after=retry_after)
+        if self._redis_latency_limit is not None and self.redis_latency > self._redis_latency_limit:
+            return rejection("redis_latency", 503, "Server is overloaded, retry later.", retry_after=1)
+        return None
+
+    def _block(self, client_id: str, until: float):
+        if len(self._blocked_until) >= MAX_BLOCKED_CLIENTS:
+            now = time.monotonic()
+            self._blocked_until = {client: at for client, at in self._blocked_until.items() if at > now}
+        self._blocked_until[client_id] = until
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, admission: Callable[[], AdmissionController]):
+        self.app = app
+        self._admission = admission
+        self.admission: Optional[AdmissionController] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        if self.admission is None:
+            # Resolved on the first request, the middleware stack is built before the worker has started.
+            self.admission = self._admission()
+
+        # The slot is taken before the first await, so requests waiting on the rate limiter together cannot all pass
+        # the capacity check, and it is given back before a rejection is sent.
+        counted = not scope["path"].startswith(UNCOUNTED_PATHS)
+        if counted:
+            rejected = self.admission.reserve()
+            if rejected:
+                await rejected(scope, receive, send)
+                return
+
+        try:
+            rejected = await self.admission.check_rate(client_id(scope))
+            if rejected is None:
+                await self.app(scope, receive, send)
+        finally:
+            if counted:
+                self.admission.release()
+
+        if rejected:
+            await rejected(scope, receive, send)
+
+
+def client_id(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == API_KEY_HEADER:
+            # API keys are hashed so the limiter keys never hold a usable credential.
+            return "key:" + hashlib.sha256(value).hexdigest()[:32]
+
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+def rejection(reason: str, status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    ADMISSION_REJECTIONS.labels(reason).inc()
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+    )
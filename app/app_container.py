@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from injector import Injector
+from redis import Redis, RedisError
+from redis import asyncio as aioredis
+
+from app.admission import AdmissionController
+from app.app_module import AppModule
+from app.redis_clients import close_async_client, close_client
+from app.repositories.async_cart_repository import AsyncCartRepository
+from app.repositories.cart_cache import CartInvalidationListener
+from app.repositories.cart_store import CartStore
+from app.services.async_cart_service import AsyncCartService
+from app.services.coalescing_cart_service import CoalescingCartService
+from app.settings import Settings
+
+T = TypeVar("T")
+
+DRAIN_POLL_INTERVAL = 0.05
+UNAVAILABLE_ERRORS = (RedisError, OSError, asyncio.TimeoutError)
+
+
+class AppContainer:
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self._settings = settings
+        self._injector: Optional[Injector] = None
+        self._instances: Dict[type, Any] = {}
+        self._lock = threading.Lock()
+        self.draining = False
+
+    def get(self, interface: Type[T]) -> T:
+        # Nothing is wired until it is first needed, so importing the app opens no connections and every worker
+        # builds its own clients and pools after it has started.
+        instance = self._instances.get(interface)
+        if instance is None:
+            with self._lock:
+                if self._injector is None:
+                    self._injector = Injector([AppModule(self._settings)])
+            instance = self._instances.setdefault(interface, self._injector.get(interface))
+        return instance
+
+    def lazy(self, interface: Type[T]) -> T:
+        return LazyInstance(self, interface)
+
+    async def start(self):
+        self.draining = False
+        try:
+            # Built in a worker thread since cluster clients fetch the slot map and the cache listener subscribes
+            # while they are created.
+            await asyncio.to_thread(self.get, AsyncCartService)
+            self.get(AdmissionController)
+            await self._warm_up()
+        except UNAVAILABLE_ERRORS:
+            # An unreachable Redis must not keep the worker from starting, readiness reports it until it is back
+            # and whatever could not be built is retried on first use.
+            pass
+
+    async def check_ready(self) -> str:
+        if self.draining:
+            return "draining"
+
+        try:
+            timeout = self.get(Settings).readiness_timeout
+            if self.get(Settings).io_mode == "async":
+                ready = await asyncio.wait_for(self.get(AsyncCartRepository).ping(), timeout)
+            else:
+                cart_store = await asyncio.to_thread(self.get, CartStore)
+                ready = await asyncio.wait_for(asyncio.to_thread(cart_store.ping), timeout)
+        except UNAVAILABLE_ERRORS:
+            return "unavailable"
+        return "ready" if ready else "unavailable"
+
+    async def stop(self):
+        self.draining = True
+        if self._injector is None:
+            return
+
+        settings = self.get(Settings)
+        admission = self.get(AdmissionController)
+        deadline = time.monotonic() + settings.shutdown_drain_timeout
+        while admission.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+
+        cart_service = self._instances.get(AsyncCartService)
+        if isinstance(cart_service, CoalescingCartService):
+            await cart_service.close()
+        await self._close()
+
+    async def _warm_up(self):
+        settings = self.get(Settings)
+        connections = min(settings.redis_warm_connections, settings.redis_max_connections)
+        if settings.io_mode == "async":
+            await self.get(AsyncCartRepository).warm_up(connections)
+        else:
+            await asyncio.to_thread(self.get(CartStore).warm_up, connections)
+
+    async def _close(self):
+        settings = self.get(Settings)
+        if settings.storage_backend != "redis":
+            return
+
+        if settings.cache_enabled:
+            await asyncio.to_thread(self.get(CartInvalidationListener).stop)
+        await close_async_client(self.get(aioredis.Redis))
+        if settings.redis_mode == "sharded":
+            await asyncio.to_thread(self.get(CartStore).close)
+        elif settings.io_mode == "sync":
+            await asyncio.to_thread(close_client, self.get(Redis))
+
+
+class LazyInstance:
+    # Stands in for a component at import time and resolves it from the container on first use.
+
+    def __init__(self, container: AppContainer, interface: type):
+        self._container = container
+        self._interface = interface
+
+    def __getattr__(self, name):
+        return getattr(self._container.get(self._interface), name)
+
+
+container = AppContainer()
@@ -1,12 +1,235 @@
-from injector import Module
+from typing import Optional
 
+from injector import Injector, Module, provider, singleton
+from redis import Redis
+from redis import asyncio as aioredis
+
+from app.admission import AdmissionController
+from app.metrics import CART_AGE_COLLECTOR, CART_CACHE_COLLECTOR, configure_metrics
+from app.redis_clients import create_async_redis_client, create_redis_client, create_shard_clients
+from app.repositories.async_caching_cart_repository import AsyncCachingCartRepository
+from app.repositories.async_cart_event_repository import AsyncCartEventRepository
+from app.repositories.async_cart_repository import AsyncCartRepository
+from app.repositories.async_clear_job_repository import AsyncClearJobRepository
+from app.repositories.async_hash_cart_repository import AsyncHashCartRepository
+from app.repositories.async_rate_limit_repository import AsyncRateLimitRepository
+from app.repositories.cart_cache import CartCache, CartInvalidationListener
+from app.repositories.cart_codecs import CART_CODECS, CartCodec
+from app.repositories.cart_event_repository import CartEventRepository
+from app.repositories.caching_cart_repository import CachingCartRepository
 from app.repositories.cart_repository import CartRepository
+from app.repositories.cart_store import CartStore, ClearJobStore
+from app.repositories.clear_job_repository import ClearJobRepository
+from app.repositories.hash_cart_repository import HashCartRepository
+from app.repositories.hash_ring import HashRing
+from app.repositories.memory_cart_repository import MemoryCartRepository, MemoryClearJobRepository
+from app.repositories.sharded_cart_repository import ShardedCartRepository
+from app.repositories.sqlite_cart_repository import SqliteCartRepository, SqliteClearJobRepository, SqliteDatabase
+from app.services.async_cart_service import AsyncCartService, ThreadPoolCartService
 from app.services.cart_service import CartService
-from redis import StrictRedis
+from app.services.coalescing_cart_service import CoalescingCartService
+from app.services.single_flight_cart_service import SingleFlightCartService
+from app.settings import Settings, load_settings
+
+STORAGE_LAYOUTS = {
+    "json": (CartRepository, AsyncCartRepository),
+    "hash": (HashCartRepository, AsyncHashCartRepository)
+}
 
 
 class AppModule(Module):
+    def __init__(self, settings: Optional[Settings] = None):
+        self._settings = settings or load_settings()
+
     def configure(self, binder):
-        redis_client = StrictRedis(host='0.0.0.0', port=6379, db=0, decode_responses=True)
-        binder.bind(CartRepository, to=CartRepository(redis_client))
-        binder.bind(CartService, to=CartService(CartRepository(redis_client)))
+        configure_metrics(self._settings.metrics_sample_rate)
+        binder.bind(Settings, to=self._settings)
+        binder.bind(CartService, scope=singleton)
+
+    @singleton
+    @provider
+    def provide_redis_client(self) -> Redis:
+        return create_redis_client(self._settings)
+
+    @singleton
+    @provider
+    def provide_async_redis_client(self) -> aioredis.Redis:
+        return create_async_redis_client(self._settings)
+
+    @singleton
+    @provider
+    def provide_cart_codec(self) -> CartCodec:
+        return CART_CODECS[self._settings.storage_codec]()
+
+    @singleton
+    @provider
+    def provide_cart_cache(self) -> CartCache:
+        cart_cache = CartCache(max_size=self._settings.cache_max_size, ttl=self._settings.cache_ttl)
+        CART_CACHE_COLLECTOR.track(cart_cache)
+        return cart_cache
+
+    @singleton
+    @provider
+    def provide_cart_invalidation_listener(
+            self,
+            redis_client: Redis,
+            cart_cache: CartCache
+    ) -> CartInvalidationListener:
+        listener = CartInvalidationListener(redis_client, cart_cache, prefixes=[self._settings.key_prefix])
+        listener.start()
+        return listener
+
+    @singleton
+    @provider
+    def provide_cart_repository(self, redis_client: Redis, codec: CartCodec, injector: Injector) -> CartRepository:
+        repository_class, _ = STORAGE_LAYOUTS[self._settings.storage_layout]
+        cart_repo = repository_class(
+            redis_client,
+            codec,
+            ttl=self._settings.cart_ttl,
+            sliding_ttl=self._settings.cart_ttl_sliding,
+            key_prefix=self._settings.key_prefix,
+            events_key=self._settings.events_key if self._settings.events_enabled else None
+        )
+        if self._settings.cache_enabled:
+            injector.get(CartInvalidationListener)
+            return CachingCartRepository(cart_repo, injector.get(CartCache), key_prefix=self._settings.key_prefix)
+        else:
+            return cart_repo
+
+    @singleton
+    @provider
+    def provide_async_cart_repository(
+            self,
+            redis_client: aioredis.Redis,
+            codec: CartCodec,
+            injector: Injector
+    ) -> AsyncCartRepository:
+        _, repository_class = STORAGE_LAYOUTS[self._settings.storage_layout]
+        cart_repo = repository_class(
+            redis_client,
+            codec,
+            ttl=self._settings.cart_ttl,
+            sliding_ttl=self._settings.cart_ttl_sliding,
+            key_prefix=self._settings.key_prefix,
+            events_key=self._settings.events_key if self._settings.events_enabled else None
+        )
+        if self._settings.cache_enabled:
+            injector.get(CartInvalidationListener)
+            return AsyncCachingCartRepository(cart_repo, injector.get(CartCache), key_prefix=self._settings.key_prefix)
+        else:
+            return cart_repo
+
+    @singleton
+    @provider
+    def provide_sqlite_database(self) -> SqliteDatabase:
+        return SqliteDatabase(self._settings.sqlite_path)
+
+    @singleton
+    @provider
+    def provide_cart_store(self, injector: Injector) -> CartStore:
+        if self._settings.storage_backend == "memory":
+            return MemoryCartRepository(
+                shards=self._settings.memory_shards,
+                ttl=self._settings.cart_ttl,
+                sliding_ttl=self._settings.cart_ttl_sliding
+            )
+        elif self._settings.storage_backend == "sqlite":
+            return SqliteCartRepository(
+                injector.get(SqliteDatabase),
+                ttl=self._settings.cart_ttl,
+                sliding_ttl=self._settings.cart_ttl_sliding
+            )
+        elif self._settings.redis_mode == "sharded":
+            return self._sharded_cart_repository(injector.get(CartCodec))
+        else:
+            return injector.get(CartRepository)
+
+    def _sharded_cart_repository(self, codec: CartCodec) -> ShardedCartRepository:
+        repository_class, _ = STORAGE_LAYOUTS[self._settings.storage_layout]
+        shards = {
+            address: repository_class(
+                redis_client,
+                codec,
+                ttl=self._settings.cart_ttl,
+                sliding_ttl=self._settings.cart_ttl_sliding,
+                key_prefix=self._settings.key_prefix
+            )
+            for address, redis_client in create_shard_clients(self._settings).items()
+        }
+        previous_shards = self._settings.redis_previous_shards
+        return ShardedCartRepository(
+            shards,
+            HashRing(self._settings.redis_shards, vnodes=self._settings.redis_shard_vnodes),
+            HashRing(previous_shards, vnodes=self._settings.redis_shard_vnodes) if previous_shards else None,
+            db=self._settings.redis_db,
+            auth=self._settings.redis_password
+        )
+
+    @singleton
+    @provider
+    def provide_clear_job_store(self, injector: Injector) -> ClearJobStore:
+        if self._settings.storage_backend == "memory":
+            return MemoryClearJobRepository()
+        elif self._settings.storage_backend == "sqlite":
+            return SqliteClearJobRepository(injector.get(SqliteDatabase))
+        else:
+            return injector.get(ClearJobRepository)
+
+    @singleton
+    @provider
+    def provide_clear_job_repository(self, redis_client: Redis) -> ClearJobRepository:
+        return ClearJobRepository(redis_client, key_prefix=self._settings.job_key_prefix)
+
+    @singleton
+    @provider
+    def provide_async_clear_job_repository(self, redis_client: aioredis.Redis) -> AsyncClearJobRepository:
+        return AsyncClearJobRepository(redis_client, key_prefix=self._settings.job_key_prefix)
+
+    @singleton
+    @provider
+    def provide_cart_event_repository(self, redis_client: Redis) -> CartEventRepository:
+        return CartEventRepository(redis_client, key=self._settings.events_key)
+
+    @singleton
+    @provider
+    def provide_async_cart_event_repository(self, redis_client: aioredis.Redis) -> AsyncCartEventRepository:
+        return AsyncCartEventRepository(redis_client, key=self._settings.events_key)
+
+    @singleton
+    @provider
+    def provide_admission_controller(self, injector: Injector) -> AdmissionController:
+        rate_limit_repo = None
+        if self._settings.rate_limit_enabled:
+            rate_limit_repo = AsyncRateLimitRepository(
+                injector.get(aioredis.Redis),
+                rate=self._settings.rate_limit_rate,
+                burst=self._settings.rate_limit_burst,
+                key_prefix=self._settings.rate_limit_key_prefix
+            )
+        return AdmissionController(
+            rate_limit_repo,
+            max_in_flight=self._settings.admission_max_in_flight,
+            redis_latency_limit=self._settings.admission_redis_latency
+        )
+
+    @singleton
+    @provider
+    def provide_async_cart_service(self, injector: Injector) -> AsyncCartService:
+        if self._settings.io_mode == "async":
+            cart_service = AsyncCartService(
+                injector.get(AsyncCartRepository),
+                injector.get(AsyncClearJobRepository),
+                injector.get(AsyncCartEventRepository)
+            )
+        else:
+            cart_service = ThreadPoolCartService(injector.get(CartService), injector.get(AsyncCartEventRepository))
+        if self._settings.cart_ttl:
+            # Idle time is read off the remaining TTL, so without one there is nothing to sample.
+            CART_AGE_COLLECTOR.track(cart_service.sample_ages, count=self._settings.metrics_age_sample_size)
+        if self._settings.coalesce_reads:
+            cart_service = SingleFlightCartService(cart_service)
+        if self._settings.add_item_coalesce_delay:
+            return CoalescingCartService(cart_service, max_delay=self._settings.add_item_coalesce_delay)
+        else:
+            return cart_service
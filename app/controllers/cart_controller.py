@@ -1,67 +1,196 @@
-from typing import List
+from typing import Annotated, AsyncIterator, List, Optional, Tuple, Union
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException
-from injector import Injector
+from fastapi import APIRouter, Body, Header, HTTPException, Path, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
-from app.app_module import AppModule
-from app.schemas.models import Item, Cart
-from app.services.cart_service import CartService
+from app.app_container import container
+from app.schemas.models import (
+    Item,
+    Cart,
+    CartBulkResult,
+    CartEventPage,
+    CartOperation,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    ClearJob,
+    ItemQuantity,
+    MAX_QUANTITY
+)
+from app.services.async_cart_service import AsyncCartService
+
+EXPORT_BATCH_SIZE = 500
+EVENT_ID_PATTERN = r"^(\$|\d+(-\d+)?)$"
+EVENT_BATCH_SIZE = 100
+EVENT_STREAM_WAIT = 15.0
 
-injector = Injector([AppModule()])
-cart_service = injector.get(CartService)
+cart_service = container.lazy(AsyncCartService)
 
 router = APIRouter(
     prefix="/cart",
-    tags=["Cart Controller"]
+    tags=["Cart Controller"],
+    default_response_class=ORJSONResponse
 )
 
 
-@router.delete("/clear", tags=["Delete"])
-def clear() -> dict[str, str]:
+@router.delete("/clear", tags=["Delete"], status_code=202)
+async def clear() -> ClearJob:
     try:
-        cart_service.clear_carts()
+        return await cart_service.clear_carts()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    return {"result": "carts cleared"}
+
+@router.get("/clear/{job_id}", tags=["Read"])
+async def get_clear_job(job_id: UUID) -> ClearJob:
+    job = await cart_service.get_clear_job(job_id)
+    if job:
+        return job
+    else:
+        raise HTTPException(status_code=404, detail="Clear job not found.")
 
 
 @router.get("", tags=["Read"])
-def get_all() -> dict[str, List[Cart]]:
-    carts = cart_service.get_carts()
-    return {"carts": carts}
+async def get_all(
+        cursor: int = Query(default=0, ge=0),
+        limit: int = Query(default=100, ge=1, le=1000)
+) -> CartPage:
+    return await cart_service.get_carts(cursor=cursor, limit=limit)
+
+
+@router.get("/export", tags=["Read"])
+async def export_carts() -> StreamingResponse:
+    return StreamingResponse(export_lines(), media_type="application/x-ndjson")
+
+
+@router.get("/events", tags=["Read"], response_model_exclude_none=True)
+async def get_events(
+        after: str = Query(default="0-0", pattern=EVENT_ID_PATTERN),
+        limit: int = Query(default=EVENT_BATCH_SIZE, ge=1, le=1000),
+        wait: float = Query(default=0, ge=0, le=30)
+) -> CartEventPage:
+    return await cart_service.get_events(after=after, limit=limit, wait=wait)
+
+
+@router.get("/events/stream", tags=["Read"])
+async def stream_events(
+        after: str = Query(default="$", pattern=EVENT_ID_PATTERN),
+        last_event_id: Annotated[Optional[str], Header(pattern=EVENT_ID_PATTERN)] = None
+) -> StreamingResponse:
+    return StreamingResponse(
+        event_lines(last_event_id or after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@router.post("/_bulk_get", tags=["Read"])
+async def get_many(
+        cart_ids: Annotated[List[UUID], Body(embed=True, max_length=10000)]
+) -> CartBulkResult:
+    return await cart_service.get_many(cart_ids)
 
 
 @router.get("/{cart_id}", tags=["Read"])
-def get_cart(cart_id: UUID) -> Cart:
-    cart = cart_service.get_cart(cart_id)
-    if cart:
-        return cart
-    else:
+async def get_cart(
+        cart_id: UUID,
+        response: Response,
+        if_none_match: Annotated[Optional[str], Header()] = None
+) -> Cart:
+    cart = await cart_service.get_cart(cart_id)
+    if not cart:
+        raise HTTPException(status_code=404, detail="Cart not found.")
+
+    if none_match(if_none_match, cart):
+        return Response(status_code=304, headers={"ETag": etag(cart)})
+
+    response.headers["ETag"] = etag(cart)
+    return cart
+
+
+@router.get("/{cart_id}/summary", tags=["Read"])
+async def get_summary(
+        cart_id: UUID,
+        response: Response,
+        if_none_match: Annotated[Optional[str], Header()] = None
+) -> CartSummary:
+    summary = await cart_service.get_summary(cart_id)
+    if not summary:
         raise HTTPException(status_code=404, detail="Cart not found.")
 
+    if none_match(if_none_match, summary):
+        return Response(status_code=304, headers={"ETag": etag(summary)})
+
+    response.headers["ETag"] = etag(summary)
+    return summary
+
+
+@router.put("/{cart_id}", tags=["Update"])
+async def replace_items(
+        cart_id: UUID,
+        items: Annotated[List[ItemQuantity], Body(max_length=1000)],
+        response: Response,
+        if_match: Annotated[Optional[str], Header()] = None
+) -> Cart:
+    expected_epoch, expected_version = await if_match_tag(cart_id, if_match)
+    cart = await cart_service.replace_items(
+        cart_id,
+        items,
+        expected_version=expected_version,
+        expected_epoch=expected_epoch
+    )
+    if not cart:
+        if if_match:
+            raise HTTPException(status_code=412, detail="Cart version does not match If-Match.")
+        else:
+            raise HTTPException(status_code=409, detail="Cart was modified concurrently, retry the request.")
+
+    response.headers["ETag"] = etag(cart)
+    return cart
+
 
 @router.post("/{cart_id}/{item_name}/{quantity}", tags=["Create"])
-def add_item(
+async def add_item(
         cart_id: UUID,
         item_name: str,
         quantity: int
 ) -> dict[str, Item]:
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than 0.")
+    if quantity > MAX_QUANTITY:
+        raise HTTPException(status_code=400, detail=f"Quantity must be at most {MAX_QUANTITY}.")
 
-    item = cart_service.add_item(cart_id, item_name, quantity)
+    item = await cart_service.add_item(cart_id, item_name, quantity)
 
     return {"item": item}
 
 
+@router.post("/{cart_id}/batch", tags=["Create"], response_model_exclude_none=True)
+async def apply_operations(
+        cart_id: UUID,
+        operations: Annotated[List[CartOperation], Body(max_length=1000)],
+        if_match: Annotated[Optional[str], Header()] = None
+) -> dict[str, List[CartOperationResult]]:
+    expected_epoch, expected_version = await if_match_tag(cart_id, if_match)
+    results = await cart_service.apply_operations(
+        cart_id,
+        operations,
+        expected_version=expected_version,
+        expected_epoch=expected_epoch
+    )
+    if results is None:
+        raise HTTPException(status_code=412, detail="Cart version does not match If-Match.")
+
+    return {"results": results}
+
+
 @router.get("/{cart_id}/{item_id}", tags=["Read"])
-def get_item(
+async def get_item(
         cart_id: UUID,
         item_id: UUID
 ) -> dict[str, Item]:
-    item = cart_service.get_item(cart_id=cart_id, item_id=item_id)
+    item = await cart_service.get_item(cart_id=cart_id, item_id=item_id)
     if item:
         return {"item": item}
     else:
@@ -69,33 +198,33 @@ def get_item(
 
 
 @router.delete("/{cart_id}", tags=["Delete"])
-def delete_cart(
+async def delete_cart(
         cart_id: UUID,
 ) -> dict[str, str]:
-    if cart_service.delete_cart(cart_id):
+    if await cart_service.delete_cart(cart_id):
         return {"result": "Cart deleted."}
     else:
         raise HTTPException(status_code=404, detail="Cart not found.")
 
 
 @router.delete("/{cart_id}/{item_id}", tags=["Delete"])
-def delete_item(
+async def delete_item(
         cart_id: UUID,
         item_id: UUID
 ) -> dict[str, str]:
-    if cart_service.delete_item(cart_id, item_id):
+    if await cart_service.delete_item(cart_id, item_id):
         return {"result": "Item deleted."}
     else:
         raise HTTPException(status_code=404, detail="Item not found.")
 
 
 @router.delete("/{cart_id}/{item_id}/{quantity}", tags=["Delete"])
-def remove_quantity(
+async def remove_quantity(
         cart_id: UUID,
         item_id: UUID,
-        quantity: int
+        quantity: Annotated[int, Path(gt=0, le=MAX_QUANTITY)]
 ) -> dict[str, str]:
-    items_removed = cart_service.remove_quantity(
+    items_removed = await cart_service.remove_quantity(
         cart_id=cart_id,
         item_id=item_id,
         quantity=quantity
@@ -105,3 +234,68 @@ def remove_quantity(
         return {"result": f"{items_removed} items removed."}
     else:
         raise HTTPException(status_code=404, detail="Item not found.")
+
+
+async def export_lines() -> AsyncIterator[str]:
+    # One SCAN batch is read per chunk and the next one only once the chunk has been sent, so a slow client holds
+    # back the export instead of letting pages pile up in memory.
+    cursor = 0
+    while True:
+        page = await cart_service.get_carts(cursor=cursor, limit=EXPORT_BATCH_SIZE)
+        if page.carts:
+            yield "".join(cart.model_dump_json() + "\n" for cart in page.carts)
+        if page.next_cursor is None:
+            return
+        cursor = page.next_cursor
+
+
+async def event_lines(after: str) -> AsyncIterator[str]:
+    # A comment line is sent whenever a wait ends empty so proxies keep the connection open and a client that went
+    # away is noticed on the next write.
+    while True:
+        page = await cart_service.get_events(after=after, limit=EVENT_BATCH_SIZE, wait=EVENT_STREAM_WAIT)
+        after = page.last_event_id
+        if page.events:
+            yield "".join(
+                f"id: {event.event_id}\ndata: {event.model_dump_json(exclude_none=True)}\n\n" for event in page.events
+            )
+        else:
+            yield ": keep-alive\n\n"
+
+
+def etag(cart: Union[Cart, CartSummary]) -> str:
+    # The epoch a cart was created with is part of its tag, so a cart that was deleted or expired and created again
+    # never matches a tag handed out for the one before it. Carts stored before epochs existed are tagged by version.
+    if cart.epoch:
+        return f'"{cart.epoch}-{cart.version}"'
+    return f'"{cart.version}"'
+
+
+def none_match(if_none_match: Optional[str], cart: Union[Cart, CartSummary]) -> bool:
+    if not if_none_match:
+        return False
+    current = (cart.epoch, cart.version)
+    return any(tag.strip() == "*" or parse_etag(tag) == current for tag in if_none_match.split(","))
+
+
+def parse_etag(tag: str) -> Optional[Tuple[str, int]]:
+    epoch, _, version = tag.strip().removeprefix("W/").strip('"').rpartition("-")
+    return (epoch, int(version)) if version.isdigit() else None
+
+
+async def if_match_tag(cart_id: UUID, if_match: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+    if if_match is None:
+        return None, None
+
+    if if_match.strip() == "*":
+        # Any version of an existing cart matches. Its epoch is still expected, so a cart that is deleted and created
+        # again before the write no longer does.
+        summary = await cart_service.get_summary(cart_id)
+        if summary is None:
+            raise HTTPException(status_code=412, detail="Cart version does not match If-Match.")
+        return summary.epoch, None
+
+    parsed = parse_etag(if_match)
+    if parsed is None:
+        raise HTTPException(status_code=412, detail="Cart version does not match If-Match.")
+    return parsed
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Response
+
+from app.app_container import container
+
+router = APIRouter(prefix="/health", tags=["Health Controller"])
+
+
+@router.get("/live", include_in_schema=False)
+def live() -> dict:
+    return {"status": "alive"}
+
+
+@router.get("/ready", include_in_schema=False)
+async def ready(response: Response) -> dict:
+    status = await container.check_ready()
+    if status != "ready":
+        response.status_code = 503
+    return {"status": status}
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.metrics import CART_AGE_COLLECTOR
+
+router = APIRouter(tags=["Metrics Controller"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    await CART_AGE_COLLECTOR.refresh()
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,12 +1,31 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 import uvicorn
 
+from app.admission import AdmissionController, AdmissionMiddleware
+from app.app_container import container
 from app.controllers.cart_controller import router
+from app.controllers.health_controller import router as health_router
+from app.controllers.metrics_controller import router as metrics_router
+from app.metrics import RequestMetricsMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await container.start()
+    yield
+    await container.stop()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(AdmissionMiddleware, admission=lambda: container.get(AdmissionController))
+app.add_middleware(RequestMetricsMiddleware)
 
 
 app.include_router(router)
+app.include_router(health_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     uvicorn.run(app, host='0.0.0.0', port=8000)
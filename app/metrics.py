@@ -0,0 +1,194 @@
+import inspect
+import random
+import time
+from functools import wraps
+from typing import Awaitable, Callable, Optional, Tuple, Union
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.repositories.cart_cache import CartCache
+from app.schemas.models import CartAgeReport
+
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+REQUEST_DURATION = Histogram(
+    "cart_request_duration_seconds",
+    "Duration of HTTP requests by route template.",
+    ["method", "route", "status"]
+)
+STAGE_DURATION = Histogram(
+    "cart_stage_duration_seconds",
+    "Sampled duration of service, repository and codec calls.",
+    ["layer", "operation"],
+    buckets=STAGE_BUCKETS
+)
+PAYLOAD_SIZE = Histogram(
+    "cart_payload_size",
+    "Sampled length of encoded carts read from and written to Redis.",
+    ["direction"],
+    buckets=PAYLOAD_BUCKETS
+)
+ADMISSION_REJECTIONS = Counter(
+    "cart_admission_rejections",
+    "Requests turned away before reaching a route.",
+    ["reason"]
+)
+READ_LOADS = Counter(
+    "cart_read_loads",
+    "Cart reads that loaded from storage or joined a load of the same cart already in flight.",
+    ["operation", "outcome"]
+)
+
+_sample_rate = 0.1
+
+
+def configure_metrics(sample_rate: float):
+    global _sample_rate
+    _sample_rate = sample_rate
+
+
+def timed(layer: str, operation: Optional[str] = None):
+    def decorator(func):
+        # Resolving the labelled child once keeps the per-call cost to a random draw when the call is not sampled.
+        histogram = STAGE_DURATION.labels(layer, operation or func.__name__)
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if random.random() >= _sample_rate:
+                    return await func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if random.random() >= _sample_rate:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def instrumented(layer: str):
+    def decorator(cls):
+        for name, member in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.isfunction(member):
+                setattr(cls, name, timed(layer, name)(member))
+        return cls
+
+    return decorator
+
+
+def observe_payload(direction: str, payload: Union[str, bytes]):
+    if random.random() < _sample_rate:
+        PAYLOAD_SIZE.labels(direction).observe(len(payload))
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Labelling by the matched route template rather than the path keeps cart ids out of the label values.
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                scope["method"],
+                route.path if route else "unmatched",
+                status
+            ).observe(time.perf_counter() - start)
+
+
+class CartCacheCollector(Collector):
+    def __init__(self):
+        self._cart_cache = None
+
+    def track(self, cart_cache: CartCache):
+        self._cart_cache = cart_cache
+
+    def collect(self):
+        if self._cart_cache is None:
+            return
+
+        stats = self._cart_cache.stats()
+        yield GaugeMetricFamily("cart_cache_size", "Carts held in the in-process cache.", value=stats["size"])
+        for name in ("hits", "misses", "evictions", "invalidations"):
+            yield CounterMetricFamily(f"cart_cache_{name}", f"Cart cache {name}.", value=stats[name])
+
+
+class CartAgeCollector(Collector):
+    def __init__(self):
+        self._sample: Optional[Callable[..., Awaitable[Tuple[int, CartAgeReport]]]] = None
+        self._count = 0
+        self._cursor = 0
+        self._report: Optional[CartAgeReport] = None
+
+    def track(self, sample: Callable[..., Awaitable[Tuple[int, CartAgeReport]]], count: int):
+        self._sample = sample
+        self._count = count
+        self._cursor = 0
+        self._report = None
+
+    async def refresh(self):
+        # Each scrape reads the ages of one batch of carts and the next scrape resumes the scan after it, so a scrape
+        # costs the same however many carts there are and successive scrapes sample the whole keyspace in turn.
+        if self._sample is None:
+            return
+        try:
+            self._cursor, self._report = await self._sample(cursor=self._cursor, count=self._count)
+        except Exception:
+            # The scrape still serves every other metric while the storage backend is unavailable.
+            self._report = None
+
+    def collect(self):
+        if self._report is None:
+            return
+
+        idle = GaugeMetricFamily(
+            "cart_sampled_idle_carts",
+            "Carts of the last sampled batch by idle time, derived from their remaining TTL.",
+            labels=["max_age"]
+        )
+        for bucket in self._report.buckets:
+            idle.add_metric(["+Inf" if bucket.max_age is None else str(bucket.max_age)], bucket.count)
+        yield idle
+        yield GaugeMetricFamily(
+            "cart_sampled_carts_without_expiry",
+            "Carts of the last sampled batch that have no expiry.",
+            value=self._report.without_expiry
+        )
+
+
+CART_CACHE_COLLECTOR = CartCacheCollector()
+REGISTRY.register(CART_CACHE_COLLECTOR)
+CART_AGE_COLLECTOR = CartAgeCollector()
+REGISTRY.register(CART_AGE_COLLECTOR)
@@ -0,0 +1,156 @@
+from typing import Dict, List, Tuple
+
+from redis import BlockingConnectionPool, Redis
+from redis import asyncio as aioredis
+from redis.asyncio.cluster import ClusterNode as AsyncClusterNode, RedisCluster as AsyncRedisCluster
+from redis.asyncio.sentinel import Sentinel as AsyncSentinel
+from redis.cluster import ClusterNode, RedisCluster
+from redis.sentinel import Sentinel
+
+from app.settings import Settings
+
+
+def create_redis_client(settings: Settings) -> Redis:
+    if settings.redis_mode == "cluster":
+        startup_nodes = [ClusterNode(host, port) for host, port in _cluster_addresses(settings)]
+        return RedisCluster(
+            startup_nodes=startup_nodes,
+            max_connections=settings.redis_max_connections,
+            **_connection_kwargs(settings)
+        )
+    elif settings.redis_mode == "sentinel":
+        sentinel = Sentinel(
+            _parse_addresses(settings.redis_sentinels),
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout
+        )
+        return sentinel.master_for(
+            settings.redis_sentinel_service_name,
+            redis_class=Redis,
+            db=settings.redis_db,
+            max_connections=settings.redis_max_connections,
+            **_connection_kwargs(settings)
+        )
+    else:
+        return _standalone_client(settings, settings.redis_host, settings.redis_port)
+
+
+def create_shard_clients(settings: Settings) -> Dict[str, Redis]:
+    # Nodes that are being removed keep a client until their carts have moved to the remaining nodes.
+    addresses = list(dict.fromkeys(settings.redis_shards + settings.redis_previous_shards))
+    return {
+        address: _standalone_client(settings, host, port)
+        for address, (host, port) in zip(addresses, _parse_addresses(addresses))
+    }
+
+
+def _standalone_client(settings: Settings, host: str, port: int) -> Redis:
+    connection_pool = BlockingConnectionPool(
+        host=host,
+        port=port,
+        db=settings.redis_db,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        **_connection_kwargs(settings)
+    )
+    return Redis(connection_pool=connection_pool)
+
+
+def create_async_redis_client(settings: Settings) -> aioredis.Redis:
+    if settings.redis_mode == "cluster":
+        startup_nodes = [AsyncClusterNode(host, port) for host, port in _cluster_addresses(settings)]
+        return AsyncRedisCluster(
+            startup_nodes=startup_nodes,
+            max_connections=settings.redis_max_connections,
+            **_connection_kwargs(settings)
+        )
+    elif settings.redis_mode == "sentinel":
+        sentinel = AsyncSentinel(
+            _parse_addresses(settings.redis_sentinels),
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout
+        )
+        return sentinel.master_for(
+            settings.redis_sentinel_service_name,
+            redis_class=aioredis.Redis,
+            db=settings.redis_db,
+            max_connections=settings.redis_max_connections,
+            **_connection_kwargs(settings)
+        )
+    else:
+        connection_pool = aioredis.BlockingConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            **_connection_kwargs(settings)
+        )
+        return aioredis.Redis(connection_pool=connection_pool)
+
+
+def warm_up_client(redis_client: Redis, connections: int):
+    # Connections opened before the first request keep connect and AUTH round trips out of its latency. Getting a
+    # connection from the pool connects it, so an unreachable node fails here.
+    if isinstance(redis_client, RedisCluster):
+        redis_client.ping(target_nodes=RedisCluster.ALL_NODES)
+        return
+
+    pool = redis_client.connection_pool
+    opened = [pool.get_connection("PING") for _ in range(max(connections, 1))]
+    for connection in opened:
+        pool.release(connection)
+
+
+async def warm_up_async_client(redis_client: aioredis.Redis, connections: int):
+    if isinstance(redis_client, AsyncRedisCluster):
+        await redis_client.ping(target_nodes=AsyncRedisCluster.ALL_NODES)
+        return
+
+    pool = redis_client.connection_pool
+    opened = [await pool.get_connection("PING") for _ in range(max(connections, 1))]
+    for connection in opened:
+        await pool.release(connection)
+
+
+def close_client(redis_client: Redis):
+    # A client built around a pool it was handed leaves that pool open when it is closed.
+    if isinstance(redis_client, RedisCluster):
+        redis_client.close()
+    else:
+        redis_client.connection_pool.disconnect()
+
+
+async def close_async_client(redis_client: aioredis.Redis):
+    if isinstance(redis_client, AsyncRedisCluster):
+        await redis_client.aclose()
+    else:
+        await redis_client.connection_pool.disconnect()
+
+
+def _connection_kwargs(settings: Settings) -> dict:
+    return {
+        "username": settings.redis_username,
+        "password": settings.redis_password,
+        "socket_timeout": settings.redis_socket_timeout,
+        "socket_connect_timeout": settings.redis_socket_connect_timeout,
+        "socket_keepalive": settings.redis_socket_keepalive,
+        "health_check_interval": settings.redis_health_check_interval,
+        "decode_responses": settings.storage_codec == "json"
+    }
+
+
+def _cluster_addresses(settings: Settings) -> List[Tuple[str, int]]:
+    if settings.redis_cluster_nodes:
+        return _parse_addresses(settings.redis_cluster_nodes)
+    else:
+        return [(settings.redis_host, settings.redis_port)]
+
+
+def _parse_addresses(addresses: List[str]) -> List[Tuple[str, int]]:
+    parsed = []
+    for address in addresses:
+        host, _, port = address.rpartition(":")
+        parsed.append((host, int(port)))
+
+    return parsed
@@ -0,0 +1,139 @@
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from app.repositories.async_cart_repository import AsyncCartRepository
+from app.repositories.cart_cache import CartCache
+from app.schemas.cart_lines import CartLines
+from app.schemas.models import Cart, CartBulkResult, CartOperation, CartOperationResult, CartSummary, Item
+
+
+class AsyncCachingCartRepository:
+
+    def __init__(self, cart_repo: AsyncCartRepository, cart_cache: CartCache, key_prefix: str = ""):
+        self._cart_repo = cart_repo
+        self._cart_cache = cart_cache
+        self._key_prefix = key_prefix
+
+    def __getattr__(self, name):
+        return getattr(self._cart_repo, name)
+
+    async def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        key = self._key(cart_id)
+        cart = self._cart_cache.get(key)
+        if cart is None:
+            token = self._cart_cache.begin_load(key)
+            try:
+                cart = await self._cart_repo.get_cart(cart_id)
+            finally:
+                self._cart_cache.put(key, cart, token)
+
+        return cart
+
+    async def get_many(self, cart_ids: List[UUID]) -> CartBulkResult:
+        cached = {}
+        tokens = {}
+        for cart_id in cart_ids:
+            key = self._key(cart_id)
+            cart = self._cart_cache.get(key)
+            if cart is not None:
+                cached[cart_id] = cart
+            else:
+                tokens[cart_id] = self._cart_cache.begin_load(key)
+
+        try:
+            result = await self._cart_repo.get_many([cart_id for cart_id in tokens])
+            for cart in result.carts:
+                self._cart_cache.put(self._key(cart.cart_id), cart, tokens.pop(cart.cart_id))
+        finally:
+            # Loads of carts that were not found, or of a read that failed, are ended too so no token outlives them.
+            for cart_id, token in tokens.items():
+                self._cart_cache.put(self._key(cart_id), None, token)
+        result.carts.extend(cached.values())
+
+        return result
+
+    async def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        cart = self._cart_cache.get(self._key(cart_id))
+        if cart is not None:
+            return next((x for x in cart.items if x.item_id == item_id), None)
+        else:
+            return await self._cart_repo.get_item(cart_id=cart_id, item_id=item_id)
+
+    async def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        cart = self._cart_cache.get(self._key(cart_id))
+        if cart is not None:
+            return cart.summary()
+        else:
+            return await self._cart_repo.get_summary(cart_id)
+
+    async def save_cart(
+            self,
+            cart: Cart,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        version = await self._cart_repo.save_cart(
+            cart,
+            expected_version=expected_version,
+            expected_epoch=expected_epoch
+        )
+        self._cart_cache.invalidate(self._key(cart.cart_id))
+        return version
+
+    async def save_lines(
+            self,
+            lines: CartLines,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        version = await self._cart_repo.save_lines(
+            lines,
+            expected_version=expected_version,
+            expected_epoch=expected_epoch
+        )
+        self._cart_cache.invalidate(self._key(lines.cart_id))
+        return version
+
+    async def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        item = await self._cart_repo.add_item(cart_id=cart_id, item_name=item_name, quantity=quantity)
+        self._cart_cache.invalidate(self._key(cart_id))
+        return item
+
+    async def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        items_removed = await self._cart_repo.remove_quantity(cart_id=cart_id, item_id=item_id, quantity=quantity)
+        self._cart_cache.invalidate(self._key(cart_id))
+        return items_removed
+
+    async def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
+        deleted = await self._cart_repo.delete_item(cart_id=cart_id, item_id=item_id)
+        self._cart_cache.invalidate(self._key(cart_id))
+        return deleted
+
+    async def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        results = await self._cart_repo.apply_operations(
+            cart_id=cart_id,
+            operations=operations,
+            expected_version=expected_version,
+            expected_epoch=expected_epoch
+        )
+        self._cart_cache.invalidate(self._key(cart_id))
+        return results
+
+    async def delete_cart(self, cart_id: UUID) -> bool:
+        deleted = await self._cart_repo.delete_cart(cart_id)
+        self._cart_cache.invalidate(self._key(cart_id))
+        return deleted
+
+    async def unlink_carts(self, cursor: int = 0, count: int = 1000) -> Tuple[int, int]:
+        result = await self._cart_repo.unlink_carts(cursor=cursor, count=count)
+        self._cart_cache.clear()
+        return result
+
+    def _key(self, cart_id: UUID) -> str:
+        return f"{self._key_prefix}{cart_id}"
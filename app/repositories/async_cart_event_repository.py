@@ -0,0 +1,36 @@
+import time
+
+from injector import inject
+from redis.asyncio import Redis
+
+from app.repositories.cart_event_repository import (
+    FIRST_EVENT_ID,
+    LATEST_EVENT_ID,
+    block_millis,
+    events_page,
+    to_str
+)
+from app.schemas.models import CartEventPage
+
+
+class AsyncCartEventRepository:
+
+    @inject
+    def __init__(self, redis_client: Redis, key: str = "cart-events"):
+        self._redis_client = redis_client
+        self._key = key
+
+    async def read_events(self, after: str = FIRST_EVENT_ID, count: int = 100, wait: float = 0) -> CartEventPage:
+        if after == LATEST_EVENT_ID:
+            after = await self.last_event_id()
+
+        deadline = time.monotonic() + wait
+        while True:
+            block = block_millis(deadline)
+            streams = await self._redis_client.xread({self._key: after}, count=count, block=block)
+            if streams or block is None:
+                return events_page(streams, after)
+
+    async def last_event_id(self) -> str:
+        entries = await self._redis_client.xrevrange(self._key, count=1)
+        return to_str(entries[0][0]) if entries else FIRST_EVENT_ID
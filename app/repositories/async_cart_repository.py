@@ -0,0 +1,318 @@
+import uuid
+from typing import List, Optional, Tuple, Union
+from uuid import UUID
+
+from injector import inject
+from redis.asyncio import Redis
+from redis.asyncio.cluster import RedisCluster
+
+from app.metrics import instrumented
+from app.redis_clients import warm_up_async_client
+from app.repositories import cart_scripts
+from app.repositories.cart_codecs import CartCodec, JsonCartCodec
+from app.repositories.cart_repository import (
+    AGE_BUCKETS,
+    SUMMARY_FIELDS,
+    added_item,
+    clear_event,
+    count_cart_age,
+    epoch_arg,
+    key_pattern,
+    new_age_report,
+    operation_results,
+    operations_to_json,
+    summary_from_fields,
+    summary_key,
+    version_arg
+)
+from app.schemas.cart_lines import CartLines
+from app.schemas.models import (
+    Cart,
+    CartAgeReport,
+    CartBulkResult,
+    CartOperation,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    Item,
+    new_epoch
+)
+
+
+@instrumented("repository")
+class AsyncCartRepository:
+
+    @inject
+    def __init__(
+            self,
+            redis_client: Redis,
+            codec: CartCodec = JsonCartCodec(),
+            ttl: Optional[int] = None,
+            sliding_ttl: bool = False,
+            key_prefix: str = "",
+            events_key: Optional[str] = None
+    ):
+        self._redis_client = redis_client
+        self._codec = codec
+        self._ttl = ttl
+        self._sliding_ttl = sliding_ttl
+        self._key_prefix = key_prefix
+        self._key_pattern = key_pattern(key_prefix)
+        self._events_key = events_key
+        self._save_cart = redis_client.register_script(codec.lua_prelude + cart_scripts.SAVE_CART)
+        self._add_item = redis_client.register_script(codec.lua_prelude + cart_scripts.ADD_ITEM)
+        self._remove_quantity = redis_client.register_script(codec.lua_prelude + cart_scripts.REMOVE_QUANTITY)
+        self._delete_item = redis_client.register_script(codec.lua_prelude + cart_scripts.DELETE_ITEM)
+        self._apply_operations = redis_client.register_script(codec.lua_prelude + cart_scripts.APPLY_OPERATIONS)
+        self._delete_cart = redis_client.register_script(cart_scripts.DELETE_CART)
+
+    async def get_carts(self, cursor: int = 0, limit: int = 100) -> CartPage:
+        cursor, keys = await scan_keys(self._redis_client, cursor=cursor, limit=limit, match=self._key_pattern)
+        carts = [cart for cart in await self._read_carts(keys) if cart] if keys else []
+
+        return CartPage(carts=carts, next_cursor=cursor or None)
+
+    async def get_many(self, cart_ids: List[UUID], chunk_size: int = 500) -> CartBulkResult:
+        cart_ids = list(dict.fromkeys(cart_ids))
+        result = CartBulkResult(carts=[], missing_cart_ids=[])
+        for start in range(0, len(cart_ids), chunk_size):
+            chunk = cart_ids[start:start + chunk_size]
+            for cart_id, cart in zip(chunk, await self._read_carts([self._key(cart_id) for cart_id in chunk])):
+                if cart:
+                    result.carts.append(cart)
+                else:
+                    result.missing_cart_ids.append(cart_id)
+
+        return result
+
+    async def _read_carts(self, keys: List[str]) -> List[Optional[Cart]]:
+        if isinstance(self._redis_client, RedisCluster):
+            reads = await self._redis_client.mget_nonatomic(keys)
+        else:
+            reads = await self._redis_client.mget(keys)
+
+        return [self._codec.decode(read) if read else None for read in reads]
+
+    async def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        read = await self._read(cart_id)
+        if read:
+            return self._codec.decode(read)
+        else:
+            return None
+
+    async def get_lines(self, cart_id: UUID) -> Optional[CartLines]:
+        read = await self._read(cart_id)
+        if read:
+            return self._codec.decode_lines(read)
+        else:
+            return None
+
+    async def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        lines = await self.get_lines(cart_id)
+        if lines:
+            return lines.item(item_id)
+        else:
+            return None
+
+    async def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        key = self._key(cart_id)
+        async with self._redis_client.pipeline(transaction=False) as pipeline:
+            pipeline.hmget(summary_key(key), SUMMARY_FIELDS)
+            if self._sliding_ttl and self._ttl:
+                pipeline.expire(key, self._ttl)
+                pipeline.expire(summary_key(key), self._ttl)
+            else:
+                pipeline.exists(key)
+            fields, found, *_ = await pipeline.execute()
+        if not found:
+            return None
+        if fields[0] is None:
+            # Carts written before summaries were kept beside them get one on their next write.
+            cart = await self.get_cart(cart_id)
+            return cart.summary() if cart else None
+        return summary_from_fields(cart_id, fields)
+
+    async def save_cart(
+            self,
+            cart: Cart,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        return await self._save_cart(
+            keys=self._keys(cart.cart_id),
+            args=[self._codec.encode(cart), version_arg(expected_version), epoch_arg(expected_epoch), self._ttl or 0]
+        )
+
+    async def save_lines(
+            self,
+            lines: CartLines,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        return await self._save_cart(
+            keys=self._keys(lines.cart_id),
+            args=[
+                self._codec.encode_lines(lines),
+                version_arg(expected_version),
+                epoch_arg(expected_epoch),
+                self._ttl or 0
+            ]
+        )
+
+    async def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        read = await self._add_item(
+            keys=self._keys(cart_id),
+            args=[str(cart_id), item_name, quantity, str(uuid.uuid4()), new_epoch(), self._ttl or 0]
+        )
+        return added_item(read, item_name)
+
+    async def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        return await self._remove_quantity(keys=self._keys(cart_id), args=[str(item_id), quantity, self._ttl or 0])
+
+    async def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
+        return await self._delete_item(keys=self._keys(cart_id), args=[str(item_id), self._ttl or 0]) == 1
+
+    async def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        if not operations:
+            return []
+
+        read = await self._apply_operations(
+            keys=self._keys(cart_id),
+            args=[
+                str(cart_id),
+                operations_to_json(operations),
+                version_arg(expected_version),
+                epoch_arg(expected_epoch),
+                new_epoch(),
+                self._ttl or 0
+            ]
+        )
+        if read is None:
+            return None
+
+        return operation_results(read)
+
+    async def sample_ages(
+            self,
+            cursor: int = 0,
+            count: int = 1000,
+            bounds: List[int] = AGE_BUCKETS
+    ) -> Tuple[int, CartAgeReport]:
+        report = new_age_report(bounds)
+        cursor, keys = await scan_keys(self._redis_client, cursor=cursor, limit=count, match=self._key_pattern)
+        async with self._redis_client.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.ttl(key)
+            remaining_ttls = await pipeline.execute()
+        for remaining in remaining_ttls:
+            count_cart_age(report, ttl=self._ttl, remaining=remaining)
+
+        return cursor, report
+
+    async def delete_cart(self, cart_id: UUID) -> bool:
+        return await self._delete_cart(keys=self._keys(cart_id), args=[str(cart_id)]) == 1
+
+    async def unlink_carts(self, cursor: int = 0, count: int = 1000) -> Tuple[int, int]:
+        cursor, keys = await scan_keys(self._redis_client, cursor=cursor, limit=count, match=self._key_pattern)
+        if not keys:
+            return cursor, 0
+        if not self._events_key:
+            unlinked = await self._redis_client.unlink(*keys)
+            await self._redis_client.unlink(*[summary_key(key) for key in keys])
+            return cursor, unlinked
+
+        async with self._redis_client.pipeline(transaction=True) as pipeline:
+            pipeline.unlink(*keys)
+            pipeline.unlink(*[summary_key(key) for key in keys])
+            pipeline.xadd(self._events_key, clear_event(keys), maxlen=cart_scripts.EVENTS_MAX_LEN, approximate=True)
+            unlinked, _, _ = await pipeline.execute()
+
+        return cursor, unlinked
+
+    async def ping(self) -> bool:
+        return bool(await self._redis_client.ping())
+
+    async def warm_up(self, connections: int):
+        await warm_up_async_client(self._redis_client, connections)
+        for script in self._scripts():
+            await self._redis_client.script_load(script.script)
+
+    def _scripts(self) -> list:
+        return [
+            self._save_cart,
+            self._add_item,
+            self._remove_quantity,
+            self._delete_item,
+            self._apply_operations,
+            self._delete_cart
+        ]
+
+    async def _read(self, cart_id: UUID) -> Optional[Union[str, bytes]]:
+        key = self._key(cart_id)
+        if self._sliding_ttl and self._ttl:
+            async with self._redis_client.pipeline(transaction=False) as pipeline:
+                pipeline.getex(key, ex=self._ttl)
+                pipeline.expire(summary_key(key), self._ttl)
+                read, _ = await pipeline.execute()
+            return read
+        return await self._redis_client.get(key)
+
+    def _key(self, cart_id: UUID) -> str:
+        return f"{self._key_prefix}{cart_id}"
+
+    def _keys(self, cart_id: UUID) -> List[str]:
+        # The summary and, when enabled, the events stream ride along so each script updates them in the same call.
+        keys = [self._key(cart_id), summary_key(self._key(cart_id))]
+        return keys + [self._events_key] if self._events_key else keys
+
+
+async def scan_keys(
+        redis_client: Redis,
+        cursor: int,
+        limit: int,
+        match: Optional[str] = None
+) -> Tuple[int, List[str]]:
+    if isinstance(redis_client, RedisCluster):
+        return await _scan_cluster_keys(redis_client, cursor=cursor, limit=limit, match=match)
+
+    # A SCAN batch cannot be split without the cursor skipping the rest of it, so each further SCAN only asks for the
+    # room left on the page. COUNT is a hint to Redis, which makes limit one as well: a page can still run over it.
+    keys = []
+    while True:
+        cursor, batch = await redis_client.scan(cursor=cursor, count=limit - len(keys), match=match)
+        keys.extend(batch)
+        if cursor == 0 or len(keys) >= limit:
+            return cursor, keys
+
+
+async def _scan_cluster_keys(
+        redis_client: RedisCluster,
+        cursor: int,
+        limit: int,
+        match: Optional[str] = None
+) -> Tuple[int, List[str]]:
+    nodes = sorted(redis_client.get_primaries(), key=lambda node: node.name)
+    node_index, node_cursor = cursor % len(nodes), cursor // len(nodes)
+    keys = []
+    while True:
+        node = nodes[node_index]
+        cursors, batch = await redis_client.scan(
+            cursor=node_cursor,
+            count=limit - len(keys),
+            match=match,
+            target_nodes=node
+        )
+        node_cursor = cursors[node.name]
+        keys.extend(batch)
+        if node_cursor == 0:
+            node_index += 1
+            if node_index == len(nodes):
+                return 0, keys
+        if len(keys) >= limit:
+            return node_cursor * len(nodes) + node_index, keys
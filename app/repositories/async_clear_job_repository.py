@@ -0,0 +1,30 @@
+from typing import Optional
+from uuid import UUID
+
+from injector import inject
+from redis.asyncio import Redis
+
+from app.repositories.clear_job_repository import JOB_TTL
+from app.schemas.models import ClearJob
+
+
+class AsyncClearJobRepository:
+
+    @inject
+    def __init__(self, redis_client: Redis, key_prefix: str = "cart-job:"):
+        self._redis_client = redis_client
+        self._key_prefix = key_prefix
+
+    async def get_job(self, job_id: UUID) -> Optional[ClearJob]:
+        read = await self._redis_client.get(f"{self._key_prefix}{job_id}")
+        if read:
+            return ClearJob.model_validate_json(read)
+        else:
+            return None
+
+    async def save_job(self, job: ClearJob):
+        await self._redis_client.set(
+            name=f"{self._key_prefix}{job.job_id}",
+            value=job.model_dump_json(),
+            ex=JOB_TTL
+        )
@@ -0,0 +1,136 @@
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from injector import inject
+from redis.asyncio import Redis
+
+from app.metrics import instrumented
+from app.repositories import hash_cart_scripts
+from app.repositories.cart_codecs import CartCodec, JsonCartCodec
+from app.repositories.async_cart_repository import AsyncCartRepository
+from app.repositories.cart_repository import epoch_arg, version_arg
+from app.repositories.hash_cart_repository import (
+    SUMMARY_FIELDS,
+    cart_to_hash,
+    fields_to_summary,
+    hash_to_cart,
+    hash_to_lines,
+    lines_to_hash
+)
+from app.schemas.cart_lines import CartLines
+from app.schemas.models import Cart, CartSummary, Item
+
+
+@instrumented("repository")
+class AsyncHashCartRepository(AsyncCartRepository):
+
+    @inject
+    def __init__(
+            self,
+            redis_client: Redis,
+            codec: CartCodec = JsonCartCodec(),
+            ttl: Optional[int] = None,
+            sliding_ttl: bool = False,
+            key_prefix: str = "",
+            events_key: Optional[str] = None
+    ):
+        super().__init__(
+            redis_client,
+            codec,
+            ttl=ttl,
+            sliding_ttl=sliding_ttl,
+            key_prefix=key_prefix,
+            events_key=events_key
+        )
+        self._save_cart = redis_client.register_script(hash_cart_scripts.SAVE_CART)
+        self._add_item = redis_client.register_script(hash_cart_scripts.ADD_ITEM)
+        self._remove_quantity = redis_client.register_script(hash_cart_scripts.REMOVE_QUANTITY)
+        self._delete_item = redis_client.register_script(hash_cart_scripts.DELETE_ITEM)
+        self._apply_operations = redis_client.register_script(hash_cart_scripts.APPLY_OPERATIONS)
+
+    async def _read_carts(self, keys: List[str]) -> List[Optional[Cart]]:
+        async with self._redis_client.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.hgetall(key)
+            results = await pipeline.execute()
+
+        return [hash_to_cart(fields) if fields else None for fields in results]
+
+    async def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        fields = await self._read_hash(cart_id)
+        if fields:
+            return hash_to_cart(fields)
+        else:
+            return None
+
+    async def get_lines(self, cart_id: UUID) -> Optional[CartLines]:
+        fields = await self._read_hash(cart_id)
+        if fields:
+            return hash_to_lines(fields)
+        else:
+            return None
+
+    async def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        key = self._key(cart_id)
+        fields = [f"name:{item_id}", f"qty:{item_id}"]
+        if self._sliding_ttl and self._ttl:
+            async with self._redis_client.pipeline(transaction=False) as pipeline:
+                pipeline.hmget(key, fields)
+                pipeline.expire(key, self._ttl)
+                (item_name, quantity), _ = await pipeline.execute()
+        else:
+            item_name, quantity = await self._redis_client.hmget(key, fields)
+        if item_name is not None:
+            return Item(item_id=item_id, item_name=item_name, quantity=int(quantity))
+        else:
+            return None
+
+    async def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        key = self._key(cart_id)
+        if self._sliding_ttl and self._ttl:
+            async with self._redis_client.pipeline(transaction=False) as pipeline:
+                pipeline.hmget(key, SUMMARY_FIELDS)
+                pipeline.expire(key, self._ttl)
+                fields, _ = await pipeline.execute()
+        else:
+            fields = await self._redis_client.hmget(key, SUMMARY_FIELDS)
+        if fields[0] is None:
+            return None
+        if fields[2] is None:
+            cart = await self.get_cart(cart_id)
+            return cart.summary() if cart else None
+        return fields_to_summary(fields)
+
+    async def save_cart(
+            self,
+            cart: Cart,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        fields = [value for field in cart_to_hash(cart).items() for value in field]
+        return await self._save_cart(
+            keys=self._keys(cart.cart_id),
+            args=fields + [version_arg(expected_version), epoch_arg(expected_epoch), self._ttl or 0]
+        )
+
+    async def save_lines(
+            self,
+            lines: CartLines,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        fields = [value for field in lines_to_hash(lines).items() for value in field]
+        return await self._save_cart(
+            keys=self._keys(lines.cart_id),
+            args=fields + [version_arg(expected_version), epoch_arg(expected_epoch), self._ttl or 0]
+        )
+
+    async def _read_hash(self, cart_id: UUID) -> Dict[str, str]:
+        key = self._key(cart_id)
+        if self._sliding_ttl and self._ttl:
+            async with self._redis_client.pipeline(transaction=False) as pipeline:
+                pipeline.hgetall(key)
+                pipeline.expire(key, self._ttl)
+                fields, _ = await pipeline.execute()
+            return fields
+        return await self._redis_client.hgetall(key)
@@ -0,0 +1,17 @@
+from redis.asyncio import Redis
+
+from app.repositories import rate_limit_scripts
+
+
+class AsyncRateLimitRepository:
+
+    def __init__(self, redis_client: Redis, rate: float, burst: int, key_prefix: str = "cart-rate:"):
+        self._redis_client = redis_client
+        self._rate = rate
+        self._burst = burst
+        self._key_prefix = key_prefix
+        self._take_token = redis_client.register_script(rate_limit_scripts.TAKE_TOKEN)
+
+    async def take_token(self, client_id: str) -> float:
+        retry_after = await self._take_token(keys=[f"{self._key_prefix}{client_id}"], args=[self._rate, self._burst])
+        return retry_after / 1000
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from redis import Redis
+
+from app.schemas.models import Cart
+
+INVALIDATION_CHANNEL = "__redis__:invalidate"
+
+
+class CartCache:
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[str, Tuple[float, Cart]] = OrderedDict()
+        self._loads: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.active = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Cart]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, cart = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cart
+
+    def begin_load(self, key: str) -> object:
+        token = object()
+        with self._lock:
+            self._loads[key] = token
+
+        return token
+
+    def put(self, key: str, cart: Optional[Cart], token: object):
+        with self._lock:
+            # An invalidation that arrived while the cart was being read drops the token, so stale reads are not kept.
+            if self._loads.get(key) is not token:
+                return
+            del self._loads[key]
+            if cart is None or not self.active:
+                return
+
+            self._entries[key] = (time.monotonic() + self._ttl, cart)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._loads.pop(key, None)
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._loads.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+class CartInvalidationListener:
+    def __init__(self, redis_client: Redis, cart_cache: CartCache, prefixes: Optional[List[str]] = None):
+        self._redis_client = redis_client
+        self._cart_cache = cart_cache
+        self._prefixes = prefixes or []
+        self._pubsub = None
+        self._thread = None
+
+    def start(self):
+        # Tracking is redirected to the subscribed connection itself, so a single connection both enables
+        # broadcast tracking and receives the invalidation messages.
+        self._pubsub = self._redis_client.pubsub()
+        connection = self._redis_client.connection_pool.get_connection("CLIENT")
+        connection.register_connect_callback(self._on_connect)
+        self._pubsub.connection = connection
+        self._enable_tracking(connection)
+        self._pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_invalidate})
+        self._cart_cache.active = True
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=self._on_error)
+
+    def stop(self):
+        self._cart_cache.active = False
+        self._cart_cache.clear()
+        if self._thread:
+            self._thread.stop()
+            self._thread.join(timeout=2.0)
+        if self._pubsub:
+            self._pubsub.close()
+
+    def _enable_tracking(self, connection):
+        connection.send_command("CLIENT", "ID")
+        client_id = connection.read_response()
+        prefix_args = [arg for prefix in self._prefixes for arg in ("PREFIX", prefix)]
+        connection.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", *prefix_args)
+        connection.read_response()
+
+    def _on_connect(self, connection):
+        # Invalidations sent while disconnected are lost, so start over from an empty cache.
+        self._cart_cache.clear()
+        self._enable_tracking(connection)
+        self._pubsub.on_connect(connection)
+        self._cart_cache.active = True
+
+    def _on_invalidate(self, message):
+        keys = message["data"]
+        if keys is None:
+            self._cart_cache.clear()
+        else:
+            for key in keys:
+                self._cart_cache.invalidate(key.decode() if isinstance(key, bytes) else key)
+
+    def _on_error(self, error, pubsub, thread):
+        self._cart_cache.active = False
+        self._cart_cache.clear()
+        time.sleep(1.0)
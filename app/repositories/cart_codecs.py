@@ -0,0 +1,77 @@
+from typing import Union
+
+import msgpack
+import orjson
+
+from app.metrics import instrumented, observe_payload
+from app.repositories import cart_scripts
+from app.schemas.cart_lines import CartLines, lines_from_fields
+from app.schemas.models import Cart
+
+
+class CartCodec:
+    lua_prelude: str
+
+    def encode(self, cart: Cart) -> Union[str, bytes]:
+        raise NotImplementedError
+
+    def decode(self, raw: Union[str, bytes]) -> Cart:
+        raise NotImplementedError
+
+    def encode_lines(self, lines: CartLines) -> Union[str, bytes]:
+        raise NotImplementedError
+
+    def decode_lines(self, raw: Union[str, bytes]) -> CartLines:
+        raise NotImplementedError
+
+
+@instrumented("codec")
+class JsonCartCodec(CartCodec):
+    lua_prelude = cart_scripts.JSON_CODEC
+
+    def encode(self, cart: Cart) -> Union[str, bytes]:
+        encoded = cart.model_dump_json()
+        observe_payload("write", encoded)
+        return encoded
+
+    def decode(self, raw: Union[str, bytes]) -> Cart:
+        observe_payload("read", raw)
+        return Cart.model_validate_json(raw)
+
+    def encode_lines(self, lines: CartLines) -> Union[str, bytes]:
+        encoded = orjson.dumps(lines.to_fields())
+        observe_payload("write", encoded)
+        return encoded
+
+    def decode_lines(self, raw: Union[str, bytes]) -> CartLines:
+        observe_payload("read", raw)
+        return lines_from_fields(orjson.loads(raw))
+
+
+@instrumented("codec")
+class MsgpackCartCodec(CartCodec):
+    lua_prelude = cart_scripts.MSGPACK_CODEC
+
+    def encode(self, cart: Cart) -> Union[str, bytes]:
+        encoded = msgpack.packb(cart.model_dump(mode="json"))
+        observe_payload("write", encoded)
+        return encoded
+
+    def decode(self, raw: Union[str, bytes]) -> Cart:
+        observe_payload("read", raw)
+        return Cart.model_validate(msgpack.unpackb(raw))
+
+    def encode_lines(self, lines: CartLines) -> Union[str, bytes]:
+        encoded = msgpack.packb(lines.to_fields())
+        observe_payload("write", encoded)
+        return encoded
+
+    def decode_lines(self, raw: Union[str, bytes]) -> CartLines:
+        observe_payload("read", raw)
+        return lines_from_fields(msgpack.unpackb(raw))
+
+
+CART_CODECS = {
+    "json": JsonCartCodec,
+    "msgpack": MsgpackCartCodec
+}
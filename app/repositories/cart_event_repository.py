@@ -0,0 +1,59 @@
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from injector import inject
+from redis import Redis
+
+from app.schemas.models import CartEvent, CartEventPage
+
+FIRST_EVENT_ID = "0-0"
+LATEST_EVENT_ID = "$"
+BLOCK_SLICE = 1.0
+
+
+class CartEventRepository:
+
+    @inject
+    def __init__(self, redis_client: Redis, key: str = "cart-events"):
+        self._redis_client = redis_client
+        self._key = key
+
+    def read_events(self, after: str = FIRST_EVENT_ID, count: int = 100, wait: float = 0) -> CartEventPage:
+        if after == LATEST_EVENT_ID:
+            after = self.last_event_id()
+
+        deadline = time.monotonic() + wait
+        while True:
+            block = block_millis(deadline)
+            streams = self._redis_client.xread({self._key: after}, count=count, block=block)
+            if streams or block is None:
+                return events_page(streams, after)
+
+    def last_event_id(self) -> str:
+        entries = self._redis_client.xrevrange(self._key, count=1)
+        return to_str(entries[0][0]) if entries else FIRST_EVENT_ID
+
+
+def block_millis(deadline: float) -> Optional[int]:
+    # Waiting in short slices keeps each XREAD inside the socket timeout and hands the connection back to the pool
+    # between slices instead of pinning it for the whole wait.
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return None
+    return max(int(min(remaining, BLOCK_SLICE) * 1000), 1)
+
+
+def events_page(streams: List[Tuple[str, List[Tuple[str, Dict]]]], after: str) -> CartEventPage:
+    entries = streams[0][1] if streams else []
+    events = [to_event(event_id, fields) for event_id, fields in entries]
+
+    return CartEventPage(events=events, last_event_id=events[-1].event_id if events else after)
+
+
+def to_event(event_id: Union[str, bytes], fields: Dict[Union[str, bytes], Union[str, bytes]]) -> CartEvent:
+    # Clients built for the msgpack codec do not decode responses, so stream entries may arrive as bytes.
+    return CartEvent(event_id=to_str(event_id), **{to_str(name): to_str(value) for name, value in fields.items()})
+
+
+def to_str(value: Union[str, bytes]) -> str:
+    return value.decode() if isinstance(value, bytes) else value
@@ -1,47 +1,400 @@
-import json
-from typing import Optional, List
+import uuid
+from typing import List, Optional, Tuple, Union
 from uuid import UUID
 
+import orjson
 from injector import inject
 from redis import Redis
+from redis.cluster import RedisCluster
 
-from app.schemas.models import Cart
+from app.metrics import instrumented
+from app.redis_clients import close_client, warm_up_client
+from app.repositories import cart_scripts
+from app.repositories.cart_codecs import CartCodec, JsonCartCodec
+from app.repositories.cart_store import AGE_BUCKETS, CartStore, count_cart_age, new_age_report
+from app.schemas.cart_lines import CartLines
+from app.schemas.models import (
+    AddItemOperation,
+    Cart,
+    CartAgeReport,
+    CartBulkResult,
+    CartOperation,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    Item,
+    new_epoch
+)
 
+MOVE_TIMEOUT = 5000
+SUMMARY_FIELDS = ["version", "lines", "quantity", "epoch"]
 
-class CartRepository:
+
+@instrumented("repository")
+class CartRepository(CartStore):
 
     @inject
-    def __init__(self, redis_client: Redis):
+    def __init__(
+            self,
+            redis_client: Redis,
+            codec: CartCodec = JsonCartCodec(),
+            ttl: Optional[int] = None,
+            sliding_ttl: bool = False,
+            key_prefix: str = "",
+            events_key: Optional[str] = None
+    ):
         self._redis_client = redis_client
+        self._codec = codec
+        self._ttl = ttl
+        self._sliding_ttl = sliding_ttl
+        self._key_prefix = key_prefix
+        self._key_pattern = key_pattern(key_prefix)
+        self._events_key = events_key
+        self._save_cart = redis_client.register_script(codec.lua_prelude + cart_scripts.SAVE_CART)
+        self._add_item = redis_client.register_script(codec.lua_prelude + cart_scripts.ADD_ITEM)
+        self._remove_quantity = redis_client.register_script(codec.lua_prelude + cart_scripts.REMOVE_QUANTITY)
+        self._delete_item = redis_client.register_script(codec.lua_prelude + cart_scripts.DELETE_ITEM)
+        self._apply_operations = redis_client.register_script(codec.lua_prelude + cart_scripts.APPLY_OPERATIONS)
+        self._delete_cart = redis_client.register_script(cart_scripts.DELETE_CART)
+
+    def get_carts(self, cursor: int = 0, limit: int = 100) -> CartPage:
+        cursor, keys = scan_keys(self._redis_client, cursor=cursor, limit=limit, match=self._key_pattern)
+        carts = [cart for cart in self._read_carts(keys) if cart] if keys else []
+
+        return CartPage(carts=carts, next_cursor=cursor or None)
+
+    def get_many(self, cart_ids: List[UUID], chunk_size: int = 500) -> CartBulkResult:
+        cart_ids = list(dict.fromkeys(cart_ids))
+        result = CartBulkResult(carts=[], missing_cart_ids=[])
+        for start in range(0, len(cart_ids), chunk_size):
+            chunk = cart_ids[start:start + chunk_size]
+            for cart_id, cart in zip(chunk, self._read_carts([self._key(cart_id) for cart_id in chunk])):
+                if cart:
+                    result.carts.append(cart)
+                else:
+                    result.missing_cart_ids.append(cart_id)
+
+        return result
 
-    def get_carts(self) -> List[Cart]:
-        keys = self._redis_client.keys()
-        if keys:
-            return [self.get_cart(key) for key in keys]
+    def _read_carts(self, keys: List[str]) -> List[Optional[Cart]]:
+        if isinstance(self._redis_client, RedisCluster):
+            reads = self._redis_client.mget_nonatomic(keys)
         else:
-            return []
+            reads = self._redis_client.mget(keys)
+
+        return [self._codec.decode(read) if read else None for read in reads]
 
     def get_cart(self, cart_id: UUID) -> Optional[Cart]:
-        read = self._redis_client.get(str(cart_id))
+        read = self._read(cart_id)
+        if read:
+            return self._codec.decode(read)
+        else:
+            return None
+
+    def get_lines(self, cart_id: UUID) -> Optional[CartLines]:
+        read = self._read(cart_id)
         if read:
-            return Cart(**json.loads(read))
+            return self._codec.decode_lines(read)
+        else:
+            return None
+
+    def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        lines = self.get_lines(cart_id)
+        if lines:
+            return lines.item(item_id)
         else:
             return None
 
-    def save_cart(self, cart: Cart):
-        self._redis_client.set(
-            name=str(cart.cart_id),
-            value=cart.model_dump_json()
+    def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        key = self._key(cart_id)
+        pipeline = self._redis_client.pipeline(transaction=False)
+        pipeline.hmget(summary_key(key), SUMMARY_FIELDS)
+        if self._sliding_ttl and self._ttl:
+            pipeline.expire(key, self._ttl)
+            pipeline.expire(summary_key(key), self._ttl)
+        else:
+            pipeline.exists(key)
+        fields, found, *_ = pipeline.execute()
+        if not found:
+            return None
+        if fields[0] is None:
+            # Carts written before summaries were kept beside them get one on their next write.
+            cart = self.get_cart(cart_id)
+            return cart.summary() if cart else None
+        return summary_from_fields(cart_id, fields)
+
+    def save_cart(
+            self,
+            cart: Cart,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        return self._save_cart(
+            keys=self._keys(cart.cart_id),
+            args=[self._codec.encode(cart), version_arg(expected_version), epoch_arg(expected_epoch), self._ttl or 0]
         )
 
-    def delete_cart(self, cart_id: UUID):
-        key = str(cart_id)
-        if self._redis_client.exists(key):
-            self._redis_client.delete(key)
+    def save_lines(
+            self,
+            lines: CartLines,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        return self._save_cart(
+            keys=self._keys(lines.cart_id),
+            args=[
+                self._codec.encode_lines(lines),
+                version_arg(expected_version),
+                epoch_arg(expected_epoch),
+                self._ttl or 0
+            ]
+        )
 
-            return True
+    def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        read = self._add_item(
+            keys=self._keys(cart_id),
+            args=[str(cart_id), item_name, quantity, str(uuid.uuid4()), new_epoch(), self._ttl or 0]
+        )
+        return added_item(read, item_name)
+
+    def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        return self._remove_quantity(keys=self._keys(cart_id), args=[str(item_id), quantity, self._ttl or 0])
+
+    def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
+        return self._delete_item(keys=self._keys(cart_id), args=[str(item_id), self._ttl or 0]) == 1
+
+    def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        if not operations:
+            return []
+
+        read = self._apply_operations(
+            keys=self._keys(cart_id),
+            args=[
+                str(cart_id),
+                operations_to_json(operations),
+                version_arg(expected_version),
+                epoch_arg(expected_epoch),
+                new_epoch(),
+                self._ttl or 0
+            ]
+        )
+        if read is None:
+            return None
+
+        return operation_results(read)
+
+    def sample_ages(
+            self,
+            cursor: int = 0,
+            count: int = 1000,
+            bounds: List[int] = AGE_BUCKETS
+    ) -> Tuple[int, CartAgeReport]:
+        report = new_age_report(bounds)
+        cursor, keys = scan_keys(self._redis_client, cursor=cursor, limit=count, match=self._key_pattern)
+        pipeline = self._redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.ttl(key)
+        for remaining in pipeline.execute():
+            count_cart_age(report, ttl=self._ttl, remaining=remaining)
+
+        return cursor, report
+
+    def delete_cart(self, cart_id: UUID) -> bool:
+        return self._delete_cart(keys=self._keys(cart_id), args=[str(cart_id)]) == 1
+
+    def unlink_carts(self, cursor: int = 0, count: int = 1000) -> Tuple[int, int]:
+        cursor, keys = scan_keys(self._redis_client, cursor=cursor, limit=count, match=self._key_pattern)
+        if not keys:
+            return cursor, 0
+        if not self._events_key:
+            unlinked = self._redis_client.unlink(*keys)
+            self._redis_client.unlink(*[summary_key(key) for key in keys])
+            return cursor, unlinked
+
+        pipeline = self._redis_client.pipeline(transaction=True)
+        pipeline.unlink(*keys)
+        pipeline.unlink(*[summary_key(key) for key in keys])
+        pipeline.xadd(self._events_key, clear_event(keys), maxlen=cart_scripts.EVENTS_MAX_LEN, approximate=True)
+        unlinked, _, _ = pipeline.execute()
+
+        return cursor, unlinked
+
+    def move_carts(
+            self,
+            cart_ids: List[UUID],
+            host: str,
+            port: int,
+            db: int = 0,
+            auth: Optional[str] = None
+    ) -> bool:
+        keys = [self._key(cart_id) for cart_id in cart_ids]
+        moved = self._redis_client.migrate(
+            host,
+            port,
+            keys + [summary_key(key) for key in keys],
+            db,
+            MOVE_TIMEOUT,
+            auth=auth
+        )
+        return moved in ("OK", b"OK")
+
+    def ping(self) -> bool:
+        return bool(self._redis_client.ping())
+
+    def warm_up(self, connections: int):
+        warm_up_client(self._redis_client, connections)
+        for script in self._scripts():
+            self._redis_client.script_load(script.script)
+
+    def close(self):
+        close_client(self._redis_client)
+
+    def _scripts(self) -> list:
+        return [
+            self._save_cart,
+            self._add_item,
+            self._remove_quantity,
+            self._delete_item,
+            self._apply_operations,
+            self._delete_cart
+        ]
+
+    def _read(self, cart_id: UUID) -> Optional[Union[str, bytes]]:
+        key = self._key(cart_id)
+        if self._sliding_ttl and self._ttl:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            pipeline.getex(key, ex=self._ttl)
+            pipeline.expire(summary_key(key), self._ttl)
+            read, _ = pipeline.execute()
+            return read
+        return self._redis_client.get(key)
+
+    def _key(self, cart_id: UUID) -> str:
+        return f"{self._key_prefix}{cart_id}"
+
+    def _keys(self, cart_id: UUID) -> List[str]:
+        # The summary and, when enabled, the events stream ride along so each script updates them in the same call.
+        keys = [self._key(cart_id), summary_key(self._key(cart_id))]
+        return keys + [self._events_key] if self._events_key else keys
+
+
+def key_pattern(key_prefix: str) -> str:
+    # Summary keys open with their hash tag, which keeps them out of an unprefixed scan for carts.
+    return key_prefix + "*" if key_prefix else "[^{]*"
+
+
+def summary_key(key: Union[str, bytes]) -> str:
+    # The hash tag puts the summary in its cart's cluster slot, so one script can write both.
+    return "{" + text(key) + "}:summary"
+
+
+def summary_from_fields(cart_id: UUID, fields: List[Optional[Union[str, bytes]]]) -> CartSummary:
+    version, lines, quantity, epoch = fields
+    return CartSummary(
+        cart_id=cart_id,
+        version=int(version),
+        epoch=epoch.decode() if isinstance(epoch, bytes) else epoch or "",
+        line_count=int(lines),
+        total_quantity=int(quantity)
+    )
+
+
+def added_item(read: list, item_name: str) -> Item:
+    item_id, quantity = read
+    return Item(item_id=text(item_id), item_name=item_name, quantity=quantity)
+
+
+def operation_results(read: list) -> List[CartOperationResult]:
+    results = []
+    for op, *values in read:
+        op = text(op)
+        if op == "add":
+            item_id, item_name, quantity = values
+            item = Item(item_id=text(item_id), item_name=text(item_name), quantity=quantity)
+            results.append(CartOperationResult(op=op, item=item))
+        elif op == "remove":
+            results.append(CartOperationResult(op=op, removed=values[0]))
         else:
-            return False
+            results.append(CartOperationResult(op=op, deleted=values[0] == 1))
 
-    def clear_carts(self):
-        self._redis_client.flushdb()
+    return results
+
+
+def text(value: Union[str, bytes]) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def operations_to_json(operations: List[CartOperation]) -> bytes:
+    serialized = []
+    for operation in operations:
+        fields = operation.model_dump(mode="json")
+        if isinstance(operation, AddItemOperation):
+            fields["item_id"] = str(uuid.uuid4())
+        serialized.append(fields)
+
+    return orjson.dumps(serialized)
+
+
+def clear_event(keys: List[str]) -> dict:
+    return {"type": "clear", "count": len(keys)}
+
+
+def version_arg(expected_version: Optional[int]) -> int:
+    return -1 if expected_version is None else expected_version
+
+
+def epoch_arg(expected_epoch: Optional[str]) -> str:
+    return "*" if expected_epoch is None else expected_epoch
+
+
+def scan_keys(
+        redis_client: Redis,
+        cursor: int,
+        limit: int,
+        match: Optional[str] = None
+) -> Tuple[int, List[str]]:
+    if isinstance(redis_client, RedisCluster):
+        return _scan_cluster_keys(redis_client, cursor=cursor, limit=limit, match=match)
+
+    # A SCAN batch cannot be split without the cursor skipping the rest of it, so each further SCAN only asks for the
+    # room left on the page. COUNT is a hint to Redis, which makes limit one as well: a page can still run over it.
+    keys = []
+    while True:
+        cursor, batch = redis_client.scan(cursor=cursor, count=limit - len(keys), match=match)
+        keys.extend(batch)
+        if cursor == 0 or len(keys) >= limit:
+            return cursor, keys
+
+
+def _scan_cluster_keys(
+        redis_client: RedisCluster,
+        cursor: int,
+        limit: int,
+        match: Optional[str] = None
+) -> Tuple[int, List[str]]:
+    # The page cursor interleaves the primary being scanned with that primary's own SCAN cursor.
+    nodes = sorted(redis_client.get_primaries(), key=lambda node: node.name)
+    node_index, node_cursor = cursor % len(nodes), cursor // len(nodes)
+    keys = []
+    while True:
+        node = nodes[node_index]
+        cursors, batch = redis_client.scan(
+            cursor=node_cursor,
+            count=limit - len(keys),
+            match=match,
+            target_nodes=node
+        )
+        node_cursor = cursors[node.name]
+        keys.extend(batch)
+        if node_cursor == 0:
+            node_index += 1
+            if node_index == len(nodes):
+                return 0, keys
+        if len(keys) >= limit:
+            return node_cursor * len(nodes) + node_index, keys
@@ -0,0 +1,286 @@
+JSON_CODEC = """
+local decode_cart = cjson.decode
+
+local function encode_cart(cart)
+    local encoded = cjson.encode(cart)
+    if #cart['items'] == 0 then
+        encoded = string.gsub(encoded, '"items":{}', '"items":[]')
+    end
+    return encoded
+end
+"""
+
+MSGPACK_CODEC = """
+local decode_cart = cmsgpack.unpack
+local encode_cart = cmsgpack.pack
+"""
+
+EVENTS_MAX_LEN = 100000
+
+EMIT_EVENT = f"""
+local function emit_event(...)
+    if #KEYS < 3 then
+        return
+    end
+
+    local args = {{...}}
+    local fields = {{}}
+    for index = 1, select('#', ...), 2 do
+        if args[index + 1] ~= nil then
+            table.insert(fields, args[index])
+            table.insert(fields, args[index + 1])
+        end
+    end
+    redis.call('XADD', KEYS[3], 'MAXLEN', '~', {EVENTS_MAX_LEN}, '*', unpack(fields))
+end
+"""
+
+_WRITE_CART = EMIT_EVENT + """
+local ttl = tonumber(ARGV[#ARGV])
+
+local function write_cart(cart)
+    cart['version'] = (cart['version'] or 0) + 1
+    local quantity = 0
+    for _, item in ipairs(cart['items']) do
+        quantity = quantity + item['quantity']
+    end
+    -- The counters are kept beside the cart so its summary is read without decoding it.
+    redis.call(
+        'HSET', KEYS[2],
+        'version', cart['version'], 'lines', #cart['items'], 'quantity', quantity, 'epoch', cart['epoch'] or ''
+    )
+    if ttl > 0 then
+        redis.call('SET', KEYS[1], encode_cart(cart), 'EX', ttl)
+        redis.call('EXPIRE', KEYS[2], ttl)
+    else
+        redis.call('SET', KEYS[1], encode_cart(cart))
+        redis.call('PERSIST', KEYS[2])
+    end
+end
+"""
+
+SAVE_CART = _WRITE_CART + """
+local raw = redis.call('GET', KEYS[1])
+local version = 0
+local epoch
+if raw then
+    local stored = decode_cart(raw)
+    version = stored['version'] or 0
+    epoch = stored['epoch']
+end
+
+local expected = tonumber(ARGV[2])
+if expected >= 0 and expected ~= version then
+    return false
+end
+if ARGV[3] ~= '*' and ARGV[3] ~= (epoch or '') then
+    return false
+end
+
+-- A cart keeps the epoch it was created with, the one it is saved with only counts when it is new.
+local cart = decode_cart(ARGV[1])
+cart['version'] = version
+if epoch then
+    cart['epoch'] = epoch
+end
+write_cart(cart)
+emit_event('type', 'replace', 'cart_id', cart['cart_id'], 'version', cart['version'])
+return cart['version']
+"""
+
+ADD_ITEM = _WRITE_CART + """
+local raw = redis.call('GET', KEYS[1])
+local cart
+if raw then
+    cart = decode_cart(raw)
+else
+    cart = {cart_id = ARGV[1], items = {}, epoch = ARGV[5]}
+end
+
+local item
+for _, candidate in ipairs(cart['items']) do
+    if candidate['item_name'] == ARGV[2] then
+        item = candidate
+        break
+    end
+end
+
+if item then
+    item['quantity'] = item['quantity'] + tonumber(ARGV[3])
+else
+    item = {item_id = ARGV[4], item_name = ARGV[2], quantity = tonumber(ARGV[3])}
+    table.insert(cart['items'], item)
+end
+
+write_cart(cart)
+emit_event(
+    'type', 'add', 'cart_id', ARGV[1], 'version', cart['version'],
+    'item_id', item['item_id'], 'quantity', item['quantity']
+)
+return {item['item_id'], item['quantity']}
+"""
+
+REMOVE_QUANTITY = _WRITE_CART + """
+local quantity = tonumber(ARGV[2])
+if quantity <= 0 then
+    return 0
+end
+
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return 0
+end
+
+local cart = decode_cart(raw)
+for index, item in ipairs(cart['items']) do
+    if item['item_id'] == ARGV[1] then
+        local removed
+        local remaining = 0
+        if item['quantity'] <= quantity then
+            removed = item['quantity']
+            table.remove(cart['items'], index)
+        else
+            removed = quantity
+            item['quantity'] = item['quantity'] - quantity
+            remaining = item['quantity']
+        end
+        write_cart(cart)
+        emit_event(
+            'type', 'remove', 'cart_id', cart['cart_id'], 'version', cart['version'],
+            'item_id', ARGV[1], 'quantity', remaining
+        )
+        return removed
+    end
+end
+
+return 0
+"""
+
+DELETE_ITEM = _WRITE_CART + """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return 0
+end
+
+local cart = decode_cart(raw)
+for index, item in ipairs(cart['items']) do
+    if item['item_id'] == ARGV[1] then
+        table.remove(cart['items'], index)
+        write_cart(cart)
+        emit_event('type', 'delete_item', 'cart_id', cart['cart_id'], 'version', cart['version'], 'item_id', ARGV[1])
+        return 1
+    end
+end
+
+return 0
+"""
+
+APPLY_OPERATIONS = _WRITE_CART + """
+local raw = redis.call('GET', KEYS[1])
+local cart
+if raw then
+    cart = decode_cart(raw)
+else
+    cart = {cart_id = ARGV[1], items = {}}
+end
+
+local expected = tonumber(ARGV[3])
+if expected >= 0 and expected ~= (cart['version'] or 0) then
+    return false
+end
+if ARGV[4] ~= '*' and ARGV[4] ~= (cart['epoch'] or '') then
+    return false
+end
+if not raw then
+    cart['epoch'] = ARGV[5]
+end
+
+local by_id = {}
+local by_name = {}
+for _, item in ipairs(cart['items']) do
+    by_id[item['item_id']] = item
+    by_name[item['item_name']] = item
+end
+
+local changed = false
+local results = {}
+local events = {}
+for index, operation in ipairs(cjson.decode(ARGV[2])) do
+    local op = operation['op']
+    if op == 'add' then
+        local item = by_name[operation['item_name']]
+        if item then
+            item['quantity'] = item['quantity'] + operation['quantity']
+        else
+            item = {
+                item_id = operation['item_id'],
+                item_name = operation['item_name'],
+                quantity = operation['quantity']
+            }
+            table.insert(cart['items'], item)
+            by_id[item['item_id']] = item
+            by_name[item['item_name']] = item
+        end
+        changed = true
+        table.insert(events, {'add', item['item_id'], item['quantity']})
+        results[index] = {op, item['item_id'], item['item_name'], item['quantity']}
+    elseif op == 'remove' then
+        local item = by_id[operation['item_id']]
+        local removed = 0
+        if item then
+            if item['quantity'] <= operation['quantity'] then
+                removed = item['quantity']
+                item['removed'] = true
+                by_id[item['item_id']] = nil
+                by_name[item['item_name']] = nil
+            else
+                removed = operation['quantity']
+                item['quantity'] = item['quantity'] - operation['quantity']
+            end
+            changed = true
+            table.insert(events, {'remove', item['item_id'], item['removed'] and 0 or item['quantity']})
+        end
+        results[index] = {op, removed}
+    else
+        local item = by_id[operation['item_id']]
+        if item then
+            item['removed'] = true
+            by_id[item['item_id']] = nil
+            by_name[item['item_name']] = nil
+            changed = true
+            table.insert(events, {'delete_item', item['item_id']})
+        end
+        results[index] = {op, item and 1 or 0}
+    end
+end
+
+if changed then
+    local items = {}
+    for _, item in ipairs(cart['items']) do
+        if not item['removed'] then
+            table.insert(items, item)
+        end
+    end
+    cart['items'] = items
+    write_cart(cart)
+    for _, event in ipairs(events) do
+        emit_event(
+            'type', event[1], 'cart_id', cart['cart_id'], 'version', cart['version'],
+            'item_id', event[2], 'quantity', event[3]
+        )
+    end
+end
+
+-- Results go back as Redis arrays, so quantities reach the client as integers rather than cjson's rounded numbers.
+return results
+"""
+
+DELETE_CART = EMIT_EVENT + """
+redis.call('DEL', KEYS[2])
+if redis.call('DEL', KEYS[1]) == 0 then
+    return 0
+end
+
+emit_event('type', 'delete_cart', 'cart_id', ARGV[1])
+return 1
+"""
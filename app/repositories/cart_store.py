@@ -0,0 +1,120 @@
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from app.schemas.cart_lines import CartLines
+from app.schemas.models import (
+    Cart,
+    CartAgeBucket,
+    CartAgeReport,
+    CartBulkResult,
+    CartOperation,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    ClearJob,
+    Item
+)
+
+AGE_BUCKETS = [3600, 86400, 604800]
+
+
+class CartStore:
+
+    def get_carts(self, cursor: int = 0, limit: int = 100) -> CartPage:
+        raise NotImplementedError
+
+    def get_many(self, cart_ids: List[UUID]) -> CartBulkResult:
+        raise NotImplementedError
+
+    def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        raise NotImplementedError
+
+    def get_lines(self, cart_id: UUID) -> Optional[CartLines]:
+        raise NotImplementedError
+
+    def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        raise NotImplementedError
+
+    def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        raise NotImplementedError
+
+    def save_cart(
+            self,
+            cart: Cart,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        raise NotImplementedError
+
+    def save_lines(
+            self,
+            lines: CartLines,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        raise NotImplementedError
+
+    def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        raise NotImplementedError
+
+    def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        raise NotImplementedError
+
+    def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
+        raise NotImplementedError
+
+    def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        raise NotImplementedError
+
+    def sample_ages(
+            self,
+            cursor: int = 0,
+            count: int = 1000,
+            bounds: List[int] = AGE_BUCKETS
+    ) -> Tuple[int, CartAgeReport]:
+        raise NotImplementedError
+
+    def delete_cart(self, cart_id: UUID) -> bool:
+        raise NotImplementedError
+
+    def unlink_carts(self, cursor: int = 0, count: int = 1000) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def ping(self) -> bool:
+        raise NotImplementedError
+
+    def warm_up(self, connections: int):
+        raise NotImplementedError
+
+
+class ClearJobStore:
+
+    def get_job(self, job_id: UUID) -> Optional[ClearJob]:
+        raise NotImplementedError
+
+    def save_job(self, job: ClearJob):
+        raise NotImplementedError
+
+
+def new_age_report(bounds: List[int]) -> CartAgeReport:
+    return CartAgeReport(buckets=[CartAgeBucket(max_age=bound) for bound in sorted(bounds)] + [CartAgeBucket()])
+
+
+def count_cart_age(report: CartAgeReport, ttl: Optional[int], remaining: int):
+    # Every write and renewal resets the expiry to the configured TTL, so a cart's idle time is the TTL minus what
+    # remains of it.
+    if remaining == -2:
+        return
+    if remaining == -1:
+        report.without_expiry += 1
+        return
+
+    age = max((ttl or 0) - remaining, 0)
+    bucket = next(bucket for bucket in report.buckets if bucket.max_age is None or age <= bucket.max_age)
+    bucket.count += 1
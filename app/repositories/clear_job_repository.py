@@ -0,0 +1,32 @@
+from typing import Optional
+from uuid import UUID
+
+from injector import inject
+from redis import Redis
+
+from app.repositories.cart_store import ClearJobStore
+from app.schemas.models import ClearJob
+
+JOB_TTL = 86400
+
+
+class ClearJobRepository(ClearJobStore):
+
+    @inject
+    def __init__(self, redis_client: Redis, key_prefix: str = "cart-job:"):
+        self._redis_client = redis_client
+        self._key_prefix = key_prefix
+
+    def get_job(self, job_id: UUID) -> Optional[ClearJob]:
+        read = self._redis_client.get(f"{self._key_prefix}{job_id}")
+        if read:
+            return ClearJob.model_validate_json(read)
+        else:
+            return None
+
+    def save_job(self, job: ClearJob):
+        self._redis_client.set(
+            name=f"{self._key_prefix}{job.job_id}",
+            value=job.model_dump_json(),
+            ex=JOB_TTL
+        )
@@ -0,0 +1,183 @@
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from injector import inject
+from redis import Redis
+
+from app.metrics import instrumented, timed
+from app.repositories import hash_cart_scripts
+from app.repositories.cart_codecs import CartCodec, JsonCartCodec
+from app.repositories.cart_repository import CartRepository, epoch_arg, version_arg
+from app.schemas.cart_lines import CartLines, lines_from_cart
+from app.schemas.models import Cart, CartSummary, Item
+
+SUMMARY_FIELDS = ["cart_id", "version", "lines", "quantity", "epoch"]
+
+
+@instrumented("repository")
+class HashCartRepository(CartRepository):
+
+    @inject
+    def __init__(
+            self,
+            redis_client: Redis,
+            codec: CartCodec = JsonCartCodec(),
+            ttl: Optional[int] = None,
+            sliding_ttl: bool = False,
+            key_prefix: str = "",
+            events_key: Optional[str] = None
+    ):
+        super().__init__(
+            redis_client,
+            codec,
+            ttl=ttl,
+            sliding_ttl=sliding_ttl,
+            key_prefix=key_prefix,
+            events_key=events_key
+        )
+        self._save_cart = redis_client.register_script(hash_cart_scripts.SAVE_CART)
+        self._add_item = redis_client.register_script(hash_cart_scripts.ADD_ITEM)
+        self._remove_quantity = redis_client.register_script(hash_cart_scripts.REMOVE_QUANTITY)
+        self._delete_item = redis_client.register_script(hash_cart_scripts.DELETE_ITEM)
+        self._apply_operations = redis_client.register_script(hash_cart_scripts.APPLY_OPERATIONS)
+
+    def _read_carts(self, keys: List[str]) -> List[Optional[Cart]]:
+        pipeline = self._redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.hgetall(key)
+
+        return [hash_to_cart(fields) if fields else None for fields in pipeline.execute()]
+
+    def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        fields = self._read_hash(cart_id)
+        if fields:
+            return hash_to_cart(fields)
+        else:
+            return None
+
+    def get_lines(self, cart_id: UUID) -> Optional[CartLines]:
+        fields = self._read_hash(cart_id)
+        if fields:
+            return hash_to_lines(fields)
+        else:
+            return None
+
+    def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        key = self._key(cart_id)
+        fields = [f"name:{item_id}", f"qty:{item_id}"]
+        if self._sliding_ttl and self._ttl:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            pipeline.hmget(key, fields)
+            pipeline.expire(key, self._ttl)
+            (item_name, quantity), _ = pipeline.execute()
+        else:
+            item_name, quantity = self._redis_client.hmget(key, fields)
+        if item_name is not None:
+            return Item(item_id=item_id, item_name=item_name, quantity=int(quantity))
+        else:
+            return None
+
+    def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        key = self._key(cart_id)
+        if self._sliding_ttl and self._ttl:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            pipeline.hmget(key, SUMMARY_FIELDS)
+            pipeline.expire(key, self._ttl)
+            fields, _ = pipeline.execute()
+        else:
+            fields = self._redis_client.hmget(key, SUMMARY_FIELDS)
+        if fields[0] is None:
+            return None
+        if fields[2] is None:
+            cart = self.get_cart(cart_id)
+            return cart.summary() if cart else None
+        return fields_to_summary(fields)
+
+    def save_cart(
+            self,
+            cart: Cart,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        fields = [value for field in cart_to_hash(cart).items() for value in field]
+        return self._save_cart(
+            keys=self._keys(cart.cart_id),
+            args=fields + [version_arg(expected_version), epoch_arg(expected_epoch), self._ttl or 0]
+        )
+
+    def save_lines(
+            self,
+            lines: CartLines,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        fields = [value for field in lines_to_hash(lines).items() for value in field]
+        return self._save_cart(
+            keys=self._keys(lines.cart_id),
+            args=fields + [version_arg(expected_version), epoch_arg(expected_epoch), self._ttl or 0]
+        )
+
+    def _read_hash(self, cart_id: UUID) -> Dict[str, str]:
+        key = self._key(cart_id)
+        if self._sliding_ttl and self._ttl:
+            pipeline = self._redis_client.pipeline(transaction=False)
+            pipeline.hgetall(key)
+            pipeline.expire(key, self._ttl)
+            fields, _ = pipeline.execute()
+            return fields
+        return self._redis_client.hgetall(key)
+
+
+@timed("codec")
+def hash_to_cart(fields: Dict[str, str]) -> Cart:
+    return hash_to_lines(fields).to_cart()
+
+
+@timed("codec")
+def hash_to_lines(fields: Dict[str, str]) -> CartLines:
+    names = {}
+    quantities = {}
+    for field, value in fields.items():
+        kind, _, item_id = field.partition(":")
+        if kind == "name":
+            names[item_id] = value
+        elif kind == "qty":
+            quantities[item_id] = int(value)
+
+    return CartLines(
+        fields["cart_id"],
+        int(fields.get("version", 0)),
+        ((item_id, item_name, quantities[item_id]) for item_id, item_name in names.items()),
+        fields.get("epoch", "")
+    )
+
+
+@timed("codec")
+def cart_to_hash(cart: Cart) -> Dict[str, str]:
+    return lines_to_hash(lines_from_cart(cart))
+
+
+@timed("codec")
+def lines_to_hash(lines: CartLines) -> Dict[str, str]:
+    fields = {"cart_id": lines.cart_id}
+    if lines.epoch:
+        fields["epoch"] = lines.epoch
+    for item_id, item_name, quantity in zip(lines.item_ids, lines.item_names, lines.quantities):
+        fields[f"id:{item_name}"] = item_id
+        fields[f"name:{item_id}"] = item_name
+        fields[f"qty:{item_id}"] = str(quantity)
+    fields["lines"] = str(len(lines))
+    fields["quantity"] = str(lines.total_quantity())
+
+    return fields
+
+
+def fields_to_summary(fields: List[Optional[str]]) -> CartSummary:
+    cart_id, version, lines, quantity, epoch = fields
+    return CartSummary(
+        cart_id=cart_id,
+        version=int(version or 0),
+        epoch=epoch or "",
+        line_count=int(lines),
+        total_quantity=int(quantity)
+    )
@@ -0,0 +1,251 @@
+from app.repositories.cart_scripts import EMIT_EVENT
+
+_TOUCH_CART = EMIT_EVENT + """
+local ttl = tonumber(ARGV[#ARGV])
+
+local function touch_cart()
+    local version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+    if ttl > 0 then
+        redis.call('EXPIRE', KEYS[1], ttl)
+    end
+    return version
+end
+
+local function count_items()
+    -- Carts written before the line and quantity counters existed get them once, on their next write.
+    if redis.call('HEXISTS', KEYS[1], 'lines') == 1 or redis.call('EXISTS', KEYS[1]) == 0 then
+        return
+    end
+
+    local lines = 0
+    local quantity = 0
+    local fields = redis.call('HGETALL', KEYS[1])
+    for index = 1, #fields, 2 do
+        if string.sub(fields[index], 1, 4) == 'qty:' then
+            lines = lines + 1
+            quantity = quantity + tonumber(fields[index + 1])
+        end
+    end
+    redis.call('HSET', KEYS[1], 'lines', lines, 'quantity', quantity)
+end
+
+local function adjust_counts(lines, quantity)
+    redis.call('HINCRBY', KEYS[1], 'lines', lines)
+    redis.call('HINCRBY', KEYS[1], 'quantity', quantity)
+end
+"""
+
+SAVE_CART = _TOUCH_CART + """
+local version = tonumber(redis.call('HGET', KEYS[1], 'version')) or 0
+local epoch = redis.call('HGET', KEYS[1], 'epoch')
+local expected = tonumber(ARGV[#ARGV - 2])
+if expected >= 0 and expected ~= version then
+    return false
+end
+if ARGV[#ARGV - 1] ~= '*' and ARGV[#ARGV - 1] ~= (epoch or '') then
+    return false
+end
+
+redis.call('DEL', KEYS[1])
+for index = 1, #ARGV - 3, 2 do
+    redis.call('HSET', KEYS[1], ARGV[index], ARGV[index + 1])
+end
+-- A cart keeps the epoch it was created with, the one it is saved with only counts when it is new.
+if epoch then
+    redis.call('HSET', KEYS[1], 'epoch', epoch)
+end
+redis.call('HSET', KEYS[1], 'version', version)
+version = touch_cart()
+emit_event('type', 'replace', 'cart_id', redis.call('HGET', KEYS[1], 'cart_id'), 'version', version)
+return version
+"""
+
+ADD_ITEM = _TOUCH_CART + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], 'epoch', ARGV[5])
+end
+count_items()
+local item_id = redis.call('HGET', KEYS[1], 'id:' .. ARGV[2])
+local quantity
+if item_id then
+    quantity = redis.call('HINCRBY', KEYS[1], 'qty:' .. item_id, ARGV[3])
+    adjust_counts(0, ARGV[3])
+else
+    item_id = ARGV[4]
+    quantity = tonumber(ARGV[3])
+    redis.call(
+        'HSET', KEYS[1],
+        'cart_id', ARGV[1],
+        'id:' .. ARGV[2], item_id,
+        'name:' .. item_id, ARGV[2],
+        'qty:' .. item_id, quantity
+    )
+    adjust_counts(1, quantity)
+end
+
+local version = touch_cart()
+emit_event('type', 'add', 'cart_id', ARGV[1], 'version', version, 'item_id', item_id, 'quantity', quantity)
+return {item_id, quantity}
+"""
+
+REMOVE_QUANTITY = _TOUCH_CART + """
+local requested = tonumber(ARGV[2])
+if requested <= 0 then
+    return 0
+end
+
+count_items()
+local quantity = tonumber(redis.call('HGET', KEYS[1], 'qty:' .. ARGV[1]))
+if not quantity then
+    return 0
+end
+
+local removed = requested
+local remaining = 0
+if quantity <= requested then
+    local name = redis.call('HGET', KEYS[1], 'name:' .. ARGV[1])
+    redis.call('HDEL', KEYS[1], 'qty:' .. ARGV[1], 'name:' .. ARGV[1], 'id:' .. name)
+    adjust_counts(-1, -quantity)
+    removed = quantity
+else
+    remaining = redis.call('HINCRBY', KEYS[1], 'qty:' .. ARGV[1], -requested)
+    adjust_counts(0, -requested)
+end
+
+local version = touch_cart()
+emit_event(
+    'type', 'remove', 'cart_id', redis.call('HGET', KEYS[1], 'cart_id'), 'version', version,
+    'item_id', ARGV[1], 'quantity', remaining
+)
+return removed
+"""
+
+DELETE_ITEM = _TOUCH_CART + """
+count_items()
+local name = redis.call('HGET', KEYS[1], 'name:' .. ARGV[1])
+if not name then
+    return 0
+end
+
+local quantity = tonumber(redis.call('HGET', KEYS[1], 'qty:' .. ARGV[1]))
+redis.call('HDEL', KEYS[1], 'qty:' .. ARGV[1], 'name:' .. ARGV[1], 'id:' .. name)
+adjust_counts(-1, -quantity)
+local version = touch_cart()
+emit_event(
+    'type', 'delete_item', 'cart_id', redis.call('HGET', KEYS[1], 'cart_id'), 'version', version,
+    'item_id', ARGV[1]
+)
+return 1
+"""
+
+APPLY_OPERATIONS = _TOUCH_CART + """
+local expected = tonumber(ARGV[3])
+if expected >= 0 and expected ~= (tonumber(redis.call('HGET', KEYS[1], 'version')) or 0) then
+    return false
+end
+if ARGV[4] ~= '*' and ARGV[4] ~= (redis.call('HGET', KEYS[1], 'epoch') or '') then
+    return false
+end
+local created = redis.call('EXISTS', KEYS[1]) == 0
+
+count_items()
+local changed = false
+local results = {}
+local events = {}
+for index, operation in ipairs(cjson.decode(ARGV[2])) do
+    local op = operation['op']
+    if op == 'add' then
+        local item_id = redis.call('HGET', KEYS[1], 'id:' .. operation['item_name'])
+        local quantity
+        if item_id then
+            quantity = redis.call('HINCRBY', KEYS[1], 'qty:' .. item_id, operation['quantity'])
+            adjust_counts(0, operation['quantity'])
+        else
+            item_id = operation['item_id']
+            quantity = operation['quantity']
+            redis.call(
+                'HSET', KEYS[1],
+                'cart_id', ARGV[1],
+                'id:' .. operation['item_name'], item_id,
+                'name:' .. item_id, operation['item_name'],
+                'qty:' .. item_id, quantity
+            )
+            adjust_counts(1, quantity)
+        end
+        changed = true
+        table.insert(events, {'add', item_id, quantity})
+        results[index] = {op, item_id, operation['item_name'], quantity}
+    else
+        local name = redis.call('HGET', KEYS[1], 'name:' .. operation['item_id'])
+        local quantity = tonumber(redis.call('HGET', KEYS[1], 'qty:' .. operation['item_id']))
+        local removed = 0
+        if name and (op == 'delete' or quantity <= operation['quantity']) then
+            redis.call('HDEL', KEYS[1], 'qty:' .. operation['item_id'], 'name:' .. operation['item_id'], 'id:' .. name)
+            adjust_counts(-1, -quantity)
+            removed = quantity
+            changed = true
+            if op == 'delete' then
+                table.insert(events, {'delete_item', operation['item_id']})
+            else
+                table.insert(events, {'remove', operation['item_id'], 0})
+            end
+        elseif name then
+            local remaining = redis.call('HINCRBY', KEYS[1], 'qty:' .. operation['item_id'], -operation['quantity'])
+            adjust_counts(0, -operation['quantity'])
+            removed = operation['quantity']
+            changed = true
+            table.insert(events, {'remove', operation['item_id'], remaining})
+        end
+        if op == 'delete' then
+            results[index] = {op, name and 1 or 0}
+        else
+            results[index] = {op, removed}
+        end
+    end
+end
+
+if changed then
+    if created then
+        redis.call('HSET', KEYS[1], 'epoch', ARGV[5])
+    end
+    local version = touch_cart()
+    local cart_id = redis.call('HGET', KEYS[1], 'cart_id')
+    for _, event in ipairs(events) do
+        emit_event(
+            'type', event[1], 'cart_id', cart_id, 'version', version,
+            'item_id', event[2], 'quantity', event[3]
+        )
+    end
+end
+return results
+"""
+
+MIGRATE_CART = """
+if redis.call('TYPE', KEYS[1])['ok'] ~= 'string' then
+    return 0
+end
+
+local pttl = redis.call('PTTL', KEYS[1])
+local cart = cjson.decode(redis.call('GET', KEYS[1]))
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('HSET', KEYS[1], 'cart_id', cart['cart_id'], 'version', cart['version'] or 0)
+if cart['epoch'] then
+    redis.call('HSET', KEYS[1], 'epoch', cart['epoch'])
+end
+local quantity = 0
+for _, item in ipairs(cart['items']) do
+    quantity = quantity + item['quantity']
+    redis.call(
+        'HSET', KEYS[1],
+        'id:' .. item['item_name'], item['item_id'],
+        'name:' .. item['item_id'], item['item_name'],
+        'qty:' .. item['item_id'], item['quantity']
+    )
+end
+redis.call('HSET', KEYS[1], 'lines', #cart['items'], 'quantity', quantity)
+if pttl > 0 then
+    redis.call('PEXPIRE', KEYS[1], pttl)
+end
+
+return 1
+"""
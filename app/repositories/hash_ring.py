@@ -0,0 +1,21 @@
+import hashlib
+from bisect import bisect
+from typing import List
+
+
+class HashRing:
+
+    def __init__(self, nodes: List[str], vnodes: int = 160):
+        # Every node owns many points on the ring, so its share of the keys stays even and adding a node takes a
+        # slice from each existing node instead of halving one of them.
+        points = sorted((ring_hash(f"{node}#{index}"), node) for node in set(nodes) for index in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+        self.nodes = sorted(set(nodes))
+
+    def node(self, key: str) -> str:
+        return self._nodes[bisect(self._hashes, ring_hash(key)) % len(self._hashes)]
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
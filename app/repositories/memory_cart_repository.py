@@ -0,0 +1,440 @@
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from app.metrics import instrumented
+from app.repositories.cart_store import AGE_BUCKETS, CartStore, ClearJobStore, count_cart_age, new_age_report
+from app.repositories.clear_job_repository import JOB_TTL
+from app.schemas.cart_lines import CartLines
+from app.schemas.models import (
+    AddItemOperation,
+    Cart,
+    CartAgeReport,
+    CartBulkResult,
+    CartOperation,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    ClearJob,
+    Item,
+    RemoveQuantityOperation,
+    new_epoch
+)
+
+DEFAULT_SHARDS = 64
+
+
+class StoredCart:
+    __slots__ = ("seq", "version", "epoch", "lines", "names", "quantity", "expires_at")
+
+    def __init__(self, seq: int, epoch: str):
+        self.seq = seq
+        self.version = 0
+        self.epoch = epoch
+        # Lines are keyed by the item id's text, the form carts are validated from and handed out as lines in.
+        self.lines: Dict[str, list] = {}
+        self.names: Dict[str, str] = {}
+        self.quantity = 0
+        self.expires_at: Optional[float] = None
+
+    def to_cart(self, cart_id: UUID) -> Cart:
+        # Validating plain dicts runs in pydantic's core and is faster than constructing each item in Python.
+        return Cart.model_validate({
+            "cart_id": cart_id,
+            "items": [
+                {"item_id": item_id, "item_name": item_name, "quantity": quantity}
+                for item_id, (item_name, quantity) in self.lines.items()
+            ],
+            "version": self.version,
+            "epoch": self.epoch
+        })
+
+    def to_lines(self, cart_id: UUID) -> CartLines:
+        return CartLines(
+            str(cart_id),
+            self.version,
+            ((item_id, item_name, quantity) for item_id, (item_name, quantity) in self.lines.items()),
+            self.epoch
+        )
+
+    def replace(self, lines: Iterable[Tuple[str, str, int]]):
+        self.lines = {}
+        self.names = {}
+        self.quantity = 0
+        for item_id, item_name, quantity in lines:
+            self.lines[item_id] = [item_name, quantity]
+            self.names[item_name] = item_id
+            self.quantity += quantity
+
+    def add(self, item_name: str, quantity: int) -> Item:
+        item_id = self.names.get(item_name)
+        if item_id is None:
+            item_id = str(uuid.uuid4())
+            self.lines[item_id] = [item_name, quantity]
+            self.names[item_name] = item_id
+        else:
+            self.lines[item_id][1] += quantity
+        self.quantity += quantity
+
+        return Item(item_id=item_id, item_name=item_name, quantity=self.lines[item_id][1])
+
+    def remove(self, item_id: UUID, quantity: int) -> Optional[int]:
+        line = self.lines.get(str(item_id))
+        if line is None:
+            return None
+
+        if line[1] <= quantity:
+            removed = line[1]
+            del self.lines[str(item_id)]
+            del self.names[line[0]]
+        else:
+            removed = quantity
+            line[1] -= quantity
+        self.quantity -= removed
+
+        return removed
+
+    def delete(self, item_id: UUID) -> bool:
+        line = self.lines.pop(str(item_id), None)
+        if line is None:
+            return False
+
+        del self.names[line[0]]
+        self.quantity -= line[1]
+        return True
+
+
+class CartShard:
+    __slots__ = ("lock", "carts", "next_seq", "seqs", "ids", "dropped")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.carts: Dict[UUID, StoredCart] = {}
+        self.next_seq = 1
+        # The carts in creation order for paging. Entries of dropped carts stay behind and are skipped until they
+        # make up half the index, which is then rebuilt.
+        self.seqs: List[int] = []
+        self.ids: List[UUID] = []
+        self.dropped = 0
+
+    def add(self, cart_id: UUID, stored: StoredCart):
+        self.carts[cart_id] = stored
+        self.seqs.append(stored.seq)
+        self.ids.append(cart_id)
+
+    def drop(self, cart_id: UUID):
+        del self.carts[cart_id]
+        self.dropped += 1
+
+    def compact(self):
+        if self.dropped * 2 <= len(self.ids):
+            return
+
+        live = [(seq, cart_id) for seq, cart_id in zip(self.seqs, self.ids) if self.indexes(seq, cart_id)]
+        self.seqs = [seq for seq, _ in live]
+        self.ids = [cart_id for _, cart_id in live]
+        self.dropped = 0
+
+    def indexes(self, seq: int, cart_id: UUID) -> bool:
+        stored = self.carts.get(cart_id)
+        return stored is not None and stored.seq == seq
+
+
+@instrumented("repository")
+class MemoryCartRepository(CartStore):
+
+    def __init__(self, shards: int = DEFAULT_SHARDS, ttl: Optional[int] = None, sliding_ttl: bool = False):
+        self._shards = [CartShard() for _ in range(shards)]
+        self._ttl = ttl
+        self._sliding_ttl = sliding_ttl
+
+    def get_carts(self, cursor: int = 0, limit: int = 100) -> CartPage:
+        cursor, carts = self._scan(
+            cursor,
+            limit,
+            lambda shard, batch: [stored.to_cart(cart_id) for cart_id, stored in batch]
+        )
+        return CartPage(carts=carts, next_cursor=cursor or None)
+
+    def get_many(self, cart_ids: List[UUID]) -> CartBulkResult:
+        result = CartBulkResult(carts=[], missing_cart_ids=[])
+        for cart_id in dict.fromkeys(cart_ids):
+            shard = self._shard(cart_id)
+            with shard.lock:
+                stored = self._live(shard, cart_id)
+                if stored:
+                    result.carts.append(stored.to_cart(cart_id))
+                else:
+                    result.missing_cart_ids.append(cart_id)
+
+        return result
+
+    def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        shard = self._shard(cart_id)
+        with shard.lock:
+            stored = self._read(shard, cart_id)
+            return stored.to_cart(cart_id) if stored else None
+
+    def get_lines(self, cart_id: UUID) -> Optional[CartLines]:
+        shard = self._shard(cart_id)
+        with shard.lock:
+            stored = self._read(shard, cart_id)
+            return stored.to_lines(cart_id) if stored else None
+
+    def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        shard = self._shard(cart_id)
+        with shard.lock:
+            stored = self._read(shard, cart_id)
+            line = stored.lines.get(str(item_id)) if stored else None
+            if line is None:
+                return None
+            return Item(item_id=item_id, item_name=line[0], quantity=line[1])
+
+    def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        shard = self._shard(cart_id)
+        with shard.lock:
+            stored = self._read(shard, cart_id)
+            if stored is None:
+                return None
+            return CartSummary(
+                cart_id=cart_id,
+                version=stored.version,
+                epoch=stored.epoch,
+                line_count=len(stored.lines),
+                total_quantity=stored.quantity
+            )
+
+    def save_cart(
+            self,
+            cart: Cart,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        lines = ((str(item.item_id), item.item_name, item.quantity) for item in cart.items)
+        return self._replace(cart.cart_id, cart.epoch, lines, expected_version, expected_epoch)
+
+    def save_lines(
+            self,
+            lines: CartLines,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        rows = zip(lines.item_ids, lines.item_names, lines.quantities)
+        return self._replace(UUID(lines.cart_id), lines.epoch, rows, expected_version, expected_epoch)
+
+    def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        shard = self._shard(cart_id)
+        with shard.lock:
+            stored = self._live(shard, cart_id) or self._create(shard, cart_id, new_epoch())
+            item = stored.add(item_name, quantity)
+            self._write(stored)
+            return item
+
+    def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        if quantity <= 0:
+            return 0
+
+        shard = self._shard(cart_id)
+        with shard.lock:
+            stored = self._live(shard, cart_id)
+            removed = stored.remove(item_id, quantity) if stored else None
+            if removed is None:
+                return 0
+            self._write(stored)
+            return removed
+
+    def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
+        shard = self._shard(cart_id)
+        with shard.lock:
+            stored = self._live(shard, cart_id)
+            if not stored or not stored.delete(item_id):
+                return False
+            self._write(stored)
+            return True
+
+    def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        if not operations:
+            return []
+
+        shard = self._shard(cart_id)
+        with shard.lock:
+            stored = self._live(shard, cart_id)
+            if not matches(stored, expected_version, expected_epoch):
+                return None
+
+            changed = False
+            results = []
+            for operation in operations:
+                if isinstance(operation, AddItemOperation):
+                    stored = stored or self._create(shard, cart_id, new_epoch())
+                    item = stored.add(operation.item_name, operation.quantity)
+                    changed = True
+                    results.append(CartOperationResult(op=operation.op, item=item))
+                elif isinstance(operation, RemoveQuantityOperation):
+                    removed = stored.remove(operation.item_id, operation.quantity) if stored else None
+                    changed = changed or removed is not None
+                    results.append(CartOperationResult(op=operation.op, removed=removed or 0))
+                else:
+                    deleted = bool(stored) and stored.delete(operation.item_id)
+                    changed = changed or deleted
+                    results.append(CartOperationResult(op=operation.op, deleted=deleted))
+
+            if changed:
+                self._write(stored)
+            return results
+
+    def sample_ages(
+            self,
+            cursor: int = 0,
+            count: int = 1000,
+            bounds: List[int] = AGE_BUCKETS
+    ) -> Tuple[int, CartAgeReport]:
+        report = new_age_report(bounds)
+
+        def tally(shard: CartShard, batch: List[Tuple[UUID, StoredCart]]) -> List[UUID]:
+            # The scan has already dropped the carts that expired.
+            now = time.monotonic()
+            for _, stored in batch:
+                remaining = -1 if stored.expires_at is None else round(stored.expires_at - now)
+                count_cart_age(report, ttl=self._ttl, remaining=remaining)
+            return [cart_id for cart_id, _ in batch]
+
+        cursor, _ = self._scan(cursor, count, tally)
+        return cursor, report
+
+    def delete_cart(self, cart_id: UUID) -> bool:
+        shard = self._shard(cart_id)
+        with shard.lock:
+            if self._live(shard, cart_id) is None:
+                return False
+            shard.drop(cart_id)
+            shard.compact()
+            return True
+
+    def unlink_carts(self, cursor: int = 0, count: int = 1000) -> Tuple[int, int]:
+        def unlink(shard: CartShard, batch: List[Tuple[UUID, StoredCart]]) -> List[UUID]:
+            for cart_id, _ in batch:
+                shard.drop(cart_id)
+            return [cart_id for cart_id, _ in batch]
+
+        cursor, unlinked = self._scan(cursor, count, unlink)
+        return cursor, len(unlinked)
+
+    def ping(self) -> bool:
+        return True
+
+    def warm_up(self, connections: int):
+        pass
+
+    def _scan(self, cursor: int, limit: int, take: Callable[[CartShard, list], list]) -> Tuple[int, list]:
+        # Each shard keeps its carts in creation order, numbered by a per shard sequence, so the page cursor can
+        # interleave the shard being read with the sequence number to resume from, like the cluster SCAN cursor.
+        shard_count = len(self._shards)
+        index, seq = cursor % shard_count, cursor // shard_count
+        found = []
+        while True:
+            shard = self._shards[index]
+            with shard.lock:
+                now = time.monotonic()
+                position = bisect_left(shard.seqs, seq)
+                batch = []
+                while position < len(shard.ids) and len(found) + len(batch) < limit:
+                    cart_id = shard.ids[position]
+                    if shard.indexes(shard.seqs[position], cart_id):
+                        stored = shard.carts[cart_id]
+                        if stored.expires_at is not None and stored.expires_at <= now:
+                            shard.drop(cart_id)
+                        else:
+                            batch.append((cart_id, stored))
+                    position += 1
+                found.extend(take(shard, batch))
+                resume = shard.seqs[position] if position < len(shard.seqs) else None
+                shard.compact()
+                if resume is not None:
+                    return resume * shard_count + index, found
+
+            index, seq = index + 1, 0
+            if index == shard_count:
+                return 0, found
+
+    def _shard(self, cart_id: UUID) -> CartShard:
+        return self._shards[hash(cart_id) % len(self._shards)]
+
+    def _live(self, shard: CartShard, cart_id: UUID) -> Optional[StoredCart]:
+        stored = shard.carts.get(cart_id)
+        if stored is not None and stored.expires_at is not None and stored.expires_at <= time.monotonic():
+            shard.drop(cart_id)
+            shard.compact()
+            return None
+        return stored
+
+    def _read(self, shard: CartShard, cart_id: UUID) -> Optional[StoredCart]:
+        stored = self._live(shard, cart_id)
+        if stored is not None and self._sliding_ttl and self._ttl:
+            stored.expires_at = time.monotonic() + self._ttl
+        return stored
+
+    def _replace(
+            self,
+            cart_id: UUID,
+            epoch: str,
+            lines: Iterable[Tuple[str, str, int]],
+            expected_version: Optional[int],
+            expected_epoch: Optional[str]
+    ) -> Optional[int]:
+        shard = self._shard(cart_id)
+        with shard.lock:
+            stored = self._live(shard, cart_id)
+            if not matches(stored, expected_version, expected_epoch):
+                return None
+
+            # A cart keeps the epoch it was created with, the one it is saved with only counts when it is new.
+            stored = stored or self._create(shard, cart_id, epoch)
+            stored.replace(lines)
+            self._write(stored)
+            return stored.version
+
+    def _create(self, shard: CartShard, cart_id: UUID, epoch: str) -> StoredCart:
+        stored = StoredCart(shard.next_seq, epoch)
+        shard.next_seq += 1
+        shard.add(cart_id, stored)
+        return stored
+
+    def _write(self, stored: StoredCart):
+        stored.version += 1
+        stored.expires_at = time.monotonic() + self._ttl if self._ttl else None
+
+
+def matches(stored: Optional[StoredCart], expected_version: Optional[int], expected_epoch: Optional[str]) -> bool:
+    if expected_version is not None and expected_version != (stored.version if stored else 0):
+        return False
+    return expected_epoch is None or expected_epoch == (stored.epoch if stored else "")
+
+
+class MemoryClearJobRepository(ClearJobStore):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[UUID, Tuple[ClearJob, float]] = {}
+
+    def get_job(self, job_id: UUID) -> Optional[ClearJob]:
+        job, expires_at = self._jobs.get(job_id, (None, 0.0))
+        if job is None or expires_at <= time.monotonic():
+            return None
+        return job.model_copy()
+
+    def save_job(self, job: ClearJob):
+        now = time.monotonic()
+        with self._lock:
+            for job_id in [job_id for job_id, (_, expires_at) in self._jobs.items() if expires_at <= now]:
+                del self._jobs[job_id]
+            self._jobs[job.job_id] = (job.model_copy(), now + JOB_TTL)
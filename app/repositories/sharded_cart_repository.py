@@ -0,0 +1,210 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from redis import ResponseError
+
+from app.repositories.cart_repository import CartRepository
+from app.repositories.cart_store import AGE_BUCKETS, CartStore
+from app.repositories.hash_ring import HashRing
+from app.schemas.cart_lines import CartLines
+from app.schemas.models import (
+    Cart,
+    CartAgeReport,
+    CartBulkResult,
+    CartOperation,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    Item
+)
+
+MOVED_LIMIT = 100000
+
+
+class ShardedCartRepository(CartStore):
+
+    def __init__(
+            self,
+            shards: Dict[str, CartRepository],
+            ring: HashRing,
+            previous_ring: Optional[HashRing] = None,
+            db: int = 0,
+            auth: Optional[str] = None
+    ):
+        self._shards = shards
+        self._ring = ring
+        self._previous_ring = previous_ring
+        self._db = db
+        self._auth = auth
+        self._nodes = sorted(shards)
+        self._moved: Set[UUID] = set()
+        self._executor = ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="cart-shard")
+
+    def get_carts(self, cursor: int = 0, limit: int = 100) -> CartPage:
+        # The page cursor interleaves the shard being listed with that shard's own cursor, like the cluster SCAN
+        # cursor, so listing, export and clear resume where they left off with a single integer.
+        index, shard_cursor = cursor % len(self._nodes), cursor // len(self._nodes)
+        carts = []
+        while True:
+            page = self._shards[self._nodes[index]].get_carts(cursor=shard_cursor, limit=limit - len(carts))
+            carts.extend(page.carts)
+            if page.next_cursor:
+                return CartPage(carts=carts, next_cursor=page.next_cursor * len(self._nodes) + index)
+
+            index, shard_cursor = index + 1, 0
+            if index == len(self._nodes):
+                return CartPage(carts=carts)
+            if len(carts) >= limit:
+                return CartPage(carts=carts, next_cursor=index)
+
+    def get_many(self, cart_ids: List[UUID]) -> CartBulkResult:
+        cart_ids = list(dict.fromkeys(cart_ids))
+        by_node: Dict[str, List[UUID]] = {}
+        moves: Dict[Tuple[str, str], List[UUID]] = {}
+        for cart_id in cart_ids:
+            node = self._ring.node(str(cart_id))
+            previous = self._previous_node(cart_id, node)
+            if previous is not None:
+                moves.setdefault((previous, node), []).append(cart_id)
+            by_node.setdefault(node, []).append(cart_id)
+        list(self._executor.map(lambda move: self._move(moves[move], *move), moves))
+
+        found = {}
+        for result in self._executor.map(lambda node: self._shards[node].get_many(by_node[node]), by_node):
+            found.update((cart.cart_id, cart) for cart in result.carts)
+
+        return CartBulkResult(
+            carts=[found[cart_id] for cart_id in cart_ids if cart_id in found],
+            missing_cart_ids=[cart_id for cart_id in cart_ids if cart_id not in found]
+        )
+
+    def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        return self._shard(cart_id).get_cart(cart_id)
+
+    def get_lines(self, cart_id: UUID) -> Optional[CartLines]:
+        return self._shard(cart_id).get_lines(cart_id)
+
+    def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        return self._shard(cart_id).get_item(cart_id, item_id)
+
+    def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        return self._shard(cart_id).get_summary(cart_id)
+
+    def save_cart(
+            self,
+            cart: Cart,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        return self._shard(cart.cart_id).save_cart(
+            cart,
+            expected_version=expected_version,
+            expected_epoch=expected_epoch
+        )
+
+    def save_lines(
+            self,
+            lines: CartLines,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        return self._shard(UUID(lines.cart_id)).save_lines(
+            lines,
+            expected_version=expected_version,
+            expected_epoch=expected_epoch
+        )
+
+    def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        return self._shard(cart_id).add_item(cart_id, item_name, quantity)
+
+    def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        return self._shard(cart_id).remove_quantity(cart_id, item_id, quantity)
+
+    def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
+        return self._shard(cart_id).delete_item(cart_id, item_id)
+
+    def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        return self._shard(cart_id).apply_operations(
+            cart_id,
+            operations,
+            expected_version=expected_version,
+            expected_epoch=expected_epoch
+        )
+
+    def sample_ages(
+            self,
+            cursor: int = 0,
+            count: int = 1000,
+            bounds: List[int] = AGE_BUCKETS
+    ) -> Tuple[int, CartAgeReport]:
+        index, shard_cursor = cursor % len(self._nodes), cursor // len(self._nodes)
+        shard_cursor, report = self._shards[self._nodes[index]].sample_ages(
+            cursor=shard_cursor,
+            count=count,
+            bounds=bounds
+        )
+        if shard_cursor:
+            return shard_cursor * len(self._nodes) + index, report
+        return (index + 1) % len(self._nodes), report
+
+    def delete_cart(self, cart_id: UUID) -> bool:
+        return self._shard(cart_id).delete_cart(cart_id)
+
+    def unlink_carts(self, cursor: int = 0, count: int = 1000) -> Tuple[int, int]:
+        index, shard_cursor = cursor % len(self._nodes), cursor // len(self._nodes)
+        shard_cursor, unlinked = self._shards[self._nodes[index]].unlink_carts(cursor=shard_cursor, count=count)
+        if shard_cursor:
+            return shard_cursor * len(self._nodes) + index, unlinked
+        return (index + 1) % len(self._nodes), unlinked
+
+    def ping(self) -> bool:
+        return all(self._executor.map(lambda node: self._shards[node].ping(), self._nodes))
+
+    def warm_up(self, connections: int):
+        list(self._executor.map(lambda node: self._shards[node].warm_up(connections), self._nodes))
+
+    def close(self):
+        for shard in self._shards.values():
+            shard.close()
+        self._executor.shutdown(wait=False)
+
+    def _shard(self, cart_id: UUID) -> CartRepository:
+        return self._shards[self._owner(cart_id)]
+
+    def _owner(self, cart_id: UUID) -> str:
+        node = self._ring.node(str(cart_id))
+        previous = self._previous_node(cart_id, node)
+        if previous is not None:
+            self._move([cart_id], previous, node)
+        return node
+
+    def _previous_node(self, cart_id: UUID, node: str) -> Optional[str]:
+        if self._previous_ring is None or cart_id in self._moved:
+            return None
+        previous = self._previous_ring.node(str(cart_id))
+        return previous if previous != node else None
+
+    def _move(self, cart_ids: List[UUID], source: str, target: str):
+        # While a node is added or removed a cart is moved to its new node the first time it is used. MIGRATE
+        # deletes it from the old node only once the new one holds it, so it is never missing from both.
+        host, _, port = target.rpartition(":")
+        try:
+            self._shards[source].move_carts(cart_ids, host, int(port), db=self._db, auth=self._auth)
+        except ResponseError as e:
+            # A worker still running with the old node list wrote the cart again after it was moved, the copy on the
+            # new node is kept.
+            if not str(e).startswith("BUSYKEY"):
+                raise
+
+        # Once tried a cart is not moved again by this worker, whatever a worker with the old node list writes to
+        # the old node afterwards is left to the rebalance tool. Forgetting the ids only costs another MIGRATE each.
+        if len(self._moved) >= MOVED_LIMIT:
+            self._moved.clear()
+        self._moved.update(cart_ids)
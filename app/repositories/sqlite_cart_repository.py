@@ -0,0 +1,464 @@
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from app.metrics import instrumented
+from app.repositories.cart_store import AGE_BUCKETS, CartStore, ClearJobStore, count_cart_age, new_age_report
+from app.repositories.clear_job_repository import JOB_TTL
+from app.schemas.cart_lines import CartLines
+from app.schemas.models import (
+    AddItemOperation,
+    Cart,
+    CartAgeReport,
+    CartBulkResult,
+    CartOperation,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    ClearJob,
+    Item,
+    RemoveQuantityOperation,
+    new_epoch
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS carts (
+    id INTEGER PRIMARY KEY,
+    cart_id TEXT NOT NULL UNIQUE,
+    version INTEGER NOT NULL,
+    epoch TEXT NOT NULL DEFAULT '',
+    expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    cart INTEGER NOT NULL REFERENCES carts (id) ON DELETE CASCADE,
+    item_id TEXT NOT NULL,
+    item_name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    UNIQUE (cart, item_id),
+    UNIQUE (cart, item_name)
+);
+CREATE TABLE IF NOT EXISTS clear_jobs (
+    job_id TEXT PRIMARY KEY,
+    job TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+LIVE = "(expires_at IS NULL OR expires_at > ?)"
+CHUNK_SIZE = 500
+
+
+class SqliteDatabase:
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self._path = path
+        self._timeout = timeout
+        self._local = threading.local()
+        connection = self.connection()
+        connection.executescript(SCHEMA)
+        # Databases created before carts had an epoch get the column, the carts already in them keep an empty one.
+        if "epoch" not in [column[1] for column in connection.execute("PRAGMA table_info(carts)")]:
+            connection.execute("ALTER TABLE carts ADD COLUMN epoch TEXT NOT NULL DEFAULT ''")
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None)
+            # In WAL mode with synchronous NORMAL a commit is appended to the log without waiting for the disk, and
+            # the log is synced in batches at checkpoints. A commit survives a crash of the process, only a crash of
+            # the machine can lose the last ones.
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        connection = self.connection()
+        # Writers take the write lock up front so two read-modify-write transactions cannot deadlock on upgrading.
+        connection.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+
+@instrumented("repository")
+class SqliteCartRepository(CartStore):
+
+    def __init__(self, database: SqliteDatabase, ttl: Optional[int] = None, sliding_ttl: bool = False):
+        self._database = database
+        self._ttl = ttl
+        self._sliding_ttl = sliding_ttl
+
+    def get_carts(self, cursor: int = 0, limit: int = 100) -> CartPage:
+        with self._database.transaction() as connection:
+            rows = connection.execute(
+                f"SELECT id, cart_id, version, epoch FROM carts WHERE id > ? AND {LIVE} ORDER BY id LIMIT ?",
+                (cursor, time.time(), limit)
+            ).fetchall()
+            carts = read_carts(connection, rows)
+
+        return CartPage(carts=carts, next_cursor=rows[-1][0] if len(rows) == limit else None)
+
+    def get_many(self, cart_ids: List[UUID]) -> CartBulkResult:
+        cart_ids = list(dict.fromkeys(cart_ids))
+        found = {}
+        with self._database.transaction() as connection:
+            for start in range(0, len(cart_ids), CHUNK_SIZE):
+                chunk = [str(cart_id) for cart_id in cart_ids[start:start + CHUNK_SIZE]]
+                rows = connection.execute(
+                    f"SELECT id, cart_id, version, epoch FROM carts "
+                    f"WHERE cart_id IN ({', '.join('?' * len(chunk))}) AND {LIVE}",
+                    (*chunk, time.time())
+                ).fetchall()
+                found.update((cart.cart_id, cart) for cart in read_carts(connection, rows))
+
+        return CartBulkResult(
+            carts=[found[cart_id] for cart_id in cart_ids if cart_id in found],
+            missing_cart_ids=[cart_id for cart_id in cart_ids if cart_id not in found]
+        )
+
+    def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        with self._database.transaction(write=self._renews) as connection:
+            row = self._read_row(connection, cart_id)
+            if row is None:
+                return None
+            return read_carts(connection, [(row[0], str(cart_id), row[1], row[2])])[0]
+
+    def get_lines(self, cart_id: UUID) -> Optional[CartLines]:
+        with self._database.transaction(write=self._renews) as connection:
+            row = self._read_row(connection, cart_id)
+            if row is None:
+                return None
+            lines = connection.execute(
+                "SELECT item_id, item_name, quantity FROM items WHERE cart = ? ORDER BY id",
+                (row[0],)
+            )
+            return CartLines(str(cart_id), row[1], lines, row[2])
+
+    def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        with self._database.transaction(write=self._renews) as connection:
+            row = self._read_row(connection, cart_id)
+            line = connection.execute(
+                "SELECT item_name, quantity FROM items WHERE cart = ? AND item_id = ?",
+                (row[0], str(item_id))
+            ).fetchone() if row else None
+            if line is None:
+                return None
+            return Item(item_id=item_id, item_name=line[0], quantity=line[1])
+
+    def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        with self._database.transaction(write=self._renews) as connection:
+            row = self._read_row(connection, cart_id)
+            if row is None:
+                return None
+            line_count, total_quantity = connection.execute(
+                "SELECT count(*), coalesce(sum(quantity), 0) FROM items WHERE cart = ?",
+                (row[0],)
+            ).fetchone()
+            return CartSummary(
+                cart_id=cart_id,
+                version=row[1],
+                epoch=row[2],
+                line_count=line_count,
+                total_quantity=total_quantity
+            )
+
+    def save_cart(
+            self,
+            cart: Cart,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        lines = ((str(item.item_id), item.item_name, item.quantity) for item in cart.items)
+        return self._replace(cart.cart_id, cart.epoch, lines, expected_version, expected_epoch)
+
+    def save_lines(
+            self,
+            lines: CartLines,
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[int]:
+        rows = zip(lines.item_ids, lines.item_names, lines.quantities)
+        return self._replace(UUID(lines.cart_id), lines.epoch, rows, expected_version, expected_epoch)
+
+    def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        with self._database.transaction(write=True) as connection:
+            row = self._current_row(connection, cart_id) or self._create_row(connection, cart_id, new_epoch())
+            item = add_line(connection, row[0], item_name, quantity)
+            self._write(connection, row)
+            return item
+
+    def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        if quantity <= 0:
+            return 0
+
+        with self._database.transaction(write=True) as connection:
+            row = self._current_row(connection, cart_id)
+            removed = remove_line(connection, row[0], item_id, quantity) if row else None
+            if removed is None:
+                return 0
+            self._write(connection, row)
+            return removed
+
+    def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
+        with self._database.transaction(write=True) as connection:
+            row = self._current_row(connection, cart_id)
+            if not row or not delete_line(connection, row[0], item_id):
+                return False
+            self._write(connection, row)
+            return True
+
+    def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        if not operations:
+            return []
+
+        with self._database.transaction(write=True) as connection:
+            row = self._current_row(connection, cart_id)
+            if not matches(row, expected_version, expected_epoch):
+                return None
+
+            changed = False
+            results = []
+            for operation in operations:
+                if isinstance(operation, AddItemOperation):
+                    row = row or self._create_row(connection, cart_id, new_epoch())
+                    item = add_line(connection, row[0], operation.item_name, operation.quantity)
+                    changed = True
+                    results.append(CartOperationResult(op=operation.op, item=item))
+                elif isinstance(operation, RemoveQuantityOperation):
+                    removed = remove_line(connection, row[0], operation.item_id, operation.quantity) if row else None
+                    changed = changed or removed is not None
+                    results.append(CartOperationResult(op=operation.op, removed=removed or 0))
+                else:
+                    deleted = bool(row) and delete_line(connection, row[0], operation.item_id)
+                    changed = changed or deleted
+                    results.append(CartOperationResult(op=operation.op, deleted=deleted))
+
+            if changed:
+                self._write(connection, row)
+            return results
+
+    def sample_ages(
+            self,
+            cursor: int = 0,
+            count: int = 1000,
+            bounds: List[int] = AGE_BUCKETS
+    ) -> Tuple[int, CartAgeReport]:
+        report = new_age_report(bounds)
+        with self._database.transaction() as connection:
+            rows = connection.execute(
+                "SELECT id, expires_at FROM carts WHERE id > ? ORDER BY id LIMIT ?",
+                (cursor, count)
+            ).fetchall()
+
+        now = time.time()
+        for _, expires_at in rows:
+            if expires_at is None:
+                remaining = -1
+            elif expires_at > now:
+                remaining = round(expires_at - now)
+            else:
+                remaining = -2
+            count_cart_age(report, ttl=self._ttl, remaining=remaining)
+
+        return rows[-1][0] if len(rows) == count else 0, report
+
+    def delete_cart(self, cart_id: UUID) -> bool:
+        with self._database.transaction(write=True) as connection:
+            row = self._current_row(connection, cart_id)
+            if row is None:
+                return False
+            connection.execute("DELETE FROM carts WHERE id = ?", (row[0],))
+            return True
+
+    def unlink_carts(self, cursor: int = 0, count: int = 1000) -> Tuple[int, int]:
+        with self._database.transaction(write=True) as connection:
+            rows = connection.execute(
+                "SELECT id, expires_at FROM carts WHERE id > ? ORDER BY id LIMIT ?",
+                (cursor, count)
+            ).fetchall()
+            if rows:
+                connection.execute("DELETE FROM carts WHERE id BETWEEN ? AND ?", (rows[0][0], rows[-1][0]))
+
+        now = time.time()
+        unlinked = sum(1 for _, expires_at in rows if expires_at is None or expires_at > now)
+        return rows[-1][0] if len(rows) == count else 0, unlinked
+
+    def ping(self) -> bool:
+        with self._database.transaction() as connection:
+            return connection.execute("SELECT 1").fetchone() == (1,)
+
+    def warm_up(self, connections: int):
+        pass
+
+    @property
+    def _renews(self) -> bool:
+        return bool(self._sliding_ttl and self._ttl)
+
+    def _read_row(self, connection: sqlite3.Connection, cart_id: UUID) -> Optional[Tuple[int, int, str]]:
+        row = connection.execute(
+            f"SELECT id, version, epoch FROM carts WHERE cart_id = ? AND {LIVE}",
+            (str(cart_id), time.time())
+        ).fetchone()
+        if row is not None and self._renews:
+            connection.execute("UPDATE carts SET expires_at = ? WHERE id = ?", (time.time() + self._ttl, row[0]))
+        return row
+
+    def _current_row(self, connection: sqlite3.Connection, cart_id: UUID) -> Optional[Tuple[int, int, str]]:
+        row = connection.execute(
+            "SELECT id, version, epoch, expires_at FROM carts WHERE cart_id = ?",
+            (str(cart_id),)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[3] is not None and row[3] <= time.time():
+            connection.execute("DELETE FROM carts WHERE id = ?", (row[0],))
+            return None
+        return row[0], row[1], row[2]
+
+    def _replace(
+            self,
+            cart_id: UUID,
+            epoch: str,
+            lines: Iterable[Tuple[str, str, int]],
+            expected_version: Optional[int],
+            expected_epoch: Optional[str]
+    ) -> Optional[int]:
+        with self._database.transaction(write=True) as connection:
+            row = self._current_row(connection, cart_id)
+            if not matches(row, expected_version, expected_epoch):
+                return None
+
+            # A cart keeps the epoch it was created with, the one it is saved with only counts when it is new.
+            if row:
+                connection.execute("DELETE FROM items WHERE cart = ?", (row[0],))
+            else:
+                row = self._create_row(connection, cart_id, epoch)
+            connection.executemany(
+                "INSERT INTO items (cart, item_id, item_name, quantity) VALUES (?, ?, ?, ?)",
+                ((row[0], item_id, item_name, quantity) for item_id, item_name, quantity in lines)
+            )
+            return self._write(connection, row)
+
+    def _create_row(self, connection: sqlite3.Connection, cart_id: UUID, epoch: str) -> Tuple[int, int, str]:
+        created = connection.execute(
+            "INSERT INTO carts (cart_id, version, epoch) VALUES (?, 0, ?)",
+            (str(cart_id), epoch)
+        )
+        return created.lastrowid, 0, epoch
+
+    def _write(self, connection: sqlite3.Connection, row: Tuple[int, int, str]) -> int:
+        connection.execute(
+            "UPDATE carts SET version = ?, expires_at = ? WHERE id = ?",
+            (row[1] + 1, time.time() + self._ttl if self._ttl else None, row[0])
+        )
+        return row[1] + 1
+
+
+class SqliteClearJobRepository(ClearJobStore):
+
+    def __init__(self, database: SqliteDatabase):
+        self._database = database
+
+    def get_job(self, job_id: UUID) -> Optional[ClearJob]:
+        with self._database.transaction() as connection:
+            row = connection.execute(
+                "SELECT job FROM clear_jobs WHERE job_id = ? AND expires_at > ?",
+                (str(job_id), time.time())
+            ).fetchone()
+        if row:
+            return ClearJob.model_validate_json(row[0])
+        else:
+            return None
+
+    def save_job(self, job: ClearJob):
+        with self._database.transaction(write=True) as connection:
+            now = time.time()
+            connection.execute("DELETE FROM clear_jobs WHERE expires_at <= ?", (now,))
+            connection.execute(
+                "INSERT OR REPLACE INTO clear_jobs (job_id, job, expires_at) VALUES (?, ?, ?)",
+                (str(job.job_id), job.model_dump_json(), now + JOB_TTL)
+            )
+
+
+def read_carts(connection: sqlite3.Connection, rows: List[Tuple[int, str, int, str]]) -> List[Cart]:
+    if not rows:
+        return []
+
+    items: Dict[int, List[dict]] = {row[0]: [] for row in rows}
+    lines = connection.execute(
+        f"SELECT cart, item_id, item_name, quantity FROM items "
+        f"WHERE cart IN ({', '.join('?' * len(rows))}) ORDER BY id",
+        [row[0] for row in rows]
+    )
+    for cart, item_id, item_name, quantity in lines:
+        items[cart].append({"item_id": UUID(item_id), "item_name": item_name, "quantity": quantity})
+
+    return [
+        Cart.model_validate({"cart_id": cart_id, "items": items[row_id], "version": version, "epoch": epoch})
+        for row_id, cart_id, version, epoch in rows
+    ]
+
+
+def matches(
+        row: Optional[Tuple[int, int, str]],
+        expected_version: Optional[int],
+        expected_epoch: Optional[str]
+) -> bool:
+    if expected_version is not None and expected_version != (row[1] if row else 0):
+        return False
+    return expected_epoch is None or expected_epoch == (row[2] if row else "")
+
+
+def add_line(connection: sqlite3.Connection, cart: int, item_name: str, quantity: int) -> Item:
+    line = connection.execute(
+        "UPDATE items SET quantity = quantity + ? WHERE cart = ? AND item_name = ? RETURNING item_id, quantity",
+        (quantity, cart, item_name)
+    ).fetchone()
+    if line:
+        return Item(item_id=UUID(line[0]), item_name=item_name, quantity=line[1])
+
+    item_id = uuid.uuid4()
+    connection.execute(
+        "INSERT INTO items (cart, item_id, item_name, quantity) VALUES (?, ?, ?, ?)",
+        (cart, str(item_id), item_name, quantity)
+    )
+    return Item(item_id=item_id, item_name=item_name, quantity=quantity)
+
+
+def remove_line(connection: sqlite3.Connection, cart: int, item_id: UUID, quantity: int) -> Optional[int]:
+    line = connection.execute(
+        "SELECT id, quantity FROM items WHERE cart = ? AND item_id = ?",
+        (cart, str(item_id))
+    ).fetchone()
+    if line is None:
+        return None
+
+    line_id, current = line
+    if current <= quantity:
+        connection.execute("DELETE FROM items WHERE id = ?", (line_id,))
+        return current
+
+    connection.execute("UPDATE items SET quantity = quantity - ? WHERE id = ?", (quantity, line_id))
+    return quantity
+
+
+def delete_line(connection: sqlite3.Connection, cart: int, item_id: UUID) -> bool:
+    deleted = connection.execute("DELETE FROM items WHERE cart = ? AND item_id = ?", (cart, str(item_id)))
+    return deleted.rowcount == 1
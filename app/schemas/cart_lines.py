@@ -0,0 +1,73 @@
+from array import array
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from app.schemas.models import Cart, Item
+
+
+class CartLines:
+    # Carts read only to be changed and written back are kept as columns of plain values, pydantic models are
+    # built once the cart leaves the service.
+    __slots__ = ("cart_id", "version", "epoch", "item_ids", "item_names", "quantities")
+
+    def __init__(self, cart_id: str, version: int = 0, lines: Iterable[Tuple[str, str, int]] = (), epoch: str = ""):
+        self.cart_id = cart_id
+        self.version = version
+        self.epoch = epoch
+        rows = list(lines)
+        self.item_ids = [row[0] for row in rows]
+        self.item_names = [row[1] for row in rows]
+        self.quantities = array("q", [row[2] for row in rows])
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def append(self, item_id: str, item_name: str, quantity: int):
+        self.item_ids.append(item_id)
+        self.item_names.append(item_name)
+        self.quantities.append(quantity)
+
+    def item(self, item_id: UUID) -> Optional[Item]:
+        try:
+            index = self.item_ids.index(str(item_id))
+        except ValueError:
+            return None
+        return Item(item_id=item_id, item_name=self.item_names[index], quantity=self.quantities[index])
+
+    def ids_by_name(self) -> Dict[str, str]:
+        return dict(zip(self.item_names, self.item_ids))
+
+    def total_quantity(self) -> int:
+        return sum(self.quantities)
+
+    def to_fields(self) -> dict:
+        return {
+            "cart_id": self.cart_id,
+            "items": [
+                {"item_id": item_id, "item_name": item_name, "quantity": quantity}
+                for item_id, item_name, quantity in zip(self.item_ids, self.item_names, self.quantities)
+            ],
+            "version": self.version,
+            "epoch": self.epoch
+        }
+
+    def to_cart(self) -> Cart:
+        return Cart.model_validate(self.to_fields())
+
+
+def lines_from_fields(fields: dict) -> CartLines:
+    lines = CartLines(str(fields["cart_id"]), fields.get("version") or 0, epoch=fields.get("epoch") or "")
+    items = fields["items"]
+    lines.item_ids = [str(item["item_id"]) for item in items]
+    lines.item_names = [item["item_name"] for item in items]
+    lines.quantities = array("q", [item["quantity"] for item in items])
+    return lines
+
+
+def lines_from_cart(cart: Cart) -> CartLines:
+    return CartLines(
+        str(cart.cart_id),
+        cart.version,
+        ((str(item.item_id), item.item_name, item.quantity) for item in cart.items),
+        cart.epoch
+    )
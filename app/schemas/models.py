@@ -1,7 +1,14 @@
-from typing import List
+import secrets
+from typing import Annotated, List, Literal, Optional, Union
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# Quantities pass through Lua numbers and cjson inside Redis, which keep only 14 significant digits, so a single
+# quantity is held to the 32 bit range and sums of them stay exact.
+MAX_QUANTITY = 2 ** 31 - 1
+
+Quantity = Annotated[int, Field(gt=0, le=MAX_QUANTITY)]
 
 
 class Item(BaseModel):
@@ -9,29 +16,108 @@ class Item(BaseModel):
     item_name: str
     quantity: int
 
-    class Config:
-        json_encoders = {
-            UUID: lambda v: str(v)
-        }
 
-    def dict(self, **kwargs):
-        base_dict = super().dict(**kwargs)
-        base_dict["item_id"] = str(base_dict["item_id"])
-        return base_dict
+class CartSummary(BaseModel):
+    cart_id: UUID
+    version: int = 0
+    epoch: str = ""
+    line_count: int = 0
+    total_quantity: int = 0
 
 
 class Cart(BaseModel):
     cart_id: UUID
     items: List[Item]
+    version: int = 0
+    epoch: str = ""
+
+    def summary(self) -> CartSummary:
+        return CartSummary(
+            cart_id=self.cart_id,
+            version=self.version,
+            epoch=self.epoch,
+            line_count=len(self.items),
+            total_quantity=sum(item.quantity for item in self.items)
+        )
+
+
+def new_epoch() -> str:
+    # Set once when a cart is created, so a cart that is deleted and created again never repeats an ETag.
+    return secrets.token_hex(8)
+
+
+class ItemQuantity(BaseModel):
+    item_name: str
+    quantity: Quantity
+
+
+class CartPage(BaseModel):
+    carts: List[Cart]
+    next_cursor: Optional[int] = None
+
+
+class CartBulkResult(BaseModel):
+    carts: List[Cart]
+    missing_cart_ids: List[UUID]
+
+
+class CartAgeBucket(BaseModel):
+    max_age: Optional[int] = None
+    count: int = 0
+
+
+class CartAgeReport(BaseModel):
+    buckets: List[CartAgeBucket]
+    without_expiry: int = 0
+
+
+class ClearJob(BaseModel):
+    job_id: UUID
+    status: Literal["running", "done", "failed"] = "running"
+    unlinked: int = 0
+    error: Optional[str] = None
+
+
+class CartEvent(BaseModel):
+    event_id: str
+    type: Literal["replace", "add", "remove", "delete_item", "delete_cart", "clear"]
+    cart_id: Optional[UUID] = None
+    version: Optional[int] = None
+    item_id: Optional[UUID] = None
+    quantity: Optional[int] = None
+    count: Optional[int] = None
+
+
+class CartEventPage(BaseModel):
+    events: List[CartEvent]
+    last_event_id: str
+
+
+class AddItemOperation(BaseModel):
+    op: Literal["add"]
+    item_name: str
+    quantity: Quantity
+
+
+class RemoveQuantityOperation(BaseModel):
+    op: Literal["remove"]
+    item_id: UUID
+    quantity: Quantity
+
+
+class DeleteItemOperation(BaseModel):
+    op: Literal["delete"]
+    item_id: UUID
+
 
-    class Config:
-        json_encoders = {
-            UUID: lambda v: str(v)
-        }
+CartOperation = Annotated[
+    Union[AddItemOperation, RemoveQuantityOperation, DeleteItemOperation],
+    Field(discriminator="op")
+]
 
-    def dict(self, **kwargs):
-        base_dict = super().dict(**kwargs)
-        base_dict["cart_id"] = str(base_dict["cart_id"])
-        base_dict["items"] = [item.dict() for item in self.items]
 
-        return base_dict
+class CartOperationResult(BaseModel):
+    op: str
+    item: Optional[Item] = None
+    removed: Optional[int] = None
+    deleted: Optional[bool] = None
@@ -0,0 +1,157 @@
+import asyncio
+import uuid
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from injector import inject
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import instrumented
+from app.repositories.async_cart_event_repository import AsyncCartEventRepository
+from app.repositories.async_cart_repository import AsyncCartRepository
+from app.repositories.async_clear_job_repository import AsyncClearJobRepository
+from app.schemas.models import (
+    Cart,
+    CartAgeReport,
+    CartBulkResult,
+    CartEventPage,
+    CartOperation,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    ClearJob,
+    Item,
+    ItemQuantity
+)
+from app.services.cart_service import MAX_SAVE_ATTEMPTS, CartService, replace_cart_lines
+
+
+@instrumented("service")
+class AsyncCartService:
+    @inject
+    def __init__(
+            self,
+            cart_repo: AsyncCartRepository,
+            clear_job_repo: AsyncClearJobRepository,
+            cart_event_repo: AsyncCartEventRepository
+    ):
+        self._cart_repo = cart_repo
+        self._clear_job_repo = clear_job_repo
+        self._cart_event_repo = cart_event_repo
+        self._clear_tasks = set()
+
+    async def get_carts(self, cursor: int = 0, limit: int = 100) -> CartPage:
+        return await self._cart_repo.get_carts(cursor=cursor, limit=limit)
+
+    async def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        return await self._cart_repo.get_cart(cart_id)
+
+    async def get_many(self, cart_ids: List[UUID]) -> CartBulkResult:
+        return await self._cart_repo.get_many(cart_ids)
+
+    async def sample_ages(self, cursor: int = 0, count: int = 1000) -> Tuple[int, CartAgeReport]:
+        return await self._cart_repo.sample_ages(cursor=cursor, count=count)
+
+    async def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        return await self._cart_repo.add_item(cart_id=cart_id, item_name=item_name, quantity=quantity)
+
+    async def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        return await self._cart_repo.get_summary(cart_id)
+
+    async def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        return await self._cart_repo.get_item(cart_id=cart_id, item_id=item_id)
+
+    async def delete_cart(self, cart_id: UUID) -> bool:
+        return await self._cart_repo.delete_cart(cart_id)
+
+    async def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
+        return await self._cart_repo.delete_item(cart_id=cart_id, item_id=item_id)
+
+    async def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        return await self._cart_repo.remove_quantity(cart_id=cart_id, item_id=item_id, quantity=quantity)
+
+    async def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        return await self._cart_repo.apply_operations(
+            cart_id=cart_id,
+            operations=operations,
+            expected_version=expected_version,
+            expected_epoch=expected_epoch
+        )
+
+    async def replace_items(
+            self,
+            cart_id: UUID,
+            items: List[ItemQuantity],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[Cart]:
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            current = await self._cart_repo.get_lines(cart_id)
+            version = current.version if current else 0
+            epoch = current.epoch if current else ""
+            if expected_version is not None and expected_version != version:
+                return None
+            if expected_epoch is not None and expected_epoch != epoch:
+                return None
+
+            lines = replace_cart_lines(cart_id, current, items)
+            saved_version = await self._cart_repo.save_lines(lines, expected_version=version, expected_epoch=epoch)
+            if saved_version is not None:
+                lines.version = saved_version
+                return lines.to_cart()
+
+        return None
+
+    async def clear_carts(self) -> ClearJob:
+        job = ClearJob(job_id=uuid.uuid4())
+        await self._clear_job_repo.save_job(job)
+        task = asyncio.create_task(self._run_clear_job(job))
+        self._clear_tasks.add(task)
+        task.add_done_callback(self._clear_tasks.discard)
+        return job
+
+    async def get_clear_job(self, job_id: UUID) -> Optional[ClearJob]:
+        return await self._clear_job_repo.get_job(job_id)
+
+    async def get_events(self, after: str, limit: int = 100, wait: float = 0) -> CartEventPage:
+        return await self._cart_event_repo.read_events(after=after, count=limit, wait=wait)
+
+    async def _run_clear_job(self, job: ClearJob):
+        cursor = 0
+        try:
+            while True:
+                cursor, unlinked = await self._cart_repo.unlink_carts(cursor=cursor)
+                job.unlinked += unlinked
+                if cursor == 0:
+                    break
+                await self._clear_job_repo.save_job(job)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        await self._clear_job_repo.save_job(job)
+
+
+class ThreadPoolCartService:
+    def __init__(self, cart_service: CartService, cart_event_repo: AsyncCartEventRepository):
+        self._cart_service = cart_service
+        self._cart_event_repo = cart_event_repo
+
+    async def get_events(self, after: str, limit: int = 100, wait: float = 0) -> CartEventPage:
+        # Event reads block in XREAD for as long as a client waits, so they stay on the asyncio client instead of
+        # holding a threadpool worker per long poll or stream.
+        return await self._cart_event_repo.read_events(after=after, count=limit, wait=wait)
+
+    def __getattr__(self, name):
+        method = getattr(self._cart_service, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(method, *args, **kwargs)
+
+        return call
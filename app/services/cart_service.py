@@ -1,80 +1,152 @@
+import threading
 import uuid
-from typing import List
-from typing import Optional
+from typing import List, Optional, Tuple
 from uuid import UUID
 
 from injector import inject
 
-from app.repositories.cart_repository import CartRepository
-from app.schemas.models import Cart, Item
-
-
+from app.metrics import instrumented
+from app.repositories.cart_event_repository import CartEventRepository
+from app.repositories.cart_store import CartStore, ClearJobStore
+from app.schemas.cart_lines import CartLines
+from app.schemas.models import (
+    Cart,
+    CartAgeReport,
+    CartBulkResult,
+    CartEventPage,
+    CartOperation,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    ClearJob,
+    Item,
+    ItemQuantity,
+    new_epoch
+)
+
+MAX_SAVE_ATTEMPTS = 3
+
+
+@instrumented("service")
 class CartService:
     @inject
-    def __init__(self, cart_repo: CartRepository):
+    def __init__(
+            self,
+            cart_repo: CartStore,
+            clear_job_repo: ClearJobStore,
+            cart_event_repo: CartEventRepository
+    ):
         self._cart_repo = cart_repo
+        self._clear_job_repo = clear_job_repo
+        self._cart_event_repo = cart_event_repo
 
-    def get_carts(self) -> List[Cart]:
-        return self._cart_repo.get_carts()
+    def get_carts(self, cursor: int = 0, limit: int = 100) -> CartPage:
+        return self._cart_repo.get_carts(cursor=cursor, limit=limit)
 
     def get_cart(self, cart_id: UUID) -> Cart:
         return self._cart_repo.get_cart(cart_id)
 
-    def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
-        cart = self.get_cart(cart_id)
-        if cart == None:
-            cart = Cart(cart_id=cart_id, items=[])
-        item = next((x for x in cart.items if x.item_name == item_name), None)
-        if item:
-            item.quantity += quantity
-        else:
-            item = Item(item_id=uuid.uuid4(), item_name=item_name, quantity=quantity)
-            cart.items.append(item)
+    def get_many(self, cart_ids: List[UUID]) -> CartBulkResult:
+        return self._cart_repo.get_many(cart_ids)
 
-        self._cart_repo.save_cart(cart=cart)
+    def sample_ages(self, cursor: int = 0, count: int = 1000) -> Tuple[int, CartAgeReport]:
+        return self._cart_repo.sample_ages(cursor=cursor, count=count)
 
-        return item
+    def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        return self._cart_repo.add_item(cart_id=cart_id, item_name=item_name, quantity=quantity)
 
-    def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
-        cart = self.get_cart(cart_id)
-        item = None
-        if cart:
-            item = next((x for x in cart.items if x.item_id == item_id), None)
+    def get_summary(self, cart_id: UUID) -> Optional[CartSummary]:
+        return self._cart_repo.get_summary(cart_id)
 
-        return item
+    def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        return self._cart_repo.get_item(cart_id=cart_id, item_id=item_id)
 
     def delete_cart(self, cart_id: UUID) -> bool:
         return self._cart_repo.delete_cart(cart_id)
 
     def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
-        cart = self.get_cart(cart_id)
-        if cart:
-            items = [i for i in cart.items if i.item_id != item_id]
-            if len(items) < len(cart.items):
-                cart.items = items
-                self._cart_repo.save_cart(cart=cart)
-                return True
-            else:
-                return False
-        else:
-            return False
-
-    def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity) -> int:
-        cart = self.get_cart(cart_id)
-        items_removed = 0
-        if cart:
-            item = next((x for x in cart.items if x.item_id == item_id), None)
-            if item:
-                if item.quantity <= quantity:
-                    items_removed = item.quantity
-                    cart.items = [x for x in cart.items if x.item_id != item_id]
-                else:
-                    items_removed = quantity
-                    item.quantity -= quantity
-
-                self._cart_repo.save_cart(cart=cart)
-
-        return items_removed
-
-    def clear_carts(self):
-        self._cart_repo.clear_carts()
+        return self._cart_repo.delete_item(cart_id=cart_id, item_id=item_id)
+
+    def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        return self._cart_repo.remove_quantity(cart_id=cart_id, item_id=item_id, quantity=quantity)
+
+    def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        return self._cart_repo.apply_operations(
+            cart_id=cart_id,
+            operations=operations,
+            expected_version=expected_version,
+            expected_epoch=expected_epoch
+        )
+
+    def replace_items(
+            self,
+            cart_id: UUID,
+            items: List[ItemQuantity],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[Cart]:
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            current = self._cart_repo.get_lines(cart_id)
+            version = current.version if current else 0
+            epoch = current.epoch if current else ""
+            if expected_version is not None and expected_version != version:
+                return None
+            if expected_epoch is not None and expected_epoch != epoch:
+                return None
+
+            lines = replace_cart_lines(cart_id, current, items)
+            saved_version = self._cart_repo.save_lines(lines, expected_version=version, expected_epoch=epoch)
+            if saved_version is not None:
+                lines.version = saved_version
+                return lines.to_cart()
+
+        return None
+
+    def clear_carts(self) -> ClearJob:
+        job = ClearJob(job_id=uuid.uuid4())
+        self._clear_job_repo.save_job(job)
+        threading.Thread(target=self._run_clear_job, args=(job,), daemon=True).start()
+        return job
+
+    def get_clear_job(self, job_id: UUID) -> Optional[ClearJob]:
+        return self._clear_job_repo.get_job(job_id)
+
+    def get_events(self, after: str, limit: int = 100, wait: float = 0) -> CartEventPage:
+        return self._cart_event_repo.read_events(after=after, count=limit, wait=wait)
+
+    def _run_clear_job(self, job: ClearJob):
+        cursor = 0
+        try:
+            while True:
+                cursor, unlinked = self._cart_repo.unlink_carts(cursor=cursor)
+                job.unlinked += unlinked
+                if cursor == 0:
+                    break
+                self._clear_job_repo.save_job(job)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        self._clear_job_repo.save_job(job)
+
+
+def replace_cart_lines(cart_id: UUID, current: Optional[CartLines], items: List[ItemQuantity]) -> CartLines:
+    existing = current.ids_by_name() if current else {}
+    quantities = {}
+    for item in items:
+        quantities[item.item_name] = quantities.get(item.item_name, 0) + item.quantity
+
+    return CartLines(
+        str(cart_id),
+        lines=(
+            (existing.get(item_name) or str(uuid.uuid4()), item_name, quantity)
+            for item_name, quantity in quantities.items()
+        ),
+        epoch=current.epoch if current else new_epoch()
+    )
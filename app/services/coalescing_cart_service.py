@@ -0,0 +1,73 @@
+import asyncio
+from typing import Dict, List
+from uuid import UUID
+
+from app.schemas.models import AddItemOperation, Item
+from app.services.async_cart_service import AsyncCartService
+
+MAX_COALESCED_OPERATIONS = 100
+
+
+class PendingAdds:
+    def __init__(self, cart_id: UUID, flush_handle: asyncio.TimerHandle):
+        self.cart_id = cart_id
+        self.flush_handle = flush_handle
+        self.operations: List[AddItemOperation] = []
+        self.futures: List[asyncio.Future] = []
+
+
+class CoalescingCartService:
+
+    def __init__(self, cart_service: AsyncCartService, max_delay: float):
+        self._cart_service = cart_service
+        self._max_delay = max_delay
+        self._pending: Dict[UUID, PendingAdds] = {}
+        self._flushes = set()
+
+    def __getattr__(self, name):
+        return getattr(self._cart_service, name)
+
+    async def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        # Adds to the same cart that arrive within max_delay of each other go to Redis as one batch, which is a single
+        # read and write of the cart. Each caller still waits for the batch, so nothing is acknowledged unwritten.
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(cart_id)
+        if pending is None:
+            pending = PendingAdds(cart_id, loop.call_later(self._max_delay, self._start_flush, cart_id))
+            self._pending[cart_id] = pending
+
+        future = loop.create_future()
+        pending.operations.append(AddItemOperation(op="add", item_name=item_name, quantity=quantity))
+        pending.futures.append(future)
+        if len(pending.operations) >= MAX_COALESCED_OPERATIONS:
+            self._start_flush(cart_id)
+
+        return await future
+
+    async def close(self):
+        for cart_id in list(self._pending):
+            self._start_flush(cart_id)
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def _start_flush(self, cart_id: UUID):
+        pending = self._pending.pop(cart_id, None)
+        if pending is None:
+            return
+
+        pending.flush_handle.cancel()
+        task = asyncio.create_task(self._flush(pending))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, pending: PendingAdds):
+        try:
+            results = await self._cart_service.apply_operations(pending.cart_id, pending.operations)
+        except Exception as e:
+            for future in pending.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in zip(pending.futures, results):
+            if not future.done():
+                future.set_result(result.item)
@@ -0,0 +1,146 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+
+from app.metrics import READ_LOADS
+from app.schemas.models import Cart, CartOperation, CartOperationResult, ClearJob, Item, ItemQuantity
+from app.services.async_cart_service import AsyncCartService
+
+
+class SingleFlightCartService:
+
+    def __init__(self, cart_service: AsyncCartService):
+        self._cart_service = cart_service
+        self._cart_loads: Dict[UUID, asyncio.Future] = {}
+        self._item_loads: Dict[UUID, Dict[UUID, asyncio.Future]] = {}
+
+    def __getattr__(self, name):
+        return getattr(self._cart_service, name)
+
+    async def get_cart(self, cart_id: UUID) -> Optional[Cart]:
+        return await self._single_flight(self._cart_loads, cart_id, "get_cart", self._cart_service.get_cart)
+
+    async def get_item(self, cart_id: UUID, item_id: UUID) -> Optional[Item]:
+        # An item read of a cart that is already being loaded takes the item from that load instead of reading it
+        # again.
+        cart_load = self._cart_loads.get(cart_id)
+        if cart_load is not None:
+            READ_LOADS.labels("get_item", "coalesced").inc()
+            cart = await asyncio.shield(cart_load)
+            return next((x for x in cart.items if x.item_id == item_id), None) if cart else None
+
+        return await self._single_flight(
+            self._item_loads.setdefault(cart_id, {}),
+            item_id,
+            "get_item",
+            lambda item_id: self._cart_service.get_item(cart_id, item_id),
+            groups=self._item_loads,
+            group=cart_id
+        )
+
+    async def add_item(self, cart_id: UUID, item_name: str, quantity: int) -> Item:
+        try:
+            return await self._cart_service.add_item(cart_id, item_name, quantity)
+        finally:
+            self._forget_loads(cart_id)
+
+    async def remove_quantity(self, cart_id: UUID, item_id: UUID, quantity: int) -> int:
+        try:
+            return await self._cart_service.remove_quantity(cart_id, item_id, quantity)
+        finally:
+            self._forget_loads(cart_id)
+
+    async def delete_item(self, cart_id: UUID, item_id: UUID) -> bool:
+        try:
+            return await self._cart_service.delete_item(cart_id, item_id)
+        finally:
+            self._forget_loads(cart_id)
+
+    async def delete_cart(self, cart_id: UUID) -> bool:
+        try:
+            return await self._cart_service.delete_cart(cart_id)
+        finally:
+            self._forget_loads(cart_id)
+
+    async def apply_operations(
+            self,
+            cart_id: UUID,
+            operations: List[CartOperation],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[List[CartOperationResult]]:
+        try:
+            return await self._cart_service.apply_operations(
+                cart_id,
+                operations,
+                expected_version=expected_version,
+                expected_epoch=expected_epoch
+            )
+        finally:
+            self._forget_loads(cart_id)
+
+    async def replace_items(
+            self,
+            cart_id: UUID,
+            items: List[ItemQuantity],
+            expected_version: Optional[int] = None,
+            expected_epoch: Optional[str] = None
+    ) -> Optional[Cart]:
+        try:
+            return await self._cart_service.replace_items(
+                cart_id,
+                items,
+                expected_version=expected_version,
+                expected_epoch=expected_epoch
+            )
+        finally:
+            self._forget_loads(cart_id)
+
+    async def clear_carts(self) -> ClearJob:
+        self._cart_loads.clear()
+        self._item_loads.clear()
+        return await self._cart_service.clear_carts()
+
+    async def _single_flight(
+            self,
+            loads: Dict[UUID, asyncio.Future],
+            key: UUID,
+            operation: str,
+            load: Callable[[UUID], Awaitable],
+            groups: Optional[Dict[UUID, Dict[UUID, asyncio.Future]]] = None,
+            group: Optional[UUID] = None
+    ):
+        flight = loads.get(key)
+        if flight is not None:
+            READ_LOADS.labels(operation, "coalesced").inc()
+        else:
+            READ_LOADS.labels(operation, "loaded").inc()
+            flight = asyncio.ensure_future(load(key))
+            loads[key] = flight
+            flight.add_done_callback(lambda _: forget_flight(loads, key, flight, groups, group))
+
+        # Shielded so a caller that goes away does not cancel the load for the callers sharing it.
+        return await asyncio.shield(flight)
+
+    def _forget_loads(self, cart_id: UUID):
+        # A write through this worker ends the loads that started before it, so reads issued after the write
+        # returned never share a result read before it.
+        self._cart_loads.pop(cart_id, None)
+        self._item_loads.pop(cart_id, None)
+
+
+def forget_flight(
+        loads: Dict[UUID, asyncio.Future],
+        key: UUID,
+        flight: asyncio.Future,
+        groups: Optional[Dict[UUID, Dict[UUID, asyncio.Future]]] = None,
+        group: Optional[UUID] = None
+):
+    if loads.get(key) is flight:
+        del loads[key]
+        # Item loads are grouped by cart, and the group goes with the cart's last load.
+        if not loads and groups is not None and groups.get(group) is loads:
+            del groups[group]
+    if not flight.cancelled():
+        # Marks a failure as retrieved even when every caller sharing the load has gone away.
+        flight.exception()
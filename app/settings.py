@@ -0,0 +1,145 @@
+import json
+import os
+import tomllib
+from typing import List, Literal, Mapping, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+ENV_PREFIX = "CART_"
+CONFIG_FILE_VARIABLE = "CART_CONFIG_FILE"
+
+
+class Settings(BaseModel):
+    storage_backend: Literal["redis", "memory", "sqlite"] = "redis"
+    storage_layout: Literal["json", "hash"] = "json"
+    storage_codec: Literal["json", "msgpack"] = "json"
+    io_mode: Literal["sync", "async"] = "sync"
+    key_prefix: str = "cart:"
+    job_key_prefix: str = "cart-job:"
+    memory_shards: int = Field(default=64, ge=1)
+    sqlite_path: str = "carts.db"
+
+    redis_mode: Literal["standalone", "sentinel", "cluster", "sharded"] = "standalone"
+    redis_host: str = "0.0.0.0"
+    redis_port: int = 6379
+    redis_db: int = 0
+    redis_username: Optional[str] = None
+    redis_password: Optional[str] = None
+    redis_sentinels: List[str] = []
+    redis_sentinel_service_name: str = "mymaster"
+    redis_cluster_nodes: List[str] = []
+    redis_shards: List[str] = []
+    redis_previous_shards: List[str] = []
+    redis_shard_vnodes: int = Field(default=160, ge=1)
+
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0
+    redis_socket_timeout: Optional[float] = 5.0
+    redis_socket_connect_timeout: Optional[float] = 2.0
+    redis_socket_keepalive: bool = True
+    redis_health_check_interval: int = 30
+    redis_warm_connections: int = Field(default=2, ge=0)
+
+    cart_ttl: Optional[int] = None
+    cart_ttl_sliding: bool = False
+
+    add_item_coalesce_delay: Optional[float] = Field(default=None, gt=0, le=1.0)
+    coalesce_reads: bool = True
+
+    cache_enabled: bool = False
+    cache_max_size: int = 10000
+    cache_ttl: float = 60.0
+
+    events_enabled: bool = False
+    events_key: str = "cart-events"
+
+    rate_limit_enabled: bool = False
+    rate_limit_rate: float = Field(default=20.0, gt=0)
+    rate_limit_burst: int = Field(default=40, ge=1)
+    rate_limit_key_prefix: str = "cart-rate:"
+    admission_max_in_flight: Optional[int] = Field(default=None, ge=1)
+    admission_redis_latency: Optional[float] = Field(default=None, gt=0)
+
+    metrics_sample_rate: float = Field(default=0.1, ge=0.0, le=1.0)
+    metrics_age_sample_size: int = Field(default=1000, ge=1)
+
+    readiness_timeout: float = Field(default=1.0, gt=0)
+    shutdown_drain_timeout: float = Field(default=10.0, ge=0)
+
+    @model_validator(mode="after")
+    def check_key_prefixes(self) -> "Settings":
+        if self.key_prefix.startswith(self.job_key_prefix) or self.job_key_prefix.startswith(self.key_prefix):
+            raise ValueError("key_prefix and job_key_prefix must be distinct namespaces")
+        if self.events_key.startswith((self.key_prefix, self.job_key_prefix)):
+            raise ValueError("events_key must not fall inside key_prefix or job_key_prefix")
+        if self.rate_limit_key_prefix.startswith((self.key_prefix, self.job_key_prefix)):
+            raise ValueError("rate_limit_key_prefix must not fall inside key_prefix or job_key_prefix")
+        return self
+
+    @model_validator(mode="after")
+    def check_storage_codec(self) -> "Settings":
+        if self.storage_codec != "json" and self.storage_layout == "hash":
+            raise ValueError("The hash storage layout does not use a storage codec")
+        return self
+
+    @model_validator(mode="after")
+    def check_storage_backend(self) -> "Settings":
+        if self.storage_backend == "redis":
+            return self
+        if self.io_mode != "sync":
+            raise ValueError(f"The {self.storage_backend} storage backend is only available in the sync IO mode")
+        if self.cache_enabled or self.events_enabled:
+            raise ValueError("The cart cache and cart events need the redis storage backend")
+        return self
+
+    @model_validator(mode="after")
+    def check_sharded_mode(self) -> "Settings":
+        if self.redis_mode != "sharded":
+            return self
+        if not self.redis_shards:
+            raise ValueError("The sharded redis mode needs redis_shards")
+        if self.io_mode != "sync":
+            raise ValueError("The sharded redis mode is only available in the sync IO mode")
+        return self
+
+    @model_validator(mode="after")
+    def check_cart_cache_mode(self) -> "Settings":
+        if self.cache_enabled and self.redis_mode in ("cluster", "sharded"):
+            raise ValueError(f"The cart cache is not available in {self.redis_mode} mode")
+        if self.cache_enabled and self.cart_ttl_sliding:
+            raise ValueError("The cart cache is not available with sliding cart expiry")
+        return self
+
+    @model_validator(mode="after")
+    def check_admission(self) -> "Settings":
+        if self.admission_redis_latency is not None and not self.rate_limit_enabled:
+            raise ValueError("admission_redis_latency is measured on rate limit calls and needs rate_limit_enabled")
+        return self
+
+    @model_validator(mode="after")
+    def check_events_mode(self) -> "Settings":
+        if self.events_enabled and self.redis_mode in ("cluster", "sharded"):
+            raise ValueError(f"Cart events are not available in {self.redis_mode} mode")
+        return self
+
+
+def load_settings(environ: Mapping[str, str] = os.environ) -> Settings:
+    values = {}
+    config_file = environ.get(CONFIG_FILE_VARIABLE)
+    if config_file:
+        values.update(_read_config_file(config_file))
+
+    for name, field in Settings.model_fields.items():
+        raw = environ.get(ENV_PREFIX + name.upper())
+        if raw is not None:
+            values[name] = [value for value in raw.split(",") if value] if field.annotation == List[str] else raw
+
+    return Settings(**values)
+
+
+def _read_config_file(path: str) -> dict:
+    with open(path, "rb") as config_file:
+        if path.endswith(".toml"):
+            return tomllib.load(config_file)
+        else:
+            return json.load(config_file)
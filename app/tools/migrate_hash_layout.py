@@ -0,0 +1,32 @@
+import argparse
+
+from redis import Redis, ResponseError
+
+from app.redis_clients import create_redis_client
+from app.repositories import hash_cart_scripts
+from app.repositories.cart_repository import summary_key
+from app.settings import load_settings
+
+
+def migrate(redis_client: Redis, key_prefix: str = "", batch_size: int = 500) -> dict[str, int]:
+    migrate_cart = redis_client.register_script(hash_cart_scripts.MIGRATE_CART)
+    result = {"migrated": 0, "failed": 0}
+    for key in redis_client.scan_iter(match=key_prefix + "*", count=batch_size, _type="string"):
+        try:
+            result["migrated"] += migrate_cart(keys=[key, summary_key(key)])
+        except ResponseError:
+            result["failed"] += 1
+
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert JSON cart strings into the hash storage layout in place. "
+                    "Redis is configured through the same CART_* settings as the API."
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    settings = load_settings()
+    print(migrate(create_redis_client(settings), key_prefix=settings.key_prefix, batch_size=args.batch_size))
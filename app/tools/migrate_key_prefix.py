@@ -0,0 +1,45 @@
+import argparse
+import uuid
+
+from redis import Redis, ResponseError
+
+from app.redis_clients import create_redis_client
+from app.settings import load_settings
+
+
+def migrate(redis_client: Redis, key_prefix: str, batch_size: int = 500) -> dict[str, int]:
+    result = {"moved": 0, "skipped": 0, "failed": 0}
+    for key in redis_client.scan_iter(count=batch_size):
+        key = key.decode() if isinstance(key, bytes) else key
+        if key.startswith(key_prefix) or not _is_cart_id(key):
+            continue
+        try:
+            if redis_client.renamenx(key, key_prefix + key):
+                result["moved"] += 1
+            else:
+                result["skipped"] += 1
+        except ResponseError:
+            result["failed"] += 1
+
+    return result
+
+
+def _is_cart_id(key: str) -> bool:
+    try:
+        uuid.UUID(key)
+    except ValueError:
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move carts stored under bare cart id keys into the configured key prefix. "
+                    "Redis is configured through the same CART_* settings as the API."
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    settings = load_settings()
+    print(migrate(create_redis_client(settings), key_prefix=settings.key_prefix, batch_size=args.batch_size))
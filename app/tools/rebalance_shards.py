@@ -0,0 +1,76 @@
+import argparse
+from typing import Dict, List, Optional
+
+from redis import Redis, ResponseError
+
+from app.redis_clients import create_shard_clients
+from app.repositories.cart_repository import MOVE_TIMEOUT, key_pattern, summary_key
+from app.repositories.hash_ring import HashRing
+from app.settings import load_settings
+
+
+def rebalance(
+        shard_clients: Dict[str, Redis],
+        ring: HashRing,
+        key_prefix: str,
+        db: int = 0,
+        auth: Optional[str] = None,
+        batch_size: int = 500
+) -> dict[str, int]:
+    result = {"moved": 0, "kept": 0, "conflicts": 0}
+    for address, redis_client in shard_clients.items():
+        pending: Dict[str, List[str]] = {}
+        for key in redis_client.scan_iter(match=key_pattern(key_prefix), count=batch_size):
+            key = key.decode() if isinstance(key, bytes) else key
+            owner = ring.node(key[len(key_prefix):])
+            if owner == address:
+                result["kept"] += 1
+                continue
+            pending.setdefault(owner, []).append(key)
+            if len(pending[owner]) >= batch_size:
+                _move(redis_client, pending.pop(owner), owner, db, auth, result)
+        for owner, keys in pending.items():
+            _move(redis_client, keys, owner, db, auth, result)
+
+    return result
+
+
+def _move(redis_client: Redis, keys: List[str], target: str, db: int, auth: Optional[str], result: dict[str, int]):
+    host, _, port = target.rpartition(":")
+    try:
+        redis_client.migrate(host, int(port), keys + [summary_key(key) for key in keys], db, MOVE_TIMEOUT, auth=auth)
+        result["moved"] += len(keys)
+        return
+    except ResponseError as e:
+        if not str(e).startswith("BUSYKEY"):
+            raise
+
+    # Keys that already exist on their new node were written there after the API started moving carts, so those
+    # copies are newer and the old ones are left in place to be looked at.
+    for key in keys:
+        try:
+            redis_client.migrate(host, int(port), [key, summary_key(key)], db, MOVE_TIMEOUT, auth=auth)
+            result["moved"] += 1
+        except ResponseError as e:
+            if not str(e).startswith("BUSYKEY"):
+                raise
+            result["conflicts"] += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move every cart to the shard that owns it under CART_REDIS_SHARDS, after nodes were added or "
+                    "removed. Redis is configured through the same CART_* settings as the API."
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    settings = load_settings()
+    print(rebalance(
+        create_shard_clients(settings),
+        HashRing(settings.redis_shards, vnodes=settings.redis_shard_vnodes),
+        key_prefix=settings.key_prefix,
+        db=settings.redis_db,
+        auth=settings.redis_password,
+        batch_size=args.batch_size
+    ))
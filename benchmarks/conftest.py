@@ -0,0 +1,47 @@
+import os
+
+import fakeredis
+import pytest
+from redis import Redis
+
+from app.repositories.cart_event_repository import CartEventRepository
+from app.repositories.cart_repository import CartRepository
+from app.repositories.clear_job_repository import ClearJobRepository
+from app.repositories.memory_cart_repository import MemoryCartRepository, MemoryClearJobRepository
+from app.repositories.sqlite_cart_repository import SqliteCartRepository, SqliteClearJobRepository, SqliteDatabase
+from app.services.cart_service import CartService
+from tests.utils import stubbed_cart, stubbed_item
+
+BENCH_REDIS_URL_VARIABLE = "CART_BENCH_REDIS_URL"
+BENCH_KEY_PREFIX = "bench-cart:"
+CART_SIZES = [1, 100, 1000, 10000]
+STORAGE_BACKENDS = ["redis", "memory", "sqlite"]
+
+
+def sized_cart(size: int):
+    return stubbed_cart(items=[stubbed_item() for _ in range(size)])
+
+
+@pytest.fixture(scope="session")
+def redis_client():
+    url = os.environ.get(BENCH_REDIS_URL_VARIABLE)
+    client = Redis.from_url(url, decode_responses=True) if url else fakeredis.FakeRedis(decode_responses=True)
+    yield client
+    cart_repo = CartRepository(client, key_prefix=BENCH_KEY_PREFIX)
+    cursor, _ = cart_repo.unlink_carts()
+    while cursor:
+        cursor, _ = cart_repo.unlink_carts(cursor=cursor)
+
+
+@pytest.fixture(scope="session", params=STORAGE_BACKENDS)
+def cart_service(request, redis_client, tmp_path_factory) -> CartService:
+    if request.param == "memory":
+        cart_store, clear_job_store = MemoryCartRepository(), MemoryClearJobRepository()
+    elif request.param == "sqlite":
+        database = SqliteDatabase(str(tmp_path_factory.mktemp("bench") / "carts.db"))
+        cart_store, clear_job_store = SqliteCartRepository(database), SqliteClearJobRepository(database)
+    else:
+        cart_store = CartRepository(redis_client, key_prefix=BENCH_KEY_PREFIX)
+        clear_job_store = ClearJobRepository(redis_client, key_prefix="bench-cart-job:")
+
+    return CartService(cart_store, clear_job_store, CartEventRepository(redis_client, key="bench-cart-events"))
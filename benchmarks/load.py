@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+import orjson
+import uvicorn
+
+SERVER_START_TIMEOUT = 30.0
+BULK_GET_SIZE = 20
+
+SCENARIO = [
+    ("GET /cart/{cart_id}", 50),
+    ("GET /cart/{cart_id}/{item_id}", 15),
+    ("POST /cart/{cart_id}/{item_name}/{quantity}", 15),
+    ("POST /cart/{cart_id}/batch", 10),
+    ("GET /cart", 5),
+    ("POST /cart/_bulk_get", 5)
+]
+
+
+class LoadRun:
+    def __init__(self, client: httpx.AsyncClient, carts: Dict[str, List[str]]):
+        self._client = client
+        self._carts = carts
+        self._cart_ids = list(carts)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, endpoint: str):
+        cart_id = random.choice(self._cart_ids)
+        if endpoint == "GET /cart/{cart_id}":
+            call = self._client.get(f"/cart/{cart_id}")
+        elif endpoint == "GET /cart/{cart_id}/{item_id}":
+            call = self._client.get(f"/cart/{cart_id}/{random.choice(self._carts[cart_id])}")
+        elif endpoint == "POST /cart/{cart_id}/{item_name}/{quantity}":
+            call = self._client.post(f"/cart/{cart_id}/item-{random.randrange(50)}/1")
+        elif endpoint == "POST /cart/{cart_id}/batch":
+            operations = [{"op": "add", "item_name": f"item-{random.randrange(50)}", "quantity": 1} for _ in range(5)]
+            call = self._client.post(f"/cart/{cart_id}/batch", json=operations)
+        elif endpoint == "GET /cart":
+            call = self._client.get("/cart", params={"limit": 100})
+        else:
+            cart_ids = random.sample(self._cart_ids, min(BULK_GET_SIZE, len(self._cart_ids)))
+            call = self._client.post("/cart/_bulk_get", json={"cart_ids": cart_ids})
+
+        start = time.perf_counter()
+        try:
+            response = await call
+            failed = response.status_code >= 500
+        except httpx.HTTPError:
+            failed = True
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if failed:
+            self.errors[endpoint] += 1
+
+    async def worker(self, deadline: float):
+        endpoints = [endpoint for endpoint, _ in SCENARIO]
+        weights = [weight for _, weight in SCENARIO]
+        while time.perf_counter() < deadline:
+            await self.request(random.choices(endpoints, weights)[0])
+
+
+async def seed_carts(client: httpx.AsyncClient, carts: int, items: int) -> Dict[str, List[str]]:
+    seeded = {}
+    for _ in range(carts):
+        cart_id = str(uuid.uuid4())
+        operations = [{"op": "add", "item_name": f"item-{index}", "quantity": 1} for index in range(items)]
+        response = await client.post(f"/cart/{cart_id}/batch", json=operations)
+        response.raise_for_status()
+        seeded[cart_id] = [result["item"]["item_id"] for result in response.json()["results"]]
+
+    return seeded
+
+
+async def run_load(url: str, duration: float, concurrency: int, carts: int, items: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        run = LoadRun(client, await seed_carts(client, carts, items))
+        start = time.perf_counter()
+        await asyncio.gather(*[run.worker(start + duration) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    return summarize(run.latencies, run.errors, elapsed)
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> dict:
+    report = {}
+    for endpoint, samples in sorted(latencies.items()) + [("total", [x for xs in latencies.values() for x in xs])]:
+        if len(samples) < 2:
+            continue
+        cuts = statistics.quantiles(samples, n=100)
+        report[endpoint] = {
+            "requests": len(samples),
+            "errors": sum(errors.values()) if endpoint == "total" else errors.get(endpoint, 0),
+            "rps": len(samples) / elapsed,
+            "p50_ms": cuts[49] * 1000,
+            "p95_ms": cuts[94] * 1000,
+            "p99_ms": cuts[98] * 1000
+        }
+
+    return report
+
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    print(f"{'endpoint':<46} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, stats in report.items():
+        print(
+            f"{endpoint:<46} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>9.1f} "
+            f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}"
+        )
+        if baseline and endpoint in baseline:
+            deltas = [
+                f"{name} {(stats[name] / baseline[endpoint][name] - 1) * 100:+.1f}%"
+                for name in ("rps", "p50_ms", "p95_ms", "p99_ms")
+                if baseline[endpoint][name]
+            ]
+            print(f"{'  vs baseline':<46} {', '.join(deltas)}")
+
+
+def serve_in_process(fake: bool) -> str:
+    if fake:
+        import fakeredis
+        from fakeredis import aioredis as fake_aioredis
+
+        from app import app_module
+
+        fake_server = fakeredis.FakeServer()
+        app_module.create_redis_client = lambda settings: fakeredis.FakeRedis(
+            server=fake_server,
+            decode_responses=settings.storage_codec == "json"
+        )
+        app_module.create_async_redis_client = lambda settings: fake_aioredis.FakeRedis(
+            server=fake_server,
+            decode_responses=settings.storage_codec == "json"
+        )
+
+    from app.main import app
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    http_server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=http_server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while not http_server.started:
+        if not thread.is_alive():
+            raise RuntimeError("the in-process server stopped before it started, see its log above")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"the in-process server did not start within {SERVER_START_TIMEOUT} seconds")
+        time.sleep(0.05)
+
+    return f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate HTTP load against the cart API and report latencies.")
+    parser.add_argument("--url", help="running API to load, defaults to an in-process server")
+    parser.add_argument("--fakeredis", action="store_true", help="back the in-process server with fakeredis")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--carts", type=int, default=200)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--save", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="print changes against a report saved with --save")
+    args = parser.parse_args()
+    if args.carts < 1 or args.items < 1:
+        parser.error("--carts and --items must be at least 1")
+
+    url = args.url or serve_in_process(args.fakeredis)
+    report = asyncio.run(run_load(url, args.duration, args.concurrency, args.carts, args.items))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "rb") as baseline_file:
+            baseline = orjson.loads(baseline_file.read())
+    print_report(report, baseline)
+
+    if args.save:
+        with open(args.save, "wb") as report_file:
+            report_file.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+
+if __name__ == "__main__":
+    main()
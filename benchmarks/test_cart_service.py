@@ -0,0 +1,49 @@
+import uuid
+
+import pytest
+
+from app.schemas.models import AddItemOperation, ItemQuantity, RemoveQuantityOperation
+from benchmarks.conftest import CART_SIZES, sized_cart
+
+
+@pytest.fixture(params=CART_SIZES)
+def stored_cart(request, cart_service):
+    cart = sized_cart(request.param)
+    cart_service.replace_items(cart.cart_id, [ItemQuantity(item_name=x.item_name, quantity=1) for x in cart.items])
+    return cart_service.get_cart(cart.cart_id)
+
+
+def test_get_cart(benchmark, cart_service, stored_cart):
+    benchmark.group = "get_cart"
+    benchmark(cart_service.get_cart, stored_cart.cart_id)
+
+
+def test_get_item(benchmark, cart_service, stored_cart):
+    benchmark.group = "get_item"
+    benchmark(cart_service.get_item, stored_cart.cart_id, stored_cart.items[-1].item_id)
+
+
+def test_add_item_to_existing_line(benchmark, cart_service, stored_cart):
+    benchmark.group = "add_item"
+    benchmark(cart_service.add_item, stored_cart.cart_id, stored_cart.items[-1].item_name, 1)
+
+
+def test_apply_operations(benchmark, cart_service, stored_cart):
+    benchmark.group = "apply_operations"
+    item = stored_cart.items[-1]
+    operations = [
+        AddItemOperation(op="add", item_name=item.item_name, quantity=2),
+        RemoveQuantityOperation(op="remove", item_id=item.item_id, quantity=1)
+    ] * 5
+    benchmark(cart_service.apply_operations, stored_cart.cart_id, operations)
+
+
+def test_replace_items(benchmark, cart_service, stored_cart):
+    benchmark.group = "replace_items"
+    items = [ItemQuantity(item_name=x.item_name, quantity=2) for x in stored_cart.items]
+    benchmark(cart_service.replace_items, stored_cart.cart_id, items)
+
+
+def test_get_many(benchmark, cart_service, stored_cart):
+    benchmark.group = "get_many"
+    benchmark(cart_service.get_many, [stored_cart.cart_id] + [uuid.uuid4() for _ in range(99)])
@@ -0,0 +1,75 @@
+import random
+import tracemalloc
+
+import orjson
+import pytest
+
+from app.repositories.cart_codecs import JsonCartCodec, MsgpackCartCodec
+from app.schemas.cart_lines import lines_from_cart
+from benchmarks.conftest import CART_SIZES, sized_cart
+
+CODECS = {"json": JsonCartCodec(), "msgpack": MsgpackCartCodec()}
+LARGE_CART_SIZES = [1000, 10000]
+
+
+def retained_bytes(decode, raw) -> int:
+    tracemalloc.start()
+    try:
+        decoded = decode(raw)
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del decoded
+    return retained
+
+
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("size", CART_SIZES)
+def test_encode_cart(benchmark, codec, size):
+    benchmark.group = f"encode-{codec}"
+    benchmark(CODECS[codec].encode, sized_cart(size))
+
+
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("size", CART_SIZES)
+def test_decode_cart(benchmark, codec, size):
+    benchmark.group = f"decode-{codec}"
+    benchmark(CODECS[codec].decode, CODECS[codec].encode(sized_cart(size)))
+
+
+@pytest.mark.parametrize("representation", ["model", "lines"])
+@pytest.mark.parametrize("size", LARGE_CART_SIZES)
+def test_decode_cart_representation(benchmark, representation, size):
+    benchmark.group = f"decode-representation-{size}"
+    codec = CODECS["json"]
+    raw = codec.encode(sized_cart(size))
+    decode = codec.decode if representation == "model" else codec.decode_lines
+    benchmark.extra_info["retained_bytes"] = retained_bytes(decode, raw)
+    benchmark(decode, raw)
+
+
+@pytest.mark.parametrize("representation", ["model", "lines"])
+@pytest.mark.parametrize("size", LARGE_CART_SIZES)
+def test_encode_cart_representation(benchmark, representation, size):
+    benchmark.group = f"encode-representation-{size}"
+    codec = CODECS["json"]
+    cart = sized_cart(size)
+    if representation == "model":
+        benchmark(codec.encode, cart)
+    else:
+        benchmark(codec.encode_lines, lines_from_cart(cart))
+
+
+@pytest.mark.parametrize("size", CART_SIZES)
+def test_render_cart_response(benchmark, size):
+    benchmark.group = "render-response"
+    cart = sized_cart(size)
+    benchmark(lambda: orjson.dumps(cart.model_dump(mode="json")))
+
+
+@pytest.mark.parametrize("size", CART_SIZES)
+def test_find_item_by_id(benchmark, size):
+    benchmark.group = "find-item"
+    cart = sized_cart(size)
+    item_ids = [random.choice(cart.items).item_id for _ in range(100)]
+    benchmark(lambda: [next((x for x in cart.items if x.item_id == item_id), None) for item_id in item_ids])
@@ -1,20 +1,67 @@
 import json
 import unittest
 import uuid
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock
 
+import pytest
 from fastapi.testclient import TestClient
 
+from app.controllers import cart_controller
 from app.main import app
+from app.schemas.models import (
+    AddItemOperation,
+    CartBulkResult,
+    CartEvent,
+    CartEventPage,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    ClearJob,
+    DeleteItemOperation,
+    ItemQuantity,
+    MAX_QUANTITY
+)
 from tests.utils import stubbed_cart, stubbed_item, random_int, random_string
 
 client = TestClient(app=app)
 
 
-def test_clear_responds_with_200():
-    response = client.delete("/cart/clear")
-    assert response.status_code == 200
-    assert response.json() == {"result": "carts cleared"}
+def test_clear_starts_clear_job():
+    mock_cart_service = Mock()
+    job = ClearJob(job_id=uuid.uuid4())
+    mock_cart_service.clear_carts.return_value = job
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.clear_carts",
+            new=mock_cart_service.clear_carts
+    ):
+        response = client.delete("/cart/clear")
+        assert response.status_code == 202
+        assert response.json() == {"job_id": str(job.job_id), "status": "running", "unlinked": 0, "error": None}
+
+
+def test_get_clear_job_returns_progress():
+    mock_cart_service = Mock()
+    job = ClearJob(job_id=uuid.uuid4(), status="done", unlinked=12)
+    mock_cart_service.get_clear_job.return_value = job
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.get_clear_job",
+            new=mock_cart_service.get_clear_job
+    ):
+        response = client.get(f"/cart/clear/{job.job_id}")
+        assert response.status_code == 200
+        assert response.json()["unlinked"] == 12
+        mock_cart_service.get_clear_job.assert_called_once_with(job.job_id)
+
+
+def test_get_clear_job_returns_404_for_unknown_job():
+    mock_cart_service = Mock()
+    mock_cart_service.get_clear_job.return_value = None
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.get_clear_job",
+            new=mock_cart_service.get_clear_job
+    ):
+        response = client.get(f"/cart/clear/{uuid.uuid4()}")
+        assert response.status_code == 404
 
 
 def test_clear_throws_http_exception():
@@ -29,18 +76,87 @@ def test_clear_throws_http_exception():
         assert response.json() == {"detail": "Test Exception"}
 
 
-def test_get_all_returns_carts():
+def test_get_all_returns_page_of_carts():
     mock_cart_service = Mock()
-    carts = [stubbed_cart(), stubbed_cart()]
-    mock_cart_service.get_all.return_value = carts
+    page = CartPage(carts=[stubbed_cart(), stubbed_cart()], next_cursor=random_int(low=1))
+    mock_cart_service.get_all.return_value = page
     with unittest.mock.patch(
             "app.services.cart_service.CartService.get_carts",
             new=mock_cart_service.get_all
     ):
-        response = client.get("/cart")
+        response = client.get("/cart?cursor=5&limit=2")
         assert response.status_code == 200
-        expected = {"carts": [cart.dict() for cart in carts]}
+        expected = {
+            "carts": [cart.model_dump(mode="json") for cart in page.carts],
+            "next_cursor": page.next_cursor
+        }
         assert response.json() == expected
+        mock_cart_service.get_all.assert_called_once_with(cursor=5, limit=2)
+
+
+def test_export_streams_carts_as_ndjson_page_by_page():
+    mock_cart_service = Mock()
+    carts = [stubbed_cart(), stubbed_cart(), stubbed_cart()]
+    mock_cart_service.get_carts.side_effect = [
+        CartPage(carts=carts[:2], next_cursor=7),
+        CartPage(carts=[], next_cursor=9),
+        CartPage(carts=carts[2:], next_cursor=None)
+    ]
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.get_carts",
+            new=mock_cart_service.get_carts
+    ):
+        response = client.get("/cart/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == [
+            cart.model_dump(mode="json") for cart in carts
+        ]
+        assert [call.kwargs["cursor"] for call in mock_cart_service.get_carts.call_args_list] == [0, 7, 9]
+
+
+def test_get_events_long_polls_from_offset():
+    cart_id = uuid.uuid4()
+    mock_read_events = AsyncMock(return_value=CartEventPage(
+        events=[CartEvent(event_id="5-0", type="delete_cart", cart_id=cart_id)],
+        last_event_id="5-0"
+    ))
+    with unittest.mock.patch(
+            "app.repositories.async_cart_event_repository.AsyncCartEventRepository.read_events",
+            new=mock_read_events
+    ):
+        response = client.get("/cart/events?after=4-0&wait=10")
+        assert response.status_code == 200
+        assert response.json() == {
+            "events": [{"event_id": "5-0", "type": "delete_cart", "cart_id": str(cart_id)}],
+            "last_event_id": "5-0"
+        }
+        mock_read_events.assert_awaited_once_with(after="4-0", count=100, wait=10)
+
+
+def test_get_events_rejects_malformed_offset():
+    response = client.get("/cart/events?after=latest")
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_event_lines_stream_events_and_keep_alives():
+    mock_get_events = AsyncMock(side_effect=[
+        CartEventPage(events=[CartEvent(event_id="5-0", type="clear", count=2)], last_event_id="5-0"),
+        CartEventPage(events=[], last_event_id="5-0")
+    ])
+    with unittest.mock.patch.object(cart_controller.cart_service, "get_events", new=mock_get_events):
+        lines = cart_controller.event_lines("$")
+        assert await anext(lines) == 'id: 5-0\ndata: {"event_id":"5-0","type":"clear","count":2}\n\n'
+        assert await anext(lines) == ": keep-alive\n\n"
+        await lines.aclose()
+
+    assert [call.kwargs["after"] for call in mock_get_events.call_args_list] == ["$", "5-0"]
+
+
+def test_get_all_rejects_invalid_limit():
+    response = client.get("/cart?limit=0")
+    assert response.status_code == 422
 
 
 def test_get_cart_returns_cart():
@@ -54,6 +170,164 @@ def test_get_cart_returns_cart():
         response = client.get(f"/cart/{cart.cart_id}")
         assert response.status_code == 200
         assert response.json() == json.loads(cart.model_dump_json())
+        assert response.headers["ETag"] == '"0"'
+
+
+def test_get_cart_returns_304_when_etag_matches():
+    mock_cart_service = Mock()
+    cart = stubbed_cart()
+    cart.version = 4
+    mock_cart_service.get_cart.return_value = cart
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.get_cart",
+            new=mock_cart_service.get_cart
+    ):
+        response = client.get(f"/cart/{cart.cart_id}", headers={"If-None-Match": 'W/"3", "4"'})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == '"4"'
+        assert response.content == b""
+
+
+def test_get_summary_returns_summary_with_etag():
+    mock_cart_service = Mock()
+    summary = CartSummary(cart_id=uuid.uuid4(), version=3, line_count=2, total_quantity=5)
+    mock_cart_service.get_summary.return_value = summary
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.get_summary",
+            new=mock_cart_service.get_summary
+    ):
+        response = client.get(f"/cart/{summary.cart_id}/summary")
+        assert response.status_code == 200
+        assert response.json() == {
+            "cart_id": str(summary.cart_id),
+            "version": 3,
+            "epoch": "",
+            "line_count": 2,
+            "total_quantity": 5
+        }
+        assert response.headers["ETag"] == '"3"'
+
+        assert client.get(f"/cart/{summary.cart_id}/summary", headers={"If-None-Match": '"3"'}).status_code == 304
+
+
+def test_get_summary_returns_404_when_cart_does_not_exist():
+    with unittest.mock.patch("app.services.cart_service.CartService.get_summary", return_value=None):
+        assert client.get(f"/cart/{uuid.uuid4()}/summary").status_code == 404
+
+
+def test_replace_items_returns_cart_with_etag():
+    mock_cart_service = Mock()
+    cart = stubbed_cart()
+    cart.version = 2
+    mock_cart_service.replace_items.return_value = cart
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.replace_items",
+            new=mock_cart_service.replace_items
+    ):
+        response = client.put(
+            f"/cart/{cart.cart_id}",
+            json=[{"item_name": "a", "quantity": 2}],
+            headers={"If-Match": '"1"'}
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"2"'
+        mock_cart_service.replace_items.assert_called_once_with(
+            cart.cart_id,
+            [ItemQuantity(item_name="a", quantity=2)],
+            expected_version=1,
+            expected_epoch=""
+        )
+
+
+def test_etag_carries_the_cart_epoch():
+    mock_cart_service = Mock()
+    cart = stubbed_cart()
+    cart.version = 4
+    cart.epoch = "5f3a"
+    mock_cart_service.get_cart.return_value = cart
+    mock_cart_service.replace_items.return_value = None
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.get_cart",
+            new=mock_cart_service.get_cart
+    ), unittest.mock.patch(
+        "app.services.cart_service.CartService.replace_items",
+        new=mock_cart_service.replace_items
+    ):
+        response = client.get(f"/cart/{cart.cart_id}")
+        assert response.headers["ETag"] == '"5f3a-4"'
+        # A tag of the same version from a cart that was deleted and created again is not a match.
+        assert client.get(f"/cart/{cart.cart_id}", headers={"If-None-Match": '"77c1-4", "4"'}).status_code == 200
+        assert client.get(f"/cart/{cart.cart_id}", headers={"If-None-Match": '"5f3a-4"'}).status_code == 304
+
+        response = client.put(f"/cart/{cart.cart_id}", json=[], headers={"If-Match": '"77c1-4"'})
+        assert response.status_code == 412
+        assert mock_cart_service.replace_items.call_args.kwargs == {"expected_version": 4, "expected_epoch": "77c1"}
+
+
+def test_replace_items_returns_412_when_if_match_is_stale():
+    mock_cart_service = Mock()
+    mock_cart_service.replace_items.return_value = None
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.replace_items",
+            new=mock_cart_service.replace_items
+    ):
+        response = client.put(f"/cart/{uuid.uuid4()}", json=[], headers={"If-Match": '"1"'})
+        assert response.status_code == 412
+
+
+def test_if_match_star_requires_only_that_the_cart_exists():
+    mock_cart_service = Mock()
+    cart = stubbed_cart()
+    cart.epoch = "5f3a"
+    mock_cart_service.get_summary.side_effect = [cart.summary(), None, cart.summary()]
+    mock_cart_service.replace_items.return_value = cart
+    mock_cart_service.apply_operations.return_value = []
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.get_summary",
+            new=mock_cart_service.get_summary
+    ), unittest.mock.patch(
+        "app.services.cart_service.CartService.replace_items",
+        new=mock_cart_service.replace_items
+    ), unittest.mock.patch(
+        "app.services.cart_service.CartService.apply_operations",
+        new=mock_cart_service.apply_operations
+    ):
+        replaced = client.put(f"/cart/{cart.cart_id}", json=[], headers={"If-Match": "*"})
+        missing = client.put(f"/cart/{uuid.uuid4()}", json=[], headers={"If-Match": "*"})
+        applied = client.post(f"/cart/{cart.cart_id}/batch", json=[], headers={"If-Match": " * "})
+
+    assert replaced.status_code == 200
+    assert mock_cart_service.replace_items.call_args.kwargs == {"expected_version": None, "expected_epoch": "5f3a"}
+    assert missing.status_code == 412
+    mock_cart_service.replace_items.assert_called_once()
+    assert applied.status_code == 200
+    assert mock_cart_service.apply_operations.call_args.kwargs == {"expected_version": None, "expected_epoch": "5f3a"}
+
+
+def test_replace_items_returns_409_when_retries_are_exhausted():
+    mock_cart_service = Mock()
+    mock_cart_service.replace_items.return_value = None
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.replace_items",
+            new=mock_cart_service.replace_items
+    ):
+        response = client.put(f"/cart/{uuid.uuid4()}", json=[])
+        assert response.status_code == 409
+
+
+def test_get_many_returns_carts_and_missing_ids():
+    mock_cart_service = Mock()
+    cart = stubbed_cart()
+    missing_cart_id = uuid.uuid4()
+    mock_cart_service.get_many.return_value = CartBulkResult(carts=[cart], missing_cart_ids=[missing_cart_id])
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.get_many",
+            new=mock_cart_service.get_many
+    ):
+        response = client.post("/cart/_bulk_get", json={"cart_ids": [str(cart.cart_id), str(missing_cart_id)]})
+        assert response.status_code == 200
+        assert response.json() == {"carts": [cart.model_dump(mode="json")], "missing_cart_ids": [str(missing_cart_id)]}
+        mock_cart_service.get_many.assert_called_once_with([cart.cart_id, missing_cart_id])
 
 
 def test_add_item_returns_item():
@@ -67,7 +341,7 @@ def test_add_item_returns_item():
     ):
         response = client.post(f"/cart/{uuid.uuid4()}/{item.item_name}/{quantity}")
         assert response.status_code == 200
-        expected = {"item": item.dict()}
+        expected = {"item": item.model_dump(mode="json")}
         assert response.json() == expected
 
 
@@ -78,6 +352,121 @@ def test_add_item_throws_exception_when_quantity_is_zero_or_less():
     assert response.json() == {"detail": "Quantity must be greater than 0."}
 
 
+def test_add_item_accepts_quantities_up_to_the_bound_only():
+    mock_cart_service = Mock()
+    mock_cart_service.add_item.return_value = stubbed_item(quantity=MAX_QUANTITY)
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.add_item",
+            new=mock_cart_service.add_item
+    ):
+        assert client.post(f"/cart/{uuid.uuid4()}/apple/{MAX_QUANTITY}").status_code == 200
+        response = client.post(f"/cart/{uuid.uuid4()}/apple/{MAX_QUANTITY + 1}")
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": f"Quantity must be at most {MAX_QUANTITY}."}
+    mock_cart_service.add_item.assert_called_once()
+
+
+@pytest.mark.parametrize("op", [
+    {"op": "add", "item_name": "apple"},
+    {"op": "remove", "item_id": str(uuid.uuid4())}
+])
+def test_apply_operations_rejects_quantities_above_the_bound(op):
+    mock_cart_service = Mock()
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.apply_operations",
+            new=mock_cart_service.apply_operations
+    ):
+        response = client.post(f"/cart/{uuid.uuid4()}/batch", json=[{**op, "quantity": MAX_QUANTITY + 1}])
+
+    assert response.status_code == 422
+    mock_cart_service.apply_operations.assert_not_called()
+
+
+def test_replace_items_and_remove_quantity_reject_quantities_above_the_bound():
+    cart_id = uuid.uuid4()
+
+    replaced = client.put(f"/cart/{cart_id}", json=[{"item_name": "apple", "quantity": MAX_QUANTITY + 1}])
+    removed = client.delete(f"/cart/{cart_id}/{uuid.uuid4()}/{MAX_QUANTITY + 1}")
+
+    assert replaced.status_code == 422
+    assert removed.status_code == 422
+
+
+def test_apply_operations_returns_results():
+    mock_cart_service = Mock()
+    item = stubbed_item()
+    cart_id = uuid.uuid4()
+    mock_cart_service.apply_operations.return_value = [
+        CartOperationResult(op="add", item=item),
+        CartOperationResult(op="delete", deleted=True)
+    ]
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.apply_operations",
+            new=mock_cart_service.apply_operations
+    ):
+        item_id = uuid.uuid4()
+        response = client.post(
+            f"/cart/{cart_id}/batch",
+            json=[
+                {"op": "add", "item_name": item.item_name, "quantity": item.quantity},
+                {"op": "delete", "item_id": str(item_id)}
+            ]
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "results": [
+                {"op": "add", "item": item.model_dump(mode="json")},
+                {"op": "delete", "deleted": True}
+            ]
+        }
+        mock_cart_service.apply_operations.assert_called_once_with(
+            cart_id,
+            [
+                AddItemOperation(op="add", item_name=item.item_name, quantity=item.quantity),
+                DeleteItemOperation(op="delete", item_id=item_id)
+            ],
+            expected_version=None,
+            expected_epoch=None
+        )
+
+
+def test_apply_operations_returns_412_when_if_match_is_stale():
+    mock_cart_service = Mock()
+    mock_cart_service.apply_operations.return_value = None
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.apply_operations",
+            new=mock_cart_service.apply_operations
+    ):
+        response = client.post(
+            f"/cart/{uuid.uuid4()}/batch",
+            json=[{"op": "delete", "item_id": str(uuid.uuid4())}],
+            headers={"If-Match": '"3"'}
+        )
+        assert response.status_code == 412
+        assert mock_cart_service.apply_operations.call_args.kwargs == {"expected_version": 3, "expected_epoch": ""}
+
+
+def test_apply_operations_rejects_unknown_operation():
+    response = client.post(f"/cart/{uuid.uuid4()}/batch", json=[{"op": "replace", "item_name": random_string()}])
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("quantity", [0, -5])
+def test_apply_operations_rejects_remove_of_less_than_1(quantity):
+    mock_cart_service = Mock()
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.apply_operations",
+            new=mock_cart_service.apply_operations
+    ):
+        response = client.post(
+            f"/cart/{uuid.uuid4()}/batch",
+            json=[{"op": "remove", "item_id": str(uuid.uuid4()), "quantity": quantity}]
+        )
+        assert response.status_code == 422
+        mock_cart_service.apply_operations.assert_not_called()
+
+
 def test_get_item_returns_item():
     item = stubbed_item()
     mock_cart_service = Mock()
@@ -88,7 +477,7 @@ def test_get_item_returns_item():
     ):
         response = client.get(f"/cart/{uuid.uuid4()}/{item.item_id}")
         assert response.status_code == 200
-        expected = {"item": item.dict()}
+        expected = {"item": item.model_dump(mode="json")}
         assert response.json() == expected
 
 
@@ -165,14 +554,25 @@ def test_remove_quantity_returns_200_if_quantity_removed_greater_than_0():
         assert response.json() == {"result": f"{quantity} items removed."}
 
 
-def test_remove_quantity_returns_404_if_quantity_removed_is_0_or_less():
+def test_remove_quantity_returns_404_if_no_quantity_was_removed():
     mock_cart_service = Mock()
-    quantity = random_int(low=-100, high=0)
-    mock_cart_service.remove_quantity.return_value = quantity
+    mock_cart_service.remove_quantity.return_value = 0
     with unittest.mock.patch(
             "app.services.cart_service.CartService.remove_quantity",
             new=mock_cart_service.remove_quantity
     ):
-        response = client.delete(f"/cart/{uuid.uuid4()}/{uuid.uuid4()}/{random_int(low=-100, high=0)}")
+        response = client.delete(f"/cart/{uuid.uuid4()}/{uuid.uuid4()}/{random_int(low=1)}")
         assert response.status_code == 404
         assert response.json() == {"detail": "Item not found."}
+
+
+@pytest.mark.parametrize("quantity", [0, -5])
+def test_remove_quantity_returns_422_for_quantity_below_1(quantity):
+    mock_cart_service = Mock()
+    with unittest.mock.patch(
+            "app.services.cart_service.CartService.remove_quantity",
+            new=mock_cart_service.remove_quantity
+    ):
+        response = client.delete(f"/cart/{uuid.uuid4()}/{uuid.uuid4()}/{quantity}")
+        assert response.status_code == 422
+        mock_cart_service.remove_quantity.assert_not_called()
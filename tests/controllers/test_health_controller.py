@@ -0,0 +1,30 @@
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app=app)
+
+
+def test_live_returns_alive():
+    response = client.get("/health/live")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+
+@patch("app.app_container.AppContainer.check_ready", new_callable=AsyncMock, return_value="ready")
+def test_ready_returns_ready(mock_check_ready):
+    response = client.get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+
+@patch("app.app_container.AppContainer.check_ready", new_callable=AsyncMock, return_value="unavailable")
+def test_ready_returns_503_when_redis_is_unavailable(mock_check_ready):
+    response = client.get("/health/ready")
+
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable"}
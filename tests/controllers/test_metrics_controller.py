@@ -0,0 +1,13 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app=app)
+
+
+def test_metrics_returns_prometheus_exposition():
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "cart_request_duration_seconds" in response.text
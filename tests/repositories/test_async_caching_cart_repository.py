@@ -0,0 +1,73 @@
+import uuid
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.repositories.async_caching_cart_repository import AsyncCachingCartRepository
+from app.repositories.cart_cache import CartCache
+from app.schemas.models import CartBulkResult
+from tests.utils import stubbed_cart
+
+
+@pytest.mark.anyio
+class TestAsyncCachingCartRepository:
+
+    def setup_method(self):
+        self.mock_cart_repo = AsyncMock()
+        self.cart_cache = CartCache()
+        self.cart_cache.active = True
+        self.test_object = AsyncCachingCartRepository(self.mock_cart_repo, self.cart_cache)
+
+    async def test_get_cart_reads_through_cache(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+
+        assert await self.test_object.get_cart(cart.cart_id) == cart
+        assert await self.test_object.get_cart(cart.cart_id) == cart
+        self.mock_cart_repo.get_cart.assert_awaited_once_with(cart.cart_id)
+
+    async def test_get_many_ends_loads_of_missing_and_failed_reads(self):
+        missing_cart_ids = [uuid.uuid4() for _ in range(3)]
+        self.mock_cart_repo.get_many.return_value = CartBulkResult(carts=[], missing_cart_ids=missing_cart_ids)
+        await self.test_object.get_many(missing_cart_ids)
+        self.mock_cart_repo.get_many.side_effect = ConnectionError("down")
+
+        with pytest.raises(ConnectionError):
+            await self.test_object.get_many([uuid.uuid4()])
+
+        assert self.cart_cache._loads == {}
+
+    async def test_get_item_reads_cached_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        await self.test_object.get_cart(cart.cart_id)
+
+        assert await self.test_object.get_item(cart.cart_id, cart.items[0].item_id) == cart.items[0]
+        self.mock_cart_repo.get_item.assert_not_awaited()
+
+    async def test_get_summary_reads_cached_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        await self.test_object.get_cart(cart.cart_id)
+
+        assert await self.test_object.get_summary(cart.cart_id) == cart.summary()
+        self.mock_cart_repo.get_summary.assert_not_awaited()
+
+    async def test_delete_item_invalidates_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        await self.test_object.get_cart(cart.cart_id)
+        self.mock_cart_repo.delete_item.return_value = True
+
+        assert await self.test_object.delete_item(cart.cart_id, cart.items[0].item_id)
+        assert self.cart_cache.stats()["size"] == 0
+
+    async def test_unlink_carts_clears_cache(self):
+        self.mock_cart_repo.get_cart.return_value = stubbed_cart()
+        await self.test_object.get_cart(uuid.uuid4())
+
+        self.mock_cart_repo.unlink_carts.return_value = (0, 1)
+
+        assert await self.test_object.unlink_carts() == (0, 1)
+
+        assert self.cart_cache.stats()["size"] == 0
@@ -0,0 +1,28 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.repositories.async_cart_event_repository import AsyncCartEventRepository
+from app.schemas.models import CartEvent, CartEventPage
+
+
+@pytest.mark.anyio
+class TestAsyncCartEventRepository:
+
+    def setup_method(self):
+        self.mock_redis_client = AsyncMock()
+        self.test_object = AsyncCartEventRepository(self.mock_redis_client, key="events")
+
+    async def test_read_events_returns_events_after_offset(self):
+        self.mock_redis_client.xread.return_value = [["events", [("5-0", {"type": "clear", "count": "2"})]]]
+
+        actual = await self.test_object.read_events(after="4-0", count=10)
+
+        assert actual == CartEventPage(events=[CartEvent(event_id="5-0", type="clear", count=2)], last_event_id="5-0")
+        self.mock_redis_client.xread.assert_awaited_once_with({"events": "4-0"}, count=10, block=None)
+
+    async def test_read_events_starts_from_first_event_when_stream_is_empty(self):
+        self.mock_redis_client.xrevrange.return_value = []
+        self.mock_redis_client.xread.return_value = []
+
+        assert await self.test_object.read_events(after="$") == CartEventPage(events=[], last_event_id="0-0")
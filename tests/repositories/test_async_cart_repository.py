@@ -0,0 +1,188 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock, Mock
+
+import pytest
+
+from app.repositories import cart_scripts
+from app.repositories.async_cart_repository import AsyncCartRepository
+from app.schemas.models import (
+    CartAgeBucket,
+    CartAgeReport,
+    CartBulkResult,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    RemoveQuantityOperation
+)
+from tests.utils import stubbed_cart, stubbed_item, random_int
+
+
+@pytest.mark.anyio
+class TestAsyncCartRepository:
+
+    def setup_method(self):
+        self.mock_redis_client = AsyncMock()
+        self.scripts = {}
+        self.mock_redis_client.register_script = Mock(
+            side_effect=lambda source: self.scripts.setdefault(
+                source.removeprefix(cart_scripts.JSON_CODEC),
+                AsyncMock()
+            )
+        )
+        self.test_object = AsyncCartRepository(self.mock_redis_client)
+
+    async def test_get_carts_returns_page_of_carts(self):
+        carts = [stubbed_cart(), stubbed_cart()]
+        self.mock_redis_client.scan.return_value = (13, [str(cart.cart_id) for cart in carts])
+        self.mock_redis_client.mget.return_value = [cart.model_dump_json() for cart in carts]
+
+        actual = await self.test_object.get_carts(limit=2)
+
+        assert actual == CartPage(carts=carts, next_cursor=13)
+        self.mock_redis_client.scan.assert_awaited_once_with(cursor=0, count=2, match="[^{]*")
+
+    async def test_get_carts_returns_empty_page(self):
+        self.mock_redis_client.scan.return_value = (0, [])
+
+        assert await self.test_object.get_carts() == CartPage(carts=[], next_cursor=None)
+        self.mock_redis_client.mget.assert_not_awaited()
+
+    async def test_get_many_reports_missing_ids(self):
+        cart = stubbed_cart()
+        missing_cart_id = uuid.uuid4()
+        self.mock_redis_client.mget.return_value = [None, cart.model_dump_json()]
+
+        actual = await self.test_object.get_many([missing_cart_id, cart.cart_id])
+
+        assert actual == CartBulkResult(carts=[cart], missing_cart_ids=[missing_cart_id])
+
+    async def test_get_cart_returns_cart(self):
+        cart = stubbed_cart()
+        self.mock_redis_client.get.return_value = cart.model_dump_json()
+        assert await self.test_object.get_cart(cart.cart_id) == cart
+
+    async def test_get_cart_returns_none(self):
+        self.mock_redis_client.get.return_value = None
+        assert await self.test_object.get_cart(uuid.uuid4()) is None
+
+    async def test_get_item_returns_item(self):
+        cart = stubbed_cart()
+        self.mock_redis_client.get.return_value = cart.model_dump_json()
+        assert await self.test_object.get_item(cart.cart_id, cart.items[0].item_id) == cart.items[0]
+
+    async def test_save_cart_runs_save_cart_script(self):
+        cart = stubbed_cart()
+        self.scripts[cart_scripts.SAVE_CART].return_value = 2
+
+        assert await self.test_object.save_cart(cart, expected_version=1) == 2
+        self.scripts[cart_scripts.SAVE_CART].assert_awaited_once_with(
+            keys=[str(cart.cart_id), f"{{{cart.cart_id}}}:summary"],
+            args=[cart.model_dump_json(), 1, "*", 0]
+        )
+
+    async def test_get_cart_renews_ttl_when_sliding(self):
+        cart = stubbed_cart()
+        self.mock_redis_client.pipeline = MagicMock()
+        mock_pipeline = self.mock_redis_client.pipeline.return_value.__aenter__.return_value
+        mock_pipeline.getex = Mock()
+        mock_pipeline.expire = Mock()
+        mock_pipeline.execute.return_value = [cart.model_dump_json(), 1]
+
+        actual = await AsyncCartRepository(self.mock_redis_client, ttl=60, sliding_ttl=True).get_cart(cart.cart_id)
+
+        assert actual == cart
+        mock_pipeline.getex.assert_called_once_with(str(cart.cart_id), ex=60)
+        mock_pipeline.expire.assert_called_once_with(f"{{{cart.cart_id}}}:summary", 60)
+
+    async def test_get_summary_reads_the_summary_kept_beside_the_cart(self):
+        cart_id = uuid.uuid4()
+        self.mock_redis_client.pipeline = MagicMock()
+        mock_pipeline = self.mock_redis_client.pipeline.return_value.__aenter__.return_value
+        mock_pipeline.hmget = Mock()
+        mock_pipeline.exists = Mock()
+        mock_pipeline.execute.return_value = [["3", "2", "7", "5f3a"], 1]
+
+        actual = await self.test_object.get_summary(cart_id)
+
+        assert actual == CartSummary(cart_id=cart_id, version=3, epoch="5f3a", line_count=2, total_quantity=7)
+        mock_pipeline.hmget.assert_called_once_with(f"{{{cart_id}}}:summary", ["version", "lines", "quantity", "epoch"])
+        mock_pipeline.exists.assert_called_once_with(str(cart_id))
+
+    async def test_sample_ages_reads_ttls_in_pipeline(self):
+        self.mock_redis_client.scan.return_value = (0, ["a", "b"])
+        self.mock_redis_client.pipeline = MagicMock()
+        mock_pipeline = self.mock_redis_client.pipeline.return_value.__aenter__.return_value
+        mock_pipeline.ttl = Mock()
+        mock_pipeline.execute.return_value = [30, -1]
+
+        cursor, actual = await AsyncCartRepository(self.mock_redis_client, ttl=60).sample_ages(bounds=[60])
+
+        assert cursor == 0
+        assert actual == CartAgeReport(
+            buckets=[CartAgeBucket(max_age=60, count=1), CartAgeBucket(max_age=None, count=0)],
+            without_expiry=1
+        )
+
+    async def test_add_item_runs_add_item_script(self):
+        cart_id = uuid.uuid4()
+        item = stubbed_item()
+        self.scripts[cart_scripts.ADD_ITEM].return_value = [str(item.item_id), item.quantity]
+
+        actual = await self.test_object.add_item(cart_id=cart_id, item_name=item.item_name, quantity=item.quantity)
+
+        assert actual == item
+        assert self.scripts[cart_scripts.ADD_ITEM].call_args.kwargs["keys"] == [str(cart_id), f"{{{cart_id}}}:summary"]
+
+    async def test_remove_quantity_runs_remove_quantity_script(self):
+        cart_id = uuid.uuid4()
+        item_id = uuid.uuid4()
+        quantity = random_int(low=1)
+        self.scripts[cart_scripts.REMOVE_QUANTITY].return_value = quantity
+
+        assert await self.test_object.remove_quantity(cart_id=cart_id, item_id=item_id, quantity=quantity) == quantity
+        self.scripts[cart_scripts.REMOVE_QUANTITY].assert_awaited_once_with(
+            keys=[str(cart_id), f"{{{cart_id}}}:summary"],
+            args=[str(item_id), quantity, 0]
+        )
+
+    async def test_delete_item_returns_true_when_script_deletes_item(self):
+        self.scripts[cart_scripts.DELETE_ITEM].return_value = 1
+        assert await self.test_object.delete_item(cart_id=uuid.uuid4(), item_id=uuid.uuid4()) is True
+
+    async def test_apply_operations_runs_script_once_for_all_operations(self):
+        cart_id = uuid.uuid4()
+        self.scripts[cart_scripts.APPLY_OPERATIONS].return_value = [["remove", 1]]
+
+        actual = await self.test_object.apply_operations(
+            cart_id=cart_id,
+            operations=[RemoveQuantityOperation(op="remove", item_id=uuid.uuid4(), quantity=1)]
+        )
+
+        assert actual == [CartOperationResult(op="remove", removed=1)]
+        self.scripts[cart_scripts.APPLY_OPERATIONS].assert_awaited_once()
+
+    async def test_delete_cart_returns_false_when_key_is_missing(self):
+        self.scripts[cart_scripts.DELETE_CART].return_value = 0
+        assert await self.test_object.delete_cart(uuid.uuid4()) is False
+
+    async def test_delete_cart_appends_to_events_stream_when_enabled(self):
+        cart_id = uuid.uuid4()
+        self.scripts[cart_scripts.DELETE_CART].return_value = 1
+
+        assert await AsyncCartRepository(self.mock_redis_client, events_key="cart-events").delete_cart(cart_id) is True
+        self.scripts[cart_scripts.DELETE_CART].assert_awaited_once_with(
+            keys=[str(cart_id), f"{{{cart_id}}}:summary", "cart-events"],
+            args=[str(cart_id)]
+        )
+
+    async def test_unlink_carts_unlinks_one_batch_of_prefixed_keys(self):
+        test_object = AsyncCartRepository(self.mock_redis_client, key_prefix="cart:")
+        self.mock_redis_client.scan.return_value = (0, ["cart:a"])
+        self.mock_redis_client.unlink.return_value = 1
+
+        assert await test_object.unlink_carts() == (0, 1)
+        self.mock_redis_client.scan.assert_awaited_once_with(cursor=0, count=1000, match="cart:*")
+        assert [call.args for call in self.mock_redis_client.unlink.await_args_list] == [
+            ("cart:a",),
+            ("{cart:a}:summary",)
+        ]
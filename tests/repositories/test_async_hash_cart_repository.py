@@ -0,0 +1,74 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock, Mock
+
+import pytest
+
+from app.repositories import hash_cart_scripts
+from app.repositories.async_hash_cart_repository import AsyncHashCartRepository
+from app.repositories.hash_cart_repository import cart_to_hash
+from app.schemas.models import CartPage
+from tests.utils import stubbed_cart, stubbed_item, random_int
+
+
+@pytest.mark.anyio
+class TestAsyncHashCartRepository:
+
+    def setup_method(self):
+        self.mock_redis_client = AsyncMock()
+        self.scripts = {}
+        self.mock_redis_client.register_script = Mock(
+            side_effect=lambda source: self.scripts.setdefault(source, AsyncMock())
+        )
+        self.mock_redis_client.pipeline = MagicMock()
+        self.mock_pipeline = self.mock_redis_client.pipeline.return_value.__aenter__.return_value
+        self.mock_pipeline.hgetall = Mock()
+        self.test_object = AsyncHashCartRepository(self.mock_redis_client)
+
+    async def test_get_carts_reads_hashes_in_one_pipeline(self):
+        carts = [stubbed_cart(), stubbed_cart()]
+        self.mock_redis_client.scan.return_value = (0, [str(cart.cart_id) for cart in carts])
+        self.mock_pipeline.execute.return_value = [cart_to_hash(cart) for cart in carts]
+
+        assert await self.test_object.get_carts() == CartPage(carts=carts, next_cursor=None)
+        self.mock_redis_client.pipeline.assert_called_once_with(transaction=False)
+        assert self.mock_pipeline.hgetall.call_count == 2
+
+    async def test_get_cart_returns_cart(self):
+        cart = stubbed_cart()
+        self.mock_redis_client.hgetall.return_value = cart_to_hash(cart)
+        assert await self.test_object.get_cart(cart.cart_id) == cart
+
+    async def test_get_item_reads_only_item_fields(self):
+        item = stubbed_item()
+        self.mock_redis_client.hmget.return_value = [item.item_name, str(item.quantity)]
+
+        assert await self.test_object.get_item(uuid.uuid4(), item.item_id) == item
+        self.mock_redis_client.hgetall.assert_not_awaited()
+
+    async def test_get_item_returns_none_when_item_does_not_exist(self):
+        self.mock_redis_client.hmget.return_value = [None, None]
+        assert await self.test_object.get_item(uuid.uuid4(), uuid.uuid4()) is None
+
+    async def test_save_cart_replaces_hash_in_one_script(self):
+        cart = stubbed_cart()
+        await self.test_object.save_cart(cart)
+
+        args = self.scripts[hash_cart_scripts.SAVE_CART].call_args.kwargs["args"]
+        assert dict(zip(args[:-3:2], args[1:-3:2])) == cart_to_hash(cart)
+        assert args[-3:] == [-1, "*", 0]
+
+    async def test_add_item_runs_hash_add_item_script(self):
+        item = stubbed_item()
+        self.scripts[hash_cart_scripts.ADD_ITEM].return_value = [str(item.item_id), item.quantity]
+
+        actual = await self.test_object.add_item(cart_id=uuid.uuid4(), item_name=item.item_name, quantity=random_int())
+
+        assert actual == item
+
+    async def test_remove_quantity_runs_hash_remove_quantity_script(self):
+        quantity = random_int(low=1)
+        self.scripts[hash_cart_scripts.REMOVE_QUANTITY].return_value = quantity
+
+        actual = await self.test_object.remove_quantity(cart_id=uuid.uuid4(), item_id=uuid.uuid4(), quantity=quantity)
+
+        assert actual == quantity
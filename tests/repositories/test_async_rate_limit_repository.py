@@ -0,0 +1,28 @@
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.repositories import rate_limit_scripts
+from app.repositories.async_rate_limit_repository import AsyncRateLimitRepository
+
+
+@pytest.mark.anyio
+class TestAsyncRateLimitRepository:
+
+    def setup_method(self):
+        self.mock_redis_client = AsyncMock()
+        self.mock_take_token = AsyncMock()
+        self.mock_redis_client.register_script = Mock(return_value=self.mock_take_token)
+        self.test_object = AsyncRateLimitRepository(self.mock_redis_client, rate=5, burst=10, key_prefix="rate:")
+
+    async def test_take_token_runs_script_for_client_bucket(self):
+        self.mock_take_token.return_value = 0
+
+        assert await self.test_object.take_token("ip:10.0.0.1") == 0
+        self.mock_redis_client.register_script.assert_called_once_with(rate_limit_scripts.TAKE_TOKEN)
+        self.mock_take_token.assert_awaited_once_with(keys=["rate:ip:10.0.0.1"], args=[5, 10])
+
+    async def test_take_token_returns_seconds_until_next_token(self):
+        self.mock_take_token.return_value = 1500
+
+        assert await self.test_object.take_token("ip:10.0.0.1") == 1.5
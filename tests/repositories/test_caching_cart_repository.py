@@ -0,0 +1,163 @@
+import uuid
+from unittest.mock import Mock
+
+import pytest
+
+from app.repositories.cart_cache import CartCache
+from app.repositories.caching_cart_repository import CachingCartRepository
+from app.schemas.models import CartBulkResult
+from tests.utils import stubbed_cart, stubbed_item, random_int
+
+
+class TestCachingCartRepository:
+
+    def setup_method(self):
+        self.mock_cart_repo = Mock()
+        self.cart_cache = CartCache()
+        self.cart_cache.active = True
+        self.test_object = CachingCartRepository(self.mock_cart_repo, self.cart_cache)
+
+    def test_get_cart_reads_through_cache(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+
+        assert self.test_object.get_cart(cart.cart_id) == cart
+        assert self.test_object.get_cart(cart.cart_id) == cart
+        self.mock_cart_repo.get_cart.assert_called_once_with(cart.cart_id)
+
+    def test_get_cart_does_not_cache_missing_cart(self):
+        self.mock_cart_repo.get_cart.return_value = None
+        cart_id = uuid.uuid4()
+
+        assert self.test_object.get_cart(cart_id) is None
+        assert self.test_object.get_cart(cart_id) is None
+        assert self.mock_cart_repo.get_cart.call_count == 2
+
+    def test_cache_keys_match_prefixed_redis_keys(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        test_object = CachingCartRepository(self.mock_cart_repo, self.cart_cache, key_prefix="cart:")
+        test_object.get_cart(cart.cart_id)
+
+        self.cart_cache.invalidate(f"cart:{cart.cart_id}")
+
+        test_object.get_cart(cart.cart_id)
+        assert self.mock_cart_repo.get_cart.call_count == 2
+
+    def test_get_many_only_reads_uncached_carts(self):
+        cached_cart = stubbed_cart()
+        cart = stubbed_cart()
+        missing_cart_id = uuid.uuid4()
+        self.mock_cart_repo.get_cart.return_value = cached_cart
+        self.test_object.get_cart(cached_cart.cart_id)
+        self.mock_cart_repo.get_many.return_value = CartBulkResult(carts=[cart], missing_cart_ids=[missing_cart_id])
+
+        actual = self.test_object.get_many([cached_cart.cart_id, cart.cart_id, missing_cart_id])
+
+        assert actual == CartBulkResult(carts=[cart, cached_cart], missing_cart_ids=[missing_cart_id])
+        self.mock_cart_repo.get_many.assert_called_once_with([cart.cart_id, missing_cart_id])
+        assert self.test_object.get_cart(cart.cart_id) == cart
+        assert self.mock_cart_repo.get_cart.call_count == 1
+
+    def test_get_many_ends_loads_of_missing_carts(self):
+        missing_cart_ids = [uuid.uuid4() for _ in range(3)]
+        self.mock_cart_repo.get_many.return_value = CartBulkResult(carts=[], missing_cart_ids=missing_cart_ids)
+
+        self.test_object.get_many(missing_cart_ids)
+
+        assert self.cart_cache._loads == {}
+
+    def test_failed_reads_end_their_loads(self):
+        self.mock_cart_repo.get_cart.side_effect = ConnectionError("down")
+        self.mock_cart_repo.get_many.side_effect = ConnectionError("down")
+
+        with pytest.raises(ConnectionError):
+            self.test_object.get_cart(uuid.uuid4())
+        with pytest.raises(ConnectionError):
+            self.test_object.get_many([uuid.uuid4(), uuid.uuid4()])
+
+        assert self.cart_cache._loads == {}
+
+    def test_get_item_reads_cached_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        self.test_object.get_cart(cart.cart_id)
+
+        assert self.test_object.get_item(cart.cart_id, cart.items[0].item_id) == cart.items[0]
+        self.mock_cart_repo.get_item.assert_not_called()
+
+    def test_get_item_falls_back_to_repo(self):
+        item = stubbed_item()
+        cart_id = uuid.uuid4()
+        self.mock_cart_repo.get_item.return_value = item
+
+        assert self.test_object.get_item(cart_id, item.item_id) == item
+        self.mock_cart_repo.get_item.assert_called_once_with(cart_id=cart_id, item_id=item.item_id)
+
+    def test_get_summary_reads_cached_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        self.test_object.get_cart(cart.cart_id)
+
+        assert self.test_object.get_summary(cart.cart_id) == cart.summary()
+        self.mock_cart_repo.get_summary.assert_not_called()
+
+    def test_get_summary_falls_back_to_repo(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_summary.return_value = cart.summary()
+
+        assert self.test_object.get_summary(cart.cart_id) == cart.summary()
+        self.mock_cart_repo.get_summary.assert_called_once_with(cart.cart_id)
+
+    def test_add_item_invalidates_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        self.test_object.get_cart(cart.cart_id)
+        self.mock_cart_repo.add_item.return_value = cart.items[0]
+
+        assert self.test_object.add_item(cart.cart_id, cart.items[0].item_name, random_int()) == cart.items[0]
+        self.test_object.get_cart(cart.cart_id)
+        assert self.mock_cart_repo.get_cart.call_count == 2
+
+    def test_remove_quantity_invalidates_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        self.test_object.get_cart(cart.cart_id)
+        self.mock_cart_repo.remove_quantity.return_value = 1
+
+        assert self.test_object.remove_quantity(cart.cart_id, cart.items[0].item_id, 1) == 1
+        assert self.cart_cache.stats()["invalidations"] == 1
+
+    def test_apply_operations_invalidates_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        self.test_object.get_cart(cart.cart_id)
+        self.mock_cart_repo.apply_operations.return_value = []
+
+        assert self.test_object.apply_operations(cart.cart_id, []) == []
+        assert self.cart_cache.stats()["size"] == 0
+
+    def test_delete_cart_invalidates_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        self.test_object.get_cart(cart.cart_id)
+        self.mock_cart_repo.delete_cart.return_value = True
+
+        assert self.test_object.delete_cart(cart.cart_id)
+        assert self.cart_cache.stats()["size"] == 0
+
+    def test_unlink_carts_clears_cache(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+        self.test_object.get_cart(cart.cart_id)
+
+        self.mock_cart_repo.unlink_carts.return_value = (0, 1)
+
+        assert self.test_object.unlink_carts(cursor=3) == (0, 1)
+
+        self.mock_cart_repo.unlink_carts.assert_called_once_with(cursor=3, count=1000)
+        assert self.cart_cache.stats()["size"] == 0
+
+    def test_delegates_other_methods_to_repo(self):
+        self.mock_cart_repo.get_carts.return_value = "page"
+        assert self.test_object.get_carts(cursor=0, limit=1) == "page"
@@ -0,0 +1,151 @@
+from unittest.mock import Mock, patch
+
+from app.repositories.cart_cache import CartCache, CartInvalidationListener, INVALIDATION_CHANNEL
+from tests.utils import stubbed_cart
+
+
+def cached(cart_cache, cart):
+    key = str(cart.cart_id)
+    cart_cache.put(key, cart, cart_cache.begin_load(key))
+    return key
+
+
+class TestCartCache:
+
+    def setup_method(self):
+        self.test_object = CartCache(max_size=2, ttl=60.0)
+        self.test_object.active = True
+
+    def test_get_returns_cached_cart(self):
+        cart = stubbed_cart()
+        key = cached(self.test_object, cart)
+
+        assert self.test_object.get(key) is cart
+        assert self.test_object.stats()["hits"] == 1
+
+    def test_get_counts_miss(self):
+        assert self.test_object.get("missing") is None
+        assert self.test_object.stats()["misses"] == 1
+
+    def test_put_evicts_least_recently_used_cart(self):
+        carts = [stubbed_cart(), stubbed_cart(), stubbed_cart()]
+        keys = [cached(self.test_object, carts[0]), cached(self.test_object, carts[1])]
+        self.test_object.get(keys[0])
+        keys.append(cached(self.test_object, carts[2]))
+
+        assert self.test_object.get(keys[1]) is None
+        assert self.test_object.get(keys[0]) is carts[0]
+        assert self.test_object.stats()["evictions"] == 1
+
+    def test_get_expires_cart_after_ttl(self):
+        key = cached(self.test_object, stubbed_cart())
+
+        with patch("app.repositories.cart_cache.time.monotonic", return_value=10 ** 9):
+            assert self.test_object.get(key) is None
+
+        assert self.test_object.stats()["size"] == 0
+
+    def test_put_drops_cart_invalidated_while_loading(self):
+        cart = stubbed_cart()
+        key = str(cart.cart_id)
+        token = self.test_object.begin_load(key)
+        self.test_object.invalidate(key)
+        self.test_object.put(key, cart, token)
+
+        assert self.test_object.get(key) is None
+
+    def test_put_ignores_missing_carts_and_inactive_cache(self):
+        self.test_object.put("missing", None, self.test_object.begin_load("missing"))
+        self.test_object.active = False
+        cached(self.test_object, stubbed_cart())
+
+        assert self.test_object.stats()["size"] == 0
+
+    def test_invalidate_removes_cart(self):
+        key = cached(self.test_object, stubbed_cart())
+        self.test_object.invalidate(key)
+
+        assert self.test_object.get(key) is None
+        assert self.test_object.stats()["invalidations"] == 1
+
+    def test_clear_removes_all_carts(self):
+        cached(self.test_object, stubbed_cart())
+        cached(self.test_object, stubbed_cart())
+        self.test_object.clear()
+
+        assert self.test_object.stats()["size"] == 0
+        assert self.test_object.stats()["invalidations"] == 2
+
+
+class TestCartInvalidationListener:
+
+    def setup_method(self):
+        self.mock_redis_client = Mock()
+        self.mock_connection = self.mock_redis_client.connection_pool.get_connection.return_value
+        self.mock_connection.read_response.side_effect = [42, "OK"]
+        self.mock_pubsub = self.mock_redis_client.pubsub.return_value
+        self.cart_cache = CartCache()
+        self.test_object = CartInvalidationListener(self.mock_redis_client, self.cart_cache, prefixes=["cart:"])
+
+    def test_start_enables_broadcast_tracking_redirected_to_subscriber(self):
+        self.test_object.start()
+
+        self.mock_connection.send_command.assert_any_call("CLIENT", "ID")
+        self.mock_connection.send_command.assert_any_call(
+            "CLIENT", "TRACKING", "ON", "REDIRECT", 42, "BCAST", "PREFIX", "cart:"
+        )
+        assert self.mock_pubsub.connection is self.mock_connection
+        assert INVALIDATION_CHANNEL in self.mock_pubsub.subscribe.call_args.kwargs
+        self.mock_pubsub.run_in_thread.assert_called_once()
+        assert self.cart_cache.active
+
+    def test_invalidation_message_removes_keys(self):
+        self.test_object.start()
+        self.cart_cache.active = True
+        key = cached(self.cart_cache, stubbed_cart())
+        handler = self.mock_pubsub.subscribe.call_args.kwargs[INVALIDATION_CHANNEL]
+
+        handler({"data": [key]})
+
+        assert self.cart_cache.get(key) is None
+
+    def test_invalidation_message_decodes_binary_keys(self):
+        self.test_object.start()
+        self.cart_cache.active = True
+        key = cached(self.cart_cache, stubbed_cart())
+        handler = self.mock_pubsub.subscribe.call_args.kwargs[INVALIDATION_CHANNEL]
+
+        handler({"data": [key.encode()]})
+
+        assert self.cart_cache.get(key) is None
+
+    def test_flush_message_clears_cache(self):
+        self.test_object.start()
+        cached(self.cart_cache, stubbed_cart())
+        handler = self.mock_pubsub.subscribe.call_args.kwargs[INVALIDATION_CHANNEL]
+
+        handler({"data": None})
+
+        assert self.cart_cache.stats()["size"] == 0
+
+    def test_reconnect_clears_cache_and_tracks_again(self):
+        self.test_object.start()
+        cached(self.cart_cache, stubbed_cart())
+        self.mock_connection.read_response.side_effect = [43, "OK"]
+        on_connect = self.mock_connection.register_connect_callback.call_args.args[0]
+
+        on_connect(self.mock_connection)
+
+        assert self.cart_cache.stats()["size"] == 0
+        self.mock_connection.send_command.assert_called_with(
+            "CLIENT", "TRACKING", "ON", "REDIRECT", 43, "BCAST", "PREFIX", "cart:"
+        )
+        self.mock_pubsub.on_connect.assert_called_once_with(self.mock_connection)
+
+    def test_stop_deactivates_cache(self):
+        self.test_object.start()
+        self.test_object.stop()
+
+        assert not self.cart_cache.active
+        self.mock_pubsub.run_in_thread.return_value.stop.assert_called_once()
+        self.mock_pubsub.close.assert_called_once()
@@ -0,0 +1,58 @@
+import uuid
+from unittest.mock import Mock, patch
+
+from app.repositories.cart_event_repository import CartEventRepository, block_millis
+from app.schemas.models import CartEvent, CartEventPage
+
+
+class TestCartEventRepository:
+
+    def setup_method(self):
+        self.mock_redis_client = Mock()
+        self.test_object = CartEventRepository(self.mock_redis_client, key="events")
+
+    def test_read_events_returns_events_after_offset(self):
+        cart_id = uuid.uuid4()
+        self.mock_redis_client.xread.return_value = [
+            ["events", [("5-0", {"type": "delete_cart", "cart_id": str(cart_id)})]]
+        ]
+
+        actual = self.test_object.read_events(after="4-0", count=10)
+
+        assert actual == CartEventPage(
+            events=[CartEvent(event_id="5-0", type="delete_cart", cart_id=cart_id)],
+            last_event_id="5-0"
+        )
+        self.mock_redis_client.xread.assert_called_once_with({"events": "4-0"}, count=10, block=None)
+
+    def test_read_events_decodes_byte_entries(self):
+        self.mock_redis_client.xread.return_value = [
+            [b"events", [(b"5-0", {b"type": b"clear", b"count": b"3"})]]
+        ]
+
+        actual = self.test_object.read_events()
+
+        assert actual.events == [CartEvent(event_id="5-0", type="clear", count=3)]
+
+    def test_read_events_keeps_offset_when_wait_ends_empty(self):
+        self.mock_redis_client.xread.return_value = []
+
+        with patch("app.repositories.cart_event_repository.block_millis", side_effect=[1000, 500, None]):
+            actual = self.test_object.read_events(after="4-0", wait=2)
+
+        assert actual == CartEventPage(events=[], last_event_id="4-0")
+        assert [call.kwargs["block"] for call in self.mock_redis_client.xread.call_args_list] == [1000, 500, None]
+
+    def test_block_millis_waits_in_slices_until_deadline(self):
+        with patch("app.repositories.cart_event_repository.time") as mock_time:
+            mock_time.monotonic.return_value = 10.0
+            assert block_millis(12.5) == 1000
+            assert block_millis(10.25) == 250
+            assert block_millis(10.0) is None
+
+    def test_read_events_resolves_latest_offset_before_reading(self):
+        self.mock_redis_client.xrevrange.return_value = [("9-0", {"type": "clear", "count": "1"})]
+        self.mock_redis_client.xread.return_value = []
+
+        assert self.test_object.read_events(after="$").last_event_id == "9-0"
+        self.mock_redis_client.xread.assert_called_once_with({"events": "9-0"}, count=100, block=None)
@@ -1,30 +1,137 @@
+import json
 import uuid
 from unittest.mock import Mock
 
+import msgpack
+from redis.cluster import RedisCluster
+
+from app.repositories import cart_scripts
+from app.repositories.cart_codecs import MsgpackCartCodec
 from app.repositories.cart_repository import CartRepository
-from tests.utils import stubbed_cart
+from app.schemas.cart_lines import lines_from_cart
+from app.schemas.models import (
+    AddItemOperation,
+    CartAgeBucket,
+    CartAgeReport,
+    CartBulkResult,
+    CartOperationResult,
+    CartPage,
+    CartSummary,
+    DeleteItemOperation,
+    RemoveQuantityOperation
+)
+from tests.utils import stubbed_cart, stubbed_item, random_int
 
 
 class TestCartRepository:
 
     def setup_method(self):
         self.mock_redis_client = Mock()
+        self.scripts = {}
+        self.mock_redis_client.register_script.side_effect = lambda source: self.scripts.setdefault(
+            source.removeprefix(cart_scripts.JSON_CODEC),
+            Mock()
+        )
         self.test_object = CartRepository(self.mock_redis_client)
 
-    def test_get_carts_returns_carts(self):
-        keys = [uuid.uuid4(), uuid.uuid4()]
-        self.mock_redis_client.keys.return_value = keys
-        carts = [stubbed_cart(cart_id=keys[0]), stubbed_cart(cart_id=keys[1])]
-        self.mock_redis_client.get.side_effect = lambda key: next(
-            (cart.model_dump_json() for cart in carts if str(cart.cart_id) == key),
-            None
+    def test_get_carts_returns_page_of_carts(self):
+        carts = [stubbed_cart(), stubbed_cart()]
+        self.mock_redis_client.scan.return_value = (0, [str(cart.cart_id) for cart in carts])
+        self.mock_redis_client.mget.return_value = [cart.model_dump_json() for cart in carts]
+
+        actual = self.test_object.get_carts(limit=2)
+
+        assert actual == CartPage(carts=carts, next_cursor=None)
+        self.mock_redis_client.scan.assert_called_once_with(cursor=0, count=2, match="[^{]*")
+        self.mock_redis_client.mget.assert_called_once_with([str(cart.cart_id) for cart in carts])
+
+    def test_get_carts_returns_next_cursor_when_scan_is_not_finished(self):
+        cart = stubbed_cart()
+        self.mock_redis_client.scan.return_value = (42, [str(cart.cart_id)])
+        self.mock_redis_client.mget.return_value = [cart.model_dump_json()]
+
+        actual = self.test_object.get_carts(cursor=7, limit=1)
+
+        assert actual == CartPage(carts=[cart], next_cursor=42)
+        self.mock_redis_client.scan.assert_called_once_with(cursor=7, count=1, match="[^{]*")
+
+    def test_get_carts_scans_until_limit_is_reached(self):
+        carts = [stubbed_cart(), stubbed_cart()]
+        self.mock_redis_client.scan.side_effect = [
+            (5, []),
+            (9, [str(carts[0].cart_id)]),
+            (0, [str(carts[1].cart_id)])
+        ]
+        self.mock_redis_client.mget.return_value = [cart.model_dump_json() for cart in carts]
+
+        actual = self.test_object.get_carts(limit=2)
+
+        assert actual == CartPage(carts=carts, next_cursor=None)
+        assert [call.kwargs["count"] for call in self.mock_redis_client.scan.call_args_list] == [2, 2, 1]
+
+    def test_get_carts_skips_keys_deleted_during_scan(self):
+        cart = stubbed_cart()
+        self.mock_redis_client.scan.return_value = (0, [str(cart.cart_id), str(uuid.uuid4())])
+        self.mock_redis_client.mget.return_value = [cart.model_dump_json(), None]
+
+        assert self.test_object.get_carts().carts == [cart]
+
+    def test_get_carts_returns_empty_page(self):
+        self.mock_redis_client.scan.return_value = (0, [])
+
+        assert self.test_object.get_carts() == CartPage(carts=[], next_cursor=None)
+        self.mock_redis_client.mget.assert_not_called()
+
+    def test_get_carts_walks_cluster_primaries_with_one_cursor(self):
+        mock_cluster_client = Mock(spec=RedisCluster)
+        nodes = [Mock(), Mock()]
+        nodes[0].name, nodes[1].name = "b:7001", "a:7000"
+        mock_cluster_client.get_primaries.return_value = nodes
+        carts = [stubbed_cart(), stubbed_cart()]
+        mock_cluster_client.scan.side_effect = [
+            ({"a:7000": 0}, [str(carts[0].cart_id)]),
+            ({"b:7001": 6}, [str(carts[1].cart_id)])
+        ]
+        mock_cluster_client.mget_nonatomic.return_value = [cart.model_dump_json() for cart in carts]
+
+        actual = CartRepository(mock_cluster_client).get_carts(limit=2)
+
+        assert actual == CartPage(carts=carts, next_cursor=6 * 2 + 1)
+        mock_cluster_client.scan.assert_any_call(cursor=0, count=2, match="[^{]*", target_nodes=nodes[1])
+        mock_cluster_client.scan.assert_any_call(cursor=0, count=1, match="[^{]*", target_nodes=nodes[0])
+
+    def test_get_carts_resumes_cluster_scan_from_cursor(self):
+        mock_cluster_client = Mock(spec=RedisCluster)
+        nodes = [Mock(), Mock()]
+        nodes[0].name, nodes[1].name = "a:7000", "b:7001"
+        mock_cluster_client.get_primaries.return_value = nodes
+        mock_cluster_client.scan.return_value = ({"b:7001": 0}, [])
+
+        actual = CartRepository(mock_cluster_client).get_carts(cursor=6 * 2 + 1, limit=2)
+
+        assert actual == CartPage(carts=[], next_cursor=None)
+        mock_cluster_client.scan.assert_called_once_with(cursor=6, count=2, match="[^{]*", target_nodes=nodes[1])
+
+    def test_get_many_reads_carts_in_chunks_and_reports_missing_ids(self):
+        carts = [stubbed_cart(), stubbed_cart(), stubbed_cart()]
+        missing_cart_id = uuid.uuid4()
+        self.mock_redis_client.mget.side_effect = [
+            [carts[0].model_dump_json(), None],
+            [carts[1].model_dump_json(), carts[2].model_dump_json()]
+        ]
+
+        actual = self.test_object.get_many(
+            [carts[0].cart_id, missing_cart_id, carts[1].cart_id, carts[0].cart_id, carts[2].cart_id],
+            chunk_size=2
         )
 
-        assert self.test_object.get_carts() == carts
+        assert actual == CartBulkResult(carts=carts, missing_cart_ids=[missing_cart_id])
+        assert self.mock_redis_client.mget.call_count == 2
+        self.mock_redis_client.mget.assert_any_call([str(carts[0].cart_id), str(missing_cart_id)])
 
-    def test_get_carts_returns_empty_list(self):
-        self.mock_redis_client.keys.return_value = []
-        assert self.test_object.get_carts() == []
+    def test_get_many_returns_empty_result_without_ids(self):
+        assert self.test_object.get_many([]) == CartBulkResult(carts=[], missing_cart_ids=[])
+        self.mock_redis_client.mget.assert_not_called()
 
     def test_get_cart_returns_cart(self):
         cart = stubbed_cart()
@@ -35,25 +142,365 @@ class TestCartRepository:
         self.mock_redis_client.get.return_value = None
         assert self.test_object.get_cart(cart_id=uuid.uuid4()) is None
 
-    def test_save_cart_saves_cart(self):
+    def test_get_item_returns_item(self):
+        cart = stubbed_cart()
+        self.mock_redis_client.get.return_value = cart.model_dump_json()
+        assert self.test_object.get_item(cart.cart_id, cart.items[0].item_id) == cart.items[0]
+
+    def test_get_item_returns_none_when_item_does_not_exist(self):
+        cart = stubbed_cart()
+        self.mock_redis_client.get.return_value = cart.model_dump_json()
+        assert self.test_object.get_item(cart.cart_id, uuid.uuid4()) is None
+
+    def test_get_item_returns_none_when_cart_does_not_exist(self):
+        self.mock_redis_client.get.return_value = None
+        assert self.test_object.get_item(uuid.uuid4(), uuid.uuid4()) is None
+
+    def test_save_cart_runs_save_cart_script(self):
+        cart = stubbed_cart()
+        self.scripts[cart_scripts.SAVE_CART].return_value = 4
+
+        assert self.test_object.save_cart(cart) == 4
+        self.scripts[cart_scripts.SAVE_CART].assert_called_once_with(
+            keys=[str(cart.cart_id), f"{{{cart.cart_id}}}:summary"],
+            args=[cart.model_dump_json(), -1, "*", 0]
+        )
+
+    def test_save_cart_returns_none_when_version_does_not_match(self):
+        cart = stubbed_cart()
+        self.scripts[cart_scripts.SAVE_CART].return_value = None
+
+        assert self.test_object.save_cart(cart, expected_version=3) is None
+        assert self.scripts[cart_scripts.SAVE_CART].call_args.kwargs["args"][1] == 3
+
+    def test_msgpack_codec_saves_and_reads_packed_carts(self):
+        cart = stubbed_cart()
+        test_object = CartRepository(self.mock_redis_client, MsgpackCartCodec())
+        test_object.save_cart(cart)
+        packed = self.scripts[cart_scripts.MSGPACK_CODEC + cart_scripts.SAVE_CART].call_args.kwargs["args"][0]
+        self.mock_redis_client.get.return_value = packed
+
+        assert msgpack.unpackb(packed) == cart.model_dump(mode="json")
+        assert test_object.get_cart(cart.cart_id) == cart
+
+    def test_msgpack_codec_saves_and_reads_packed_cart_lines(self):
+        cart = stubbed_cart()
+        test_object = CartRepository(self.mock_redis_client, MsgpackCartCodec())
+        test_object.save_lines(lines_from_cart(cart))
+        packed = self.scripts[cart_scripts.MSGPACK_CODEC + cart_scripts.SAVE_CART].call_args.kwargs["args"][0]
+        self.mock_redis_client.get.return_value = packed
+
+        assert msgpack.unpackb(packed) == cart.model_dump(mode="json")
+        assert test_object.get_lines(cart.cart_id).to_cart() == cart
+
+    def test_msgpack_codec_registers_msgpack_scripts(self):
+        self.mock_redis_client.register_script.reset_mock()
+        self.mock_redis_client.register_script.side_effect = None
+        CartRepository(self.mock_redis_client, MsgpackCartCodec())
+
+        sources = [call.args[0] for call in self.mock_redis_client.register_script.call_args_list]
+        assert sources == [
+            cart_scripts.MSGPACK_CODEC + cart_scripts.SAVE_CART,
+            cart_scripts.MSGPACK_CODEC + cart_scripts.ADD_ITEM,
+            cart_scripts.MSGPACK_CODEC + cart_scripts.REMOVE_QUANTITY,
+            cart_scripts.MSGPACK_CODEC + cart_scripts.DELETE_ITEM,
+            cart_scripts.MSGPACK_CODEC + cart_scripts.APPLY_OPERATIONS,
+            cart_scripts.DELETE_CART
+        ]
+
+    def test_save_cart_sets_cart_ttl(self):
+        cart = stubbed_cart()
+        CartRepository(self.mock_redis_client, ttl=3600).save_cart(cart)
+        assert self.scripts[cart_scripts.SAVE_CART].call_args.kwargs["args"][-1] == 3600
+
+    def test_scripts_receive_cart_ttl_as_last_argument(self):
+        test_object = CartRepository(self.mock_redis_client, ttl=3600)
+        self.scripts[cart_scripts.DELETE_ITEM].return_value = 1
+
+        test_object.delete_item(cart_id=uuid.uuid4(), item_id=uuid.uuid4())
+
+        assert self.scripts[cart_scripts.DELETE_ITEM].call_args.kwargs["args"][-1] == 3600
+
+    def test_get_cart_renews_ttl_when_sliding(self):
+        cart = stubbed_cart()
+        mock_pipeline = self.mock_redis_client.pipeline.return_value
+        mock_pipeline.execute.return_value = [cart.model_dump_json(), 1]
+
+        actual = CartRepository(self.mock_redis_client, ttl=3600, sliding_ttl=True).get_cart(cart.cart_id)
+
+        assert actual == cart
+        mock_pipeline.getex.assert_called_once_with(str(cart.cart_id), ex=3600)
+        mock_pipeline.expire.assert_called_once_with(f"{{{cart.cart_id}}}:summary", 3600)
+        self.mock_redis_client.get.assert_not_called()
+
+    def test_sample_ages_buckets_one_batch_of_carts_by_idle_time(self):
+        self.mock_redis_client.scan.return_value = (42, ["a", "b", "c", "d", "e"])
+        self.mock_redis_client.pipeline.return_value.execute.return_value = [3590, 0, -1, -2, 5400]
+
+        test_object = CartRepository(self.mock_redis_client, ttl=3600)
+
+        cursor, actual = test_object.sample_ages(cursor=7, count=5, bounds=[3600, 60])
+
+        assert cursor == 42
+        self.mock_redis_client.scan.assert_called_once_with(cursor=7, count=5, match="[^{]*")
+        assert actual == CartAgeReport(
+            buckets=[
+                CartAgeBucket(max_age=60, count=2),
+                CartAgeBucket(max_age=3600, count=1),
+                CartAgeBucket(max_age=None, count=0)
+            ],
+            without_expiry=1
+        )
+        assert self.mock_redis_client.pipeline.return_value.ttl.call_count == 5
+
+    def test_registers_mutation_scripts(self):
+        assert set(self.scripts) == {
+            cart_scripts.SAVE_CART,
+            cart_scripts.ADD_ITEM,
+            cart_scripts.REMOVE_QUANTITY,
+            cart_scripts.DELETE_ITEM,
+            cart_scripts.APPLY_OPERATIONS,
+            cart_scripts.DELETE_CART
+        }
+
+    def test_get_summary_reads_the_summary_kept_beside_the_cart(self):
+        cart_id = uuid.uuid4()
+        mock_pipeline = self.mock_redis_client.pipeline.return_value
+        mock_pipeline.execute.return_value = [["3", "2", "7", "5f3a"], 1]
+
+        actual = self.test_object.get_summary(cart_id)
+
+        assert actual == CartSummary(cart_id=cart_id, version=3, epoch="5f3a", line_count=2, total_quantity=7)
+        mock_pipeline.hmget.assert_called_once_with(f"{{{cart_id}}}:summary", ["version", "lines", "quantity", "epoch"])
+        mock_pipeline.exists.assert_called_once_with(str(cart_id))
+        mock_pipeline.expire.assert_not_called()
+
+    def test_get_summary_returns_none_when_cart_does_not_exist(self):
+        self.mock_redis_client.pipeline.return_value.execute.return_value = [[None, None, None, None], 0]
+        assert self.test_object.get_summary(uuid.uuid4()) is None
+
+    def test_get_summary_sums_up_carts_stored_without_a_summary(self):
         cart = stubbed_cart()
-        self.test_object.save_cart(cart)
-        self.mock_redis_client.set.assert_called_once_with(
-            name=str(cart.cart_id),
-            value=cart.model_dump_json()
+        self.mock_redis_client.pipeline.return_value.execute.return_value = [[None, None, None, None], 1]
+        self.mock_redis_client.get.return_value = cart.model_dump_json()
+
+        assert self.test_object.get_summary(cart.cart_id) == cart.summary()
+
+    def test_get_summary_renews_ttl_of_cart_and_summary_when_sliding(self):
+        cart_id = uuid.uuid4()
+        mock_pipeline = self.mock_redis_client.pipeline.return_value
+        mock_pipeline.execute.return_value = [["1", "0", "0", ""], 1, 1]
+
+        CartRepository(self.mock_redis_client, ttl=60, sliding_ttl=True).get_summary(cart_id)
+
+        assert [call.args for call in mock_pipeline.expire.call_args_list] == [
+            (str(cart_id), 60),
+            (f"{{{cart_id}}}:summary", 60)
+        ]
+        mock_pipeline.exists.assert_not_called()
+
+    def test_scripts_append_to_events_stream_when_enabled(self):
+        cart_id = uuid.uuid4()
+        item_id = uuid.uuid4()
+        self.scripts[cart_scripts.REMOVE_QUANTITY].return_value = 1
+
+        CartRepository(self.mock_redis_client, events_key="cart-events").remove_quantity(cart_id, item_id, 1)
+
+        assert self.scripts[cart_scripts.REMOVE_QUANTITY].call_args.kwargs["keys"] == [
+            str(cart_id),
+            f"{{{cart_id}}}:summary",
+            "cart-events"
+        ]
+
+    def test_add_item_runs_add_item_script(self):
+        cart_id = uuid.uuid4()
+        item = stubbed_item()
+        self.scripts[cart_scripts.ADD_ITEM].return_value = [str(item.item_id), item.quantity]
+
+        actual = self.test_object.add_item(cart_id=cart_id, item_name=item.item_name, quantity=item.quantity)
+
+        assert actual == item
+        kwargs = self.scripts[cart_scripts.ADD_ITEM].call_args.kwargs
+        assert kwargs["keys"] == [str(cart_id), f"{{{cart_id}}}:summary"]
+        assert kwargs["args"][:3] == [str(cart_id), item.item_name, item.quantity]
+        assert uuid.UUID(kwargs["args"][3])
+        self.mock_redis_client.set.assert_not_called()
+
+    def test_remove_quantity_runs_remove_quantity_script(self):
+        cart_id = uuid.uuid4()
+        item_id = uuid.uuid4()
+        quantity = random_int(low=1)
+        self.scripts[cart_scripts.REMOVE_QUANTITY].return_value = quantity
+
+        actual = self.test_object.remove_quantity(cart_id=cart_id, item_id=item_id, quantity=quantity)
+
+        assert actual == quantity
+        self.scripts[cart_scripts.REMOVE_QUANTITY].assert_called_once_with(
+            keys=[str(cart_id), f"{{{cart_id}}}:summary"],
+            args=[str(item_id), quantity, 0]
+        )
+
+    def test_delete_item_returns_true_when_script_deletes_item(self):
+        cart_id = uuid.uuid4()
+        item_id = uuid.uuid4()
+        self.scripts[cart_scripts.DELETE_ITEM].return_value = 1
+
+        assert self.test_object.delete_item(cart_id=cart_id, item_id=item_id) is True
+        self.scripts[cart_scripts.DELETE_ITEM].assert_called_once_with(
+            keys=[str(cart_id), f"{{{cart_id}}}:summary"],
+            args=[str(item_id), 0]
+        )
+
+    def test_delete_item_returns_false_when_script_finds_no_item(self):
+        self.scripts[cart_scripts.DELETE_ITEM].return_value = 0
+        assert self.test_object.delete_item(cart_id=uuid.uuid4(), item_id=uuid.uuid4()) is False
+
+    def test_apply_operations_runs_script_once_for_all_operations(self):
+        cart_id = uuid.uuid4()
+        item = stubbed_item()
+        removed_item_id = uuid.uuid4()
+        operations = [
+            AddItemOperation(op="add", item_name=item.item_name, quantity=item.quantity),
+            RemoveQuantityOperation(op="remove", item_id=removed_item_id, quantity=2),
+            DeleteItemOperation(op="delete", item_id=removed_item_id)
+        ]
+        self.scripts[cart_scripts.APPLY_OPERATIONS].return_value = [
+            [b"add", str(item.item_id).encode(), item.item_name.encode(), item.quantity],
+            [b"remove", 2],
+            [b"delete", 0]
+        ]
+
+        actual = self.test_object.apply_operations(cart_id=cart_id, operations=operations)
+
+        assert actual == [
+            CartOperationResult(op="add", item=item),
+            CartOperationResult(op="remove", removed=2),
+            CartOperationResult(op="delete", deleted=False)
+        ]
+        kwargs = self.scripts[cart_scripts.APPLY_OPERATIONS].call_args.kwargs
+        assert kwargs["keys"] == [str(cart_id), f"{{{cart_id}}}:summary"]
+        assert kwargs["args"][0] == str(cart_id)
+        sent = json.loads(kwargs["args"][1])
+        assert sent[0]["item_name"] == item.item_name
+        assert uuid.UUID(sent[0]["item_id"])
+        assert sent[1] == {"op": "remove", "item_id": str(removed_item_id), "quantity": 2}
+        assert sent[2] == {"op": "delete", "item_id": str(removed_item_id)}
+        assert kwargs["args"][2:4] == [-1, "*"]
+        assert kwargs["args"][5] == 0
+
+    def test_apply_operations_returns_none_when_version_does_not_match(self):
+        self.scripts[cart_scripts.APPLY_OPERATIONS].return_value = None
+
+        actual = self.test_object.apply_operations(
+            cart_id=uuid.uuid4(),
+            operations=[DeleteItemOperation(op="delete", item_id=uuid.uuid4())],
+            expected_version=2
         )
 
+        assert actual is None
+        assert self.scripts[cart_scripts.APPLY_OPERATIONS].call_args.kwargs["args"][2] == 2
+
+    def test_apply_operations_skips_redis_when_there_are_no_operations(self):
+        assert self.test_object.apply_operations(cart_id=uuid.uuid4(), operations=[]) == []
+        self.scripts[cart_scripts.APPLY_OPERATIONS].assert_not_called()
+
     def test_delete_cart_returns_true_when_deleting_cart(self):
         key = uuid.uuid4()
-        self.mock_redis_client.exists.return_value = True
+        self.scripts[cart_scripts.DELETE_CART].return_value = 1
         assert self.test_object.delete_cart(key) is True
-        self.mock_redis_client.delete.assert_called_once_with(str(key))
+        self.scripts[cart_scripts.DELETE_CART].assert_called_once_with(
+            keys=[str(key), f"{{{key}}}:summary"],
+            args=[str(key)]
+        )
 
     def test_delete_cart_returns_false_when_key_is_missing(self):
-        self.mock_redis_client.exists.return_value = False
+        self.scripts[cart_scripts.DELETE_CART].return_value = 0
         assert self.test_object.delete_cart(uuid.uuid4()) is False
-        self.mock_redis_client.delete.assert_not_called()
 
-    def test_clear_carts_flushes_db(self):
-        self.test_object.clear_carts()
-        self.mock_redis_client.flushdb.assert_called_once()
+    def test_unlink_carts_unlinks_one_batch_of_prefixed_keys(self):
+        test_object = CartRepository(self.mock_redis_client, key_prefix="cart:")
+        self.mock_redis_client.scan.return_value = (42, ["cart:a", "cart:b"])
+        self.mock_redis_client.unlink.return_value = 2
+
+        assert test_object.unlink_carts(count=2) == (42, 2)
+        self.mock_redis_client.scan.assert_called_once_with(cursor=0, count=2, match="cart:*")
+        assert [call.args for call in self.mock_redis_client.unlink.call_args_list] == [
+            ("cart:a", "cart:b"),
+            ("{cart:a}:summary", "{cart:b}:summary")
+        ]
+        self.mock_redis_client.flushdb.assert_not_called()
+
+    def test_unlink_carts_appends_clear_event_in_same_transaction(self):
+        test_object = CartRepository(self.mock_redis_client, key_prefix="cart:", events_key="cart-events")
+        self.mock_redis_client.scan.return_value = (0, ["cart:a", "cart:b"])
+        mock_pipeline = self.mock_redis_client.pipeline.return_value
+        mock_pipeline.execute.return_value = [2, 2, "1-0"]
+
+        assert test_object.unlink_carts() == (0, 2)
+        self.mock_redis_client.pipeline.assert_called_once_with(transaction=True)
+        assert [call.args for call in mock_pipeline.unlink.call_args_list] == [
+            ("cart:a", "cart:b"),
+            ("{cart:a}:summary", "{cart:b}:summary")
+        ]
+        mock_pipeline.xadd.assert_called_once_with(
+            "cart-events",
+            {"type": "clear", "count": 2},
+            maxlen=cart_scripts.EVENTS_MAX_LEN,
+            approximate=True
+        )
+
+    def test_unlink_carts_skips_unlink_when_scan_finds_no_keys(self):
+        self.mock_redis_client.scan.return_value = (0, [])
+
+        assert self.test_object.unlink_carts(cursor=5) == (0, 0)
+        self.mock_redis_client.unlink.assert_not_called()
+
+    def test_key_prefix_is_applied_to_cart_keys(self):
+        cart = stubbed_cart()
+        test_object = CartRepository(self.mock_redis_client, key_prefix="cart:")
+        self.mock_redis_client.get.return_value = cart.model_dump_json()
+        self.scripts[cart_scripts.DELETE_ITEM].return_value = 1
+
+        assert test_object.get_cart(cart.cart_id) == cart
+        test_object.delete_item(cart.cart_id, cart.items[0].item_id)
+
+        self.mock_redis_client.get.assert_called_once_with(f"cart:{cart.cart_id}")
+        assert self.scripts[cart_scripts.DELETE_ITEM].call_args.kwargs["keys"] == [
+            f"cart:{cart.cart_id}",
+            f"{{cart:{cart.cart_id}}}:summary"
+        ]
+
+    def test_move_carts_migrates_the_carts_and_their_summaries_to_another_node(self):
+        cart_ids = [uuid.uuid4(), uuid.uuid4()]
+        test_object = CartRepository(self.mock_redis_client, key_prefix="cart:")
+        self.mock_redis_client.migrate.side_effect = ["OK", b"NOKEY"]
+
+        assert test_object.move_carts(cart_ids, "10.0.0.2", 6380, db=1, auth="secret") is True
+        assert test_object.move_carts(cart_ids[:1], "10.0.0.2", 6380) is False
+
+        self.mock_redis_client.migrate.assert_any_call(
+            "10.0.0.2",
+            6380,
+            [
+                f"cart:{cart_ids[0]}",
+                f"cart:{cart_ids[1]}",
+                f"{{cart:{cart_ids[0]}}}:summary",
+                f"{{cart:{cart_ids[1]}}}:summary"
+            ],
+            1,
+            5000,
+            auth="secret"
+        )
+
+    def test_warm_up_opens_connections_and_loads_every_script(self):
+        self.test_object.warm_up(3)
+
+        assert self.mock_redis_client.connection_pool.get_connection.call_count == 3
+        loaded = {call.args[0] for call in self.mock_redis_client.script_load.call_args_list}
+        assert loaded == {script.script for script in self.scripts.values()}
+        assert len(loaded) == 6
+
+    def test_ping_reports_redis_reachable(self):
+        self.mock_redis_client.ping.return_value = True
+
+        assert self.test_object.ping() is True
@@ -0,0 +1,279 @@
+import uuid
+
+import fakeredis
+import pytest
+
+from app.repositories.cart_codecs import MsgpackCartCodec
+from app.repositories.cart_event_repository import CartEventRepository
+from app.repositories.cart_repository import CartRepository
+from app.schemas.models import AddItemOperation, DeleteItemOperation, MAX_QUANTITY, RemoveQuantityOperation
+from tests.utils import stubbed_cart
+
+
+class TestCartScripts:
+
+    def setup_method(self):
+        self.redis_client = fakeredis.FakeRedis(decode_responses=True)
+        self.cart_id = uuid.uuid4()
+
+    def cart_key(self) -> str:
+        return next(key for key in self.redis_client.keys() if key.endswith(str(self.cart_id)))
+
+    def test_mutations_write_cart_without_expiry_when_no_ttl_is_set(self):
+        test_object = CartRepository(self.redis_client)
+
+        item = test_object.add_item(self.cart_id, "apple", 3)
+        test_object.add_item(self.cart_id, "pear", 1)
+        assert test_object.remove_quantity(self.cart_id, item.item_id, 1) == 1
+        assert test_object.delete_item(self.cart_id, item.item_id) is True
+        results = test_object.apply_operations(self.cart_id, [AddItemOperation(op="add", item_name="plum", quantity=2)])
+
+        assert [(item.item_name, item.quantity) for item in test_object.get_cart(self.cart_id).items] == [
+            ("pear", 1),
+            ("plum", 2)
+        ]
+        assert results[0].item.quantity == 2
+        assert self.redis_client.ttl(self.cart_key()) == -1
+
+    def test_mutations_renew_expiry_when_ttl_is_set(self):
+        test_object = CartRepository(self.redis_client, ttl=600)
+        item = test_object.add_item(self.cart_id, "apple", 3)
+        self.redis_client.expire(self.cart_key(), 10)
+
+        test_object.apply_operations(self.cart_id, [
+            RemoveQuantityOperation(op="remove", item_id=item.item_id, quantity=1),
+            DeleteItemOperation(op="delete", item_id=uuid.uuid4())
+        ])
+
+        assert test_object.get_cart(self.cart_id).items[0].quantity == 2
+        assert 590 < self.redis_client.ttl(self.cart_key()) <= 600
+
+    def test_add_item_merges_lines_by_name_and_emits_events(self):
+        test_object = CartRepository(self.redis_client, events_key="cart-events")
+
+        apple = test_object.add_item(self.cart_id, "apple", 2)
+        merged = test_object.add_item(self.cart_id, "apple", 3)
+        pear = test_object.add_item(self.cart_id, "pear", 1)
+
+        assert merged == apple.model_copy(update={"quantity": 5})
+        cart = test_object.get_cart(self.cart_id)
+        assert cart.items == [merged, pear]
+        assert cart.version == 3
+        events = [fields for _, fields in self.redis_client.xrange("cart-events")]
+        assert [(event["type"], event["version"], event["quantity"]) for event in events] == [
+            ("add", "1", "2"),
+            ("add", "2", "5"),
+            ("add", "3", "1")
+        ]
+
+    def test_remove_quantity_removes_line_once_its_quantity_is_used_up(self):
+        test_object = CartRepository(self.redis_client, events_key="cart-events")
+        item = test_object.add_item(self.cart_id, "apple", 3)
+
+        assert test_object.remove_quantity(self.cart_id, item.item_id, 2) == 2
+        assert test_object.get_item(self.cart_id, item.item_id).quantity == 1
+        assert test_object.remove_quantity(self.cart_id, item.item_id, 5) == 1
+        assert test_object.get_cart(self.cart_id).items == []
+        assert test_object.remove_quantity(self.cart_id, uuid.uuid4(), 1) == 0
+        assert test_object.remove_quantity(uuid.uuid4(), item.item_id, 1) == 0
+        assert self.redis_client.xlen("cart-events") == 3
+
+    def test_remove_quantity_below_1_neither_writes_nor_emits(self):
+        test_object = CartRepository(self.redis_client, events_key="cart-events")
+        item = test_object.add_item(self.cart_id, "apple", 3)
+
+        assert test_object.remove_quantity(self.cart_id, item.item_id, 0) == 0
+        assert test_object.remove_quantity(self.cart_id, item.item_id, -5) == 0
+
+        cart = test_object.get_cart(self.cart_id)
+        assert cart.items[0].quantity == 3
+        assert cart.version == 1
+        assert self.redis_client.xlen("cart-events") == 1
+
+    def test_delete_item_removes_only_that_line(self):
+        test_object = CartRepository(self.redis_client)
+        apple = test_object.add_item(self.cart_id, "apple", 3)
+        pear = test_object.add_item(self.cart_id, "pear", 1)
+
+        assert test_object.delete_item(self.cart_id, apple.item_id) is True
+        assert test_object.delete_item(self.cart_id, apple.item_id) is False
+        assert test_object.delete_item(uuid.uuid4(), pear.item_id) is False
+
+        cart = test_object.get_cart(self.cart_id)
+        assert cart.items == [pear]
+        assert cart.version == 3
+
+    def test_apply_operations_applies_batch_in_one_write_with_an_event_per_change(self):
+        test_object = CartRepository(self.redis_client, events_key="cart-events")
+        apple = test_object.add_item(self.cart_id, "apple", 5)
+
+        results = test_object.apply_operations(self.cart_id, [
+            AddItemOperation(op="add", item_name="pear", quantity=2),
+            RemoveQuantityOperation(op="remove", item_id=apple.item_id, quantity=5),
+            AddItemOperation(op="add", item_name="apple", quantity=1),
+            DeleteItemOperation(op="delete", item_id=uuid.uuid4())
+        ], expected_version=1)
+
+        assert [result.op for result in results] == ["add", "remove", "add", "delete"]
+        assert results[1].removed == 5
+        assert results[2].item.item_id != apple.item_id
+        assert results[3].deleted is False
+        cart = test_object.get_cart(self.cart_id)
+        assert [(item.item_name, item.quantity) for item in cart.items] == [("pear", 2), ("apple", 1)]
+        assert cart.version == 2
+        events = [fields for _, fields in self.redis_client.xrange("cart-events")][1:]
+        assert [(event["type"], event["version"]) for event in events] == [("add", "2"), ("remove", "2"), ("add", "2")]
+
+    def test_apply_operations_writes_nothing_on_stale_version_or_without_changes(self):
+        test_object = CartRepository(self.redis_client, events_key="cart-events")
+        apple = test_object.add_item(self.cart_id, "apple", 5)
+
+        assert test_object.apply_operations(
+            self.cart_id,
+            [RemoveQuantityOperation(op="remove", item_id=apple.item_id, quantity=1)],
+            expected_version=3
+        ) is None
+        results = test_object.apply_operations(self.cart_id, [
+            RemoveQuantityOperation(op="remove", item_id=uuid.uuid4(), quantity=1),
+            DeleteItemOperation(op="delete", item_id=uuid.uuid4())
+        ])
+
+        assert [(result.removed, result.deleted) for result in results] == [(0, None), (None, False)]
+        cart = test_object.get_cart(self.cart_id)
+        assert cart.items[0].quantity == 5
+        assert cart.version == 1
+        assert self.redis_client.xlen("cart-events") == 1
+
+    def test_scripts_write_no_stream_when_events_are_disabled(self):
+        test_object = CartRepository(self.redis_client)
+
+        item = test_object.add_item(self.cart_id, "apple", 3)
+        test_object.remove_quantity(self.cart_id, item.item_id, 1)
+        test_object.delete_cart(self.cart_id)
+
+        assert self.redis_client.keys() == []
+
+    def test_events_of_every_script_read_back_in_order(self):
+        test_object = CartRepository(self.redis_client, events_key="cart-events")
+        cart = stubbed_cart()
+
+        test_object.save_cart(cart)
+        item = test_object.add_item(cart.cart_id, "apple", 3)
+        test_object.remove_quantity(cart.cart_id, item.item_id, 1)
+        test_object.delete_item(cart.cart_id, item.item_id)
+        assert test_object.delete_cart(cart.cart_id) is True
+        assert test_object.delete_cart(cart.cart_id) is False
+
+        events = CartEventRepository(self.redis_client, key="cart-events").read_events().events
+        assert [(event.type, event.cart_id, event.version) for event in events] == [
+            ("replace", cart.cart_id, 1),
+            ("add", cart.cart_id, 2),
+            ("remove", cart.cart_id, 3),
+            ("delete_item", cart.cart_id, 4),
+            ("delete_cart", cart.cart_id, None)
+        ]
+        assert [(event.item_id, event.quantity) for event in events[1:3]] == [(item.item_id, 3), (item.item_id, 2)]
+
+    def test_unlink_carts_emits_one_clear_event_per_batch(self):
+        test_object = CartRepository(self.redis_client, key_prefix="cart:", events_key="cart-events")
+        for _ in range(3):
+            test_object.save_cart(stubbed_cart())
+
+        assert test_object.unlink_carts(count=1000) == (0, 3)
+
+        events = CartEventRepository(self.redis_client, key="cart-events").read_events().events
+        assert [(event.type, event.count) for event in events][-1] == ("clear", 3)
+        assert self.redis_client.keys() == ["cart-events"]
+
+    def test_writes_keep_the_summary_beside_the_cart(self):
+        test_object = CartRepository(self.redis_client, key_prefix="cart:")
+        summary_key = f"{{cart:{self.cart_id}}}:summary"
+        apple = test_object.add_item(self.cart_id, "apple", 3)
+        test_object.add_item(self.cart_id, "pear", 2)
+        test_object.remove_quantity(self.cart_id, apple.item_id, 1)
+        test_object.apply_operations(self.cart_id, [AddItemOperation(op="add", item_name="plum", quantity=4)])
+
+        cart = test_object.get_cart(self.cart_id)
+        assert self.redis_client.hgetall(summary_key) == {
+            "version": "4",
+            "lines": "3",
+            "quantity": "8",
+            "epoch": cart.epoch
+        }
+        assert test_object.get_summary(self.cart_id) == cart.summary()
+
+        test_object.delete_item(self.cart_id, apple.item_id)
+        test_object.save_cart(cart.model_copy(update={"items": []}))
+
+        assert self.redis_client.hmget(summary_key, "version", "lines", "quantity") == ["6", "0", "0"]
+
+    def test_summary_expires_with_the_cart(self):
+        test_object = CartRepository(self.redis_client, ttl=600, key_prefix="cart:")
+        summary_key = f"{{cart:{self.cart_id}}}:summary"
+        test_object.add_item(self.cart_id, "apple", 3)
+        assert 590 < self.redis_client.ttl(summary_key) <= 600
+
+        CartRepository(self.redis_client, key_prefix="cart:").add_item(self.cart_id, "apple", 1)
+        assert self.redis_client.ttl(summary_key) == -1
+
+    def test_get_summary_renews_cart_and_summary_outside_the_scripts_when_sliding(self):
+        test_object = CartRepository(self.redis_client, ttl=600, sliding_ttl=True, key_prefix="cart:")
+        summary_key = f"{{cart:{self.cart_id}}}:summary"
+        test_object.add_item(self.cart_id, "apple", 3)
+        self.redis_client.expire(self.cart_key(), 10)
+        self.redis_client.expire(summary_key, 10)
+
+        assert test_object.get_summary(self.cart_id).total_quantity == 3
+        assert 590 < self.redis_client.ttl(self.cart_key()) <= 600
+        assert 590 < self.redis_client.ttl(summary_key) <= 600
+
+        self.redis_client.expire(summary_key, 10)
+        test_object.get_cart(self.cart_id)
+        assert 590 < self.redis_client.ttl(summary_key) <= 600
+
+    def test_get_summary_sums_up_carts_stored_without_a_summary(self):
+        test_object = CartRepository(self.redis_client, key_prefix="cart:")
+        cart = stubbed_cart()
+        self.redis_client.set(f"cart:{cart.cart_id}", cart.model_dump_json())
+
+        assert test_object.get_summary(cart.cart_id) == cart.summary()
+        assert test_object.get_summary(uuid.uuid4()) is None
+
+    def test_delete_and_unprefixed_listing_leave_summaries_out(self):
+        test_object = CartRepository(self.redis_client)
+        carts = [stubbed_cart(), stubbed_cart()]
+        for cart in carts:
+            test_object.save_cart(cart)
+
+        assert {cart.cart_id for cart in test_object.get_carts().carts} == {cart.cart_id for cart in carts}
+        assert test_object.sample_ages()[1].without_expiry == 2
+
+        test_object.delete_cart(carts[0].cart_id)
+        assert sorted(self.redis_client.keys()) == sorted([str(carts[1].cart_id), f"{{{carts[1].cart_id}}}:summary"])
+        assert test_object.unlink_carts() == (0, 1)
+        assert self.redis_client.keys() == []
+
+
+class TestMsgpackCartScripts:
+
+    def setup_method(self):
+        self.redis_client = fakeredis.FakeRedis()
+        if self.redis_client.eval("return type(cmsgpack)", 0) != b"table":
+            pytest.skip("Lua scripts have no cmsgpack")
+        self.cart_id = uuid.uuid4()
+
+    def test_scripts_return_quantities_as_integers(self):
+        test_object = CartRepository(self.redis_client, MsgpackCartCodec(), events_key="cart-events")
+
+        item = test_object.add_item(self.cart_id, "apple", MAX_QUANTITY)
+        results = test_object.apply_operations(self.cart_id, [
+            AddItemOperation(op="add", item_name="pear", quantity=MAX_QUANTITY),
+            RemoveQuantityOperation(op="remove", item_id=item.item_id, quantity=MAX_QUANTITY - 1),
+            DeleteItemOperation(op="delete", item_id=uuid.uuid4())
+        ])
+
+        assert item.quantity == MAX_QUANTITY
+        assert (results[0].item.item_name, results[0].item.quantity) == ("pear", MAX_QUANTITY)
+        assert results[1].removed == MAX_QUANTITY - 1
+        assert results[2].deleted is False
+        assert [line.quantity for line in test_object.get_cart(self.cart_id).items] == [1, MAX_QUANTITY]
@@ -0,0 +1,374 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeredis
+import pytest
+
+from app.repositories.cart_repository import CartRepository
+from app.repositories.clear_job_repository import ClearJobRepository
+from app.repositories.hash_cart_repository import HashCartRepository
+from app.repositories.hash_ring import HashRing
+from app.repositories.memory_cart_repository import MemoryCartRepository, MemoryClearJobRepository
+from app.repositories.sharded_cart_repository import ShardedCartRepository
+from app.repositories.sqlite_cart_repository import SqliteCartRepository, SqliteClearJobRepository, SqliteDatabase
+from app.schemas.models import (
+    AddItemOperation,
+    ClearJob,
+    DeleteItemOperation,
+    MAX_QUANTITY,
+    RemoveQuantityOperation
+)
+from tests.utils import stubbed_cart, stubbed_item
+
+BACKENDS = ["redis-json", "redis-hash", "redis-sharded", "memory", "sqlite"]
+SHARDS = ["a:6379", "b:6379", "c:6379"]
+
+
+def create_store(backend: str, tmp_path, ttl=None):
+    if backend == "redis-json":
+        return CartRepository(fakeredis.FakeRedis(decode_responses=True), ttl=ttl, key_prefix="cart:")
+    elif backend == "redis-hash":
+        return HashCartRepository(fakeredis.FakeRedis(decode_responses=True), ttl=ttl, key_prefix="cart:")
+    elif backend == "redis-sharded":
+        return ShardedCartRepository(
+            {node: CartRepository(fakeredis.FakeRedis(decode_responses=True), ttl=ttl) for node in SHARDS},
+            HashRing(SHARDS)
+        )
+    elif backend == "memory":
+        return MemoryCartRepository(shards=4, ttl=ttl)
+    else:
+        return SqliteCartRepository(SqliteDatabase(str(tmp_path / "carts.db")), ttl=ttl)
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def cart_store(backend, tmp_path):
+    return create_store(backend, tmp_path)
+
+
+@pytest.mark.parametrize("backend", ["redis", "memory", "sqlite"])
+def test_clear_job_store_round_trips_jobs(backend, tmp_path):
+    if backend == "redis":
+        job_store = ClearJobRepository(fakeredis.FakeRedis(decode_responses=True))
+    elif backend == "memory":
+        job_store = MemoryClearJobRepository()
+    else:
+        job_store = SqliteClearJobRepository(SqliteDatabase(str(tmp_path / "carts.db")))
+    job = ClearJob(job_id=uuid.uuid4())
+
+    job_store.save_job(job)
+    job.status = "done"
+    job.unlinked = 3
+    job_store.save_job(job)
+
+    assert job_store.get_job(job.job_id) == job
+    assert job_store.get_job(uuid.uuid4()) is None
+
+
+class TestCartStoreConformance:
+
+    def test_missing_cart_reads_as_none(self, cart_store):
+        cart_id = uuid.uuid4()
+
+        assert cart_store.get_cart(cart_id) is None
+        assert cart_store.get_item(cart_id, uuid.uuid4()) is None
+        assert cart_store.get_summary(cart_id) is None
+        assert cart_store.delete_cart(cart_id) is False
+        assert cart_store.delete_item(cart_id, uuid.uuid4()) is False
+        assert cart_store.remove_quantity(cart_id, uuid.uuid4(), 1) == 0
+
+    def test_quantities_at_the_bound_are_stored_exactly(self, cart_store):
+        cart_id = uuid.uuid4()
+
+        assert cart_store.add_item(cart_id, "apple", MAX_QUANTITY).quantity == MAX_QUANTITY
+        results = cart_store.apply_operations(cart_id, [
+            AddItemOperation(op="add", item_name="apple", quantity=MAX_QUANTITY)
+        ])
+
+        assert results[0].item.quantity == 2 * MAX_QUANTITY
+        assert cart_store.get_cart(cart_id).items[0].quantity == 2 * MAX_QUANTITY
+        assert cart_store.get_summary(cart_id).total_quantity == 2 * MAX_QUANTITY
+
+    def test_add_item_creates_the_cart_and_merges_lines_by_name(self, cart_store):
+        cart_id = uuid.uuid4()
+
+        first = cart_store.add_item(cart_id, "apple", 2)
+        second = cart_store.add_item(cart_id, "pear", 1)
+        merged = cart_store.add_item(cart_id, "apple", 3)
+
+        assert merged.item_id == first.item_id
+        assert merged.quantity == 5
+        cart = cart_store.get_cart(cart_id)
+        assert cart.version == 3
+        assert [(item.item_id, item.item_name, item.quantity) for item in cart.items] == [
+            (first.item_id, "apple", 5),
+            (second.item_id, "pear", 1)
+        ]
+        assert cart_store.get_item(cart_id, second.item_id) == second
+
+    def test_save_cart_honours_the_expected_version(self, cart_store):
+        cart = stubbed_cart(items=[stubbed_item(), stubbed_item(), stubbed_item()])
+
+        assert cart_store.save_cart(cart, expected_version=1) is None
+        assert cart_store.save_cart(cart, expected_version=0) == 1
+        assert cart_store.save_cart(cart, expected_version=0) is None
+        assert cart_store.save_cart(cart) == 2
+
+        saved = cart_store.get_cart(cart.cart_id)
+        assert saved.items == cart.items
+        assert saved.version == 2
+
+    def test_cart_lines_round_trip_with_the_expected_version(self, cart_store):
+        cart = stubbed_cart(items=[stubbed_item(item_name=name) for name in ["b", "a", "c"]])
+        cart_store.save_cart(cart)
+
+        lines = cart_store.get_lines(cart.cart_id)
+        assert lines.version == 1
+        assert lines.to_cart() == cart.model_copy(update={"version": 1})
+
+        lines.append(str(uuid.uuid4()), "d", 4)
+        assert cart_store.save_lines(lines, expected_version=0) is None
+        assert cart_store.save_lines(lines, expected_version=1) == 2
+
+        saved = cart_store.get_cart(cart.cart_id)
+        assert [(item.item_name, item.quantity) for item in saved.items][-1] == ("d", 4)
+        assert cart_store.get_summary(cart.cart_id).total_quantity == sum(lines.quantities)
+        assert cart_store.get_lines(uuid.uuid4()) is None
+
+    def test_remove_quantity_and_delete_item(self, cart_store):
+        cart_id = uuid.uuid4()
+        item = cart_store.add_item(cart_id, "apple", 5)
+        other = cart_store.add_item(cart_id, "pear", 1)
+
+        assert cart_store.remove_quantity(cart_id, item.item_id, 2) == 2
+        assert cart_store.get_item(cart_id, item.item_id).quantity == 3
+        assert cart_store.remove_quantity(cart_id, item.item_id, 10) == 3
+        assert cart_store.get_item(cart_id, item.item_id) is None
+        assert cart_store.remove_quantity(cart_id, item.item_id, 1) == 0
+        assert cart_store.delete_item(cart_id, other.item_id) is True
+        assert cart_store.delete_item(cart_id, other.item_id) is False
+
+        cart = cart_store.get_cart(cart_id)
+        assert cart.items == []
+        assert cart.version == 5
+
+    def test_remove_quantity_below_1_leaves_the_cart_unchanged(self, cart_store):
+        cart_id = uuid.uuid4()
+        item = cart_store.add_item(cart_id, "apple", 2)
+
+        assert cart_store.remove_quantity(cart_id, item.item_id, 0) == 0
+        assert cart_store.remove_quantity(cart_id, item.item_id, -5) == 0
+
+        cart = cart_store.get_cart(cart_id)
+        assert cart.items[0].quantity == 2
+        assert cart.version == 1
+
+    def test_apply_operations(self, cart_store):
+        cart_id = uuid.uuid4()
+        item = cart_store.add_item(cart_id, "apple", 5)
+
+        results = cart_store.apply_operations(cart_id, [
+            AddItemOperation(op="add", item_name="pear", quantity=2),
+            AddItemOperation(op="add", item_name="apple", quantity=1),
+            RemoveQuantityOperation(op="remove", item_id=item.item_id, quantity=4),
+            DeleteItemOperation(op="delete", item_id=uuid.uuid4()),
+            RemoveQuantityOperation(op="remove", item_id=uuid.uuid4(), quantity=1)
+        ], expected_version=1)
+
+        pear = results[0].item
+        assert pear.item_name == "pear"
+        assert pear.quantity == 2
+        assert results[1].item.item_id == item.item_id
+        assert results[1].item.quantity == 6
+        assert [result.removed for result in results[2:]] == [4, None, 0]
+        assert results[3].deleted is False
+        cart = cart_store.get_cart(cart_id)
+        assert [(line.item_name, line.quantity) for line in cart.items] == [("apple", 2), ("pear", 2)]
+        assert cart.version == 2
+
+    def test_apply_operations_rejects_a_stale_version_and_skips_no_op_writes(self, cart_store):
+        cart_id = uuid.uuid4()
+        item = cart_store.add_item(cart_id, "apple", 1)
+        missing_cart_id = uuid.uuid4()
+
+        assert cart_store.apply_operations(cart_id, [], expected_version=7) == []
+        assert cart_store.apply_operations(cart_id, [
+            AddItemOperation(op="add", item_name="pear", quantity=1)
+        ], expected_version=0) is None
+        assert cart_store.apply_operations(cart_id, [
+            DeleteItemOperation(op="delete", item_id=uuid.uuid4())
+        ])[0].deleted is False
+        assert cart_store.apply_operations(missing_cart_id, [
+            RemoveQuantityOperation(op="remove", item_id=item.item_id, quantity=1)
+        ])[0].removed == 0
+
+        assert cart_store.get_cart(cart_id).version == 1
+        assert cart_store.get_cart(missing_cart_id) is None
+
+    def test_apply_operations_deletes_and_re_adds_a_line_within_one_batch(self, cart_store):
+        cart_id = uuid.uuid4()
+        item = cart_store.add_item(cart_id, "apple", 3)
+
+        results = cart_store.apply_operations(cart_id, [
+            DeleteItemOperation(op="delete", item_id=item.item_id),
+            AddItemOperation(op="add", item_name="apple", quantity=1)
+        ])
+
+        assert results[0].deleted is True
+        assert results[1].item.item_id != item.item_id
+        assert cart_store.get_cart(cart_id).items == [results[1].item]
+
+    def test_get_summary_counts_lines_and_quantity(self, cart_store):
+        cart_id = uuid.uuid4()
+        item = cart_store.add_item(cart_id, "apple", 3)
+        cart_store.add_item(cart_id, "pear", 4)
+        cart_store.remove_quantity(cart_id, item.item_id, 1)
+
+        summary = cart_store.get_summary(cart_id)
+
+        assert summary == cart_store.get_cart(cart_id).summary()
+        assert (summary.line_count, summary.total_quantity, summary.version) == (2, 6, 3)
+
+    def test_get_many_keeps_request_order_and_reports_missing_carts(self, cart_store):
+        carts = [stubbed_cart() for _ in range(3)]
+        for cart in carts:
+            cart_store.save_cart(cart)
+        missing_cart_id = uuid.uuid4()
+
+        result = cart_store.get_many([carts[2].cart_id, missing_cart_id, carts[0].cart_id, carts[2].cart_id])
+
+        assert [cart.cart_id for cart in result.carts] == [carts[2].cart_id, carts[0].cart_id]
+        assert result.missing_cart_ids == [missing_cart_id]
+
+    def test_get_carts_pages_through_every_cart_once(self, cart_store):
+        cart_ids = [uuid.uuid4() for _ in range(25)]
+        for cart_id in cart_ids:
+            cart_store.add_item(cart_id, "apple", 1)
+
+        seen = []
+        cursor = 0
+        while True:
+            page = cart_store.get_carts(cursor=cursor, limit=4)
+            seen.extend(cart.cart_id for cart in page.carts)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        assert sorted(seen) == sorted(cart_ids)
+
+    def test_delete_cart(self, cart_store):
+        cart = stubbed_cart()
+        cart_store.save_cart(cart)
+
+        assert cart_store.delete_cart(cart.cart_id) is True
+        assert cart_store.get_cart(cart.cart_id) is None
+        assert cart_store.delete_cart(cart.cart_id) is False
+
+    def test_cart_created_again_after_delete_gets_a_new_epoch(self, cart_store):
+        cart_id = uuid.uuid4()
+        cart_store.add_item(cart_id, "apple", 1)
+        before = cart_store.get_cart(cart_id)
+        cart_store.delete_cart(cart_id)
+        cart_store.add_item(cart_id, "apple", 1)
+        after = cart_store.get_cart(cart_id)
+
+        assert before.version == after.version == 1
+        assert before.epoch and after.epoch and before.epoch != after.epoch
+        assert cart_store.get_summary(cart_id).epoch == after.epoch
+
+        operations = [AddItemOperation(op="add", item_name="pear", quantity=1)]
+        assert cart_store.apply_operations(cart_id, operations, expected_version=1, expected_epoch=before.epoch) is None
+        lines = cart_store.get_lines(cart_id)
+        assert cart_store.save_lines(lines, expected_version=1, expected_epoch=before.epoch) is None
+        assert cart_store.save_lines(lines, expected_version=1, expected_epoch=after.epoch) == 2
+
+        # A save keeps the epoch the cart was created with.
+        lines.epoch = before.epoch
+        assert cart_store.save_lines(lines) == 3
+        assert cart_store.get_cart(cart_id).epoch == after.epoch
+
+    def test_unlink_carts_removes_every_cart(self, cart_store):
+        for _ in range(12):
+            cart_store.save_cart(stubbed_cart())
+
+        unlinked = 0
+        cursor, count = cart_store.unlink_carts(count=5)
+        unlinked += count
+        while cursor:
+            cursor, count = cart_store.unlink_carts(cursor=cursor, count=5)
+            unlinked += count
+
+        assert unlinked == 12
+        assert cart_store.get_carts().carts == []
+
+    def test_carts_without_ttl_are_counted_without_expiry(self, cart_store):
+        cart_store.save_cart(stubbed_cart())
+
+        without_expiry, counted = 0, 0
+        cursor = 0
+        while True:
+            cursor, report = cart_store.sample_ages(cursor=cursor)
+            without_expiry += report.without_expiry
+            counted += sum(bucket.count for bucket in report.buckets)
+            if not cursor:
+                break
+
+        assert without_expiry == 1
+        assert counted == 0
+
+    def test_ttl_carts_are_counted_as_fresh(self, backend, tmp_path):
+        cart_store = create_store(backend, tmp_path, ttl=3600)
+        cart_store.save_cart(stubbed_cart())
+        cart_store.add_item(uuid.uuid4(), "apple", 1)
+
+        counts = [0, 0]
+        cursor, report = cart_store.sample_ages(bounds=[60])
+        while True:
+            counts = [count + bucket.count for count, bucket in zip(counts, report.buckets)]
+            assert report.without_expiry == 0
+            if not cursor:
+                break
+            cursor, report = cart_store.sample_ages(cursor=cursor, bounds=[60])
+
+        assert counts == [2, 0]
+
+    def test_age_samples_cover_every_cart_once_in_bounded_batches(self, backend, tmp_path):
+        cart_store = create_store(backend, tmp_path, ttl=3600)
+        for _ in range(12):
+            cart_store.save_cart(stubbed_cart())
+
+        sampled = []
+        cursor = 0
+        while True:
+            cursor, report = cart_store.sample_ages(cursor=cursor, count=5)
+            sampled.append(sum(bucket.count for bucket in report.buckets))
+            if not cursor:
+                break
+
+        assert sum(sampled) == 12
+        assert len(sampled) > 1
+
+    def test_concurrent_adds_are_not_lost(self, cart_store):
+        cart_id = uuid.uuid4()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda index: cart_store.add_item(cart_id, f"item-{index % 5}", 1), range(200)))
+
+        cart = cart_store.get_cart(cart_id)
+        assert sorted(item.quantity for item in cart.items) == [40] * 5
+        assert cart.version == 200
+
+    def test_save_cart_replaces_every_line_in_order(self, cart_store):
+        cart = stubbed_cart(items=[stubbed_item(item_name=name) for name in ["b", "a", "c"]])
+        cart_store.save_cart(cart)
+
+        cart.items = cart.items[1:] + [stubbed_item(item_name="d")]
+        cart_store.save_cart(cart)
+
+        saved = cart_store.get_cart(cart.cart_id)
+        assert [item.item_name for item in saved.items] == ["a", "c", "d"]
+        assert saved.items == cart.items
@@ -0,0 +1,32 @@
+import uuid
+from unittest.mock import Mock
+
+from app.repositories.clear_job_repository import JOB_TTL, ClearJobRepository
+from app.schemas.models import ClearJob
+
+
+class TestClearJobRepository:
+
+    def setup_method(self):
+        self.mock_redis_client = Mock()
+        self.test_object = ClearJobRepository(self.mock_redis_client, key_prefix="job:")
+
+    def test_save_job_stores_job_with_expiry(self):
+        job = ClearJob(job_id=uuid.uuid4(), unlinked=3)
+        self.test_object.save_job(job)
+        self.mock_redis_client.set.assert_called_once_with(
+            name=f"job:{job.job_id}",
+            value=job.model_dump_json(),
+            ex=JOB_TTL
+        )
+
+    def test_get_job_returns_job(self):
+        job = ClearJob(job_id=uuid.uuid4(), status="done", unlinked=3)
+        self.mock_redis_client.get.return_value = job.model_dump_json()
+
+        assert self.test_object.get_job(job.job_id) == job
+        self.mock_redis_client.get.assert_called_once_with(f"job:{job.job_id}")
+
+    def test_get_job_returns_none_for_unknown_job(self):
+        self.mock_redis_client.get.return_value = None
+        assert self.test_object.get_job(uuid.uuid4()) is None
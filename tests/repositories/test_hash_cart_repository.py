@@ -0,0 +1,178 @@
+import uuid
+from unittest.mock import Mock
+
+from app.repositories import hash_cart_scripts
+from app.repositories.hash_cart_repository import HashCartRepository
+from app.schemas.models import CartBulkResult, CartOperationResult, CartPage, CartSummary, DeleteItemOperation
+from tests.utils import stubbed_cart, stubbed_item, random_int
+
+
+def hash_fields(cart):
+    fields = {"cart_id": str(cart.cart_id)}
+    for item in cart.items:
+        fields[f"id:{item.item_name}"] = str(item.item_id)
+        fields[f"name:{item.item_id}"] = item.item_name
+        fields[f"qty:{item.item_id}"] = str(item.quantity)
+    fields["lines"] = str(len(cart.items))
+    fields["quantity"] = str(sum(item.quantity for item in cart.items))
+
+    return fields
+
+
+class TestHashCartRepository:
+
+    def setup_method(self):
+        self.mock_redis_client = Mock()
+        self.scripts = {}
+        self.mock_redis_client.register_script.side_effect = lambda source: self.scripts.setdefault(source, Mock())
+        self.mock_pipeline = self.mock_redis_client.pipeline.return_value
+        self.test_object = HashCartRepository(self.mock_redis_client)
+
+    def test_get_carts_reads_hashes_in_one_pipeline(self):
+        carts = [stubbed_cart(), stubbed_cart(items=[])]
+        self.mock_redis_client.scan.return_value = (0, [str(cart.cart_id) for cart in carts])
+        self.mock_pipeline.execute.return_value = [hash_fields(cart) for cart in carts] + [{}]
+
+        assert self.test_object.get_carts() == CartPage(carts=carts, next_cursor=None)
+        self.mock_redis_client.pipeline.assert_called_once_with(transaction=False)
+        assert self.mock_pipeline.hgetall.call_count == 2
+        self.mock_redis_client.mget.assert_not_called()
+
+    def test_get_many_reports_missing_hashes(self):
+        cart = stubbed_cart()
+        missing_cart_id = uuid.uuid4()
+        self.mock_pipeline.execute.return_value = [hash_fields(cart), {}]
+
+        actual = self.test_object.get_many([cart.cart_id, missing_cart_id])
+
+        assert actual == CartBulkResult(carts=[cart], missing_cart_ids=[missing_cart_id])
+        self.mock_redis_client.pipeline.assert_called_once_with(transaction=False)
+
+    def test_get_cart_returns_cart(self):
+        cart = stubbed_cart(items=[stubbed_item(item_name="a:b"), stubbed_item()])
+        self.mock_redis_client.hgetall.return_value = hash_fields(cart)
+        assert self.test_object.get_cart(cart.cart_id) == cart
+
+    def test_get_cart_returns_none(self):
+        self.mock_redis_client.hgetall.return_value = {}
+        assert self.test_object.get_cart(uuid.uuid4()) is None
+
+    def test_get_cart_renews_ttl_in_same_pipeline_when_sliding(self):
+        cart = stubbed_cart()
+        self.mock_pipeline.execute.return_value = [hash_fields(cart), True]
+
+        actual = HashCartRepository(self.mock_redis_client, ttl=600, sliding_ttl=True).get_cart(cart.cart_id)
+
+        assert actual == cart
+        self.mock_pipeline.hgetall.assert_called_once_with(str(cart.cart_id))
+        self.mock_pipeline.expire.assert_called_once_with(str(cart.cart_id), 600)
+        self.mock_redis_client.hgetall.assert_not_called()
+
+    def test_get_item_reads_only_item_fields(self):
+        cart_id = uuid.uuid4()
+        item = stubbed_item()
+        self.mock_redis_client.hmget.return_value = [item.item_name, str(item.quantity)]
+
+        assert self.test_object.get_item(cart_id, item.item_id) == item
+        self.mock_redis_client.hmget.assert_called_once_with(
+            str(cart_id),
+            [f"name:{item.item_id}", f"qty:{item.item_id}"]
+        )
+        self.mock_redis_client.hgetall.assert_not_called()
+
+    def test_get_item_returns_none_when_item_does_not_exist(self):
+        self.mock_redis_client.hmget.return_value = [None, None]
+        assert self.test_object.get_item(uuid.uuid4(), uuid.uuid4()) is None
+
+    def test_save_cart_replaces_hash_in_one_script(self):
+        cart = stubbed_cart()
+        self.test_object.save_cart(cart)
+
+        args = self.scripts[hash_cart_scripts.SAVE_CART].call_args.kwargs["args"]
+        assert dict(zip(args[:-3:2], args[1:-3:2])) == hash_fields(cart)
+        assert args[-3:] == [-1, "*", 0]
+        assert self.scripts[hash_cart_scripts.SAVE_CART].call_args.kwargs["keys"] == [
+            str(cart.cart_id),
+            f"{{{cart.cart_id}}}:summary"
+        ]
+
+    def test_get_summary_reads_only_counter_fields(self):
+        cart_id = uuid.uuid4()
+        self.mock_redis_client.hmget.return_value = [str(cart_id), "4", "2", "9", "5f3a"]
+
+        actual = self.test_object.get_summary(cart_id)
+
+        assert actual == CartSummary(cart_id=cart_id, version=4, epoch="5f3a", line_count=2, total_quantity=9)
+        self.mock_redis_client.hmget.assert_called_once_with(
+            str(cart_id),
+            ["cart_id", "version", "lines", "quantity", "epoch"]
+        )
+        self.mock_redis_client.hgetall.assert_not_called()
+
+    def test_get_summary_returns_none_when_cart_does_not_exist(self):
+        self.mock_redis_client.hmget.return_value = [None, None, None, None, None]
+        assert self.test_object.get_summary(uuid.uuid4()) is None
+
+    def test_get_summary_counts_items_of_cart_written_before_counters(self):
+        cart = stubbed_cart()
+        fields = {name: value for name, value in hash_fields(cart).items() if name not in ("lines", "quantity")}
+        self.mock_redis_client.hmget.return_value = [str(cart.cart_id), None, None, None, None]
+        self.mock_redis_client.hgetall.return_value = fields
+
+        assert self.test_object.get_summary(cart.cart_id) == cart.summary()
+
+    def test_get_cart_reads_cart_version(self):
+        cart = stubbed_cart()
+        self.mock_redis_client.hgetall.return_value = hash_fields(cart) | {"version": "7"}
+
+        assert self.test_object.get_cart(cart.cart_id).version == 7
+
+    def test_add_item_runs_hash_add_item_script(self):
+        cart_id = uuid.uuid4()
+        item = stubbed_item()
+        self.scripts[hash_cart_scripts.ADD_ITEM].return_value = [str(item.item_id), item.quantity]
+
+        actual = self.test_object.add_item(cart_id=cart_id, item_name=item.item_name, quantity=random_int())
+
+        assert actual == item
+        kwargs = self.scripts[hash_cart_scripts.ADD_ITEM].call_args.kwargs
+        assert kwargs["keys"] == [str(cart_id), f"{{{cart_id}}}:summary"]
+        assert kwargs["args"][:2] == [str(cart_id), item.item_name]
+
+    def test_remove_quantity_runs_hash_remove_quantity_script(self):
+        cart_id = uuid.uuid4()
+        item_id = uuid.uuid4()
+        quantity = random_int(low=1)
+        self.scripts[hash_cart_scripts.REMOVE_QUANTITY].return_value = quantity
+
+        assert self.test_object.remove_quantity(cart_id=cart_id, item_id=item_id, quantity=quantity) == quantity
+        self.scripts[hash_cart_scripts.REMOVE_QUANTITY].assert_called_once_with(
+            keys=[str(cart_id), f"{{{cart_id}}}:summary"],
+            args=[str(item_id), quantity, 0]
+        )
+
+    def test_delete_item_runs_hash_delete_item_script(self):
+        cart_id = uuid.uuid4()
+        item_id = uuid.uuid4()
+        self.scripts[hash_cart_scripts.DELETE_ITEM].return_value = 1
+
+        assert self.test_object.delete_item(cart_id=cart_id, item_id=item_id) is True
+        self.scripts[hash_cart_scripts.DELETE_ITEM].assert_called_once_with(
+            keys=[str(cart_id), f"{{{cart_id}}}:summary"],
+            args=[str(item_id), 0]
+        )
+
+    def test_apply_operations_runs_hash_apply_operations_script(self):
+        cart_id = uuid.uuid4()
+        self.scripts[hash_cart_scripts.APPLY_OPERATIONS].return_value = [["delete", 1]]
+
+        actual = self.test_object.apply_operations(
+            cart_id=cart_id,
+            operations=[DeleteItemOperation(op="delete", item_id=uuid.uuid4())]
+        )
+
+        assert actual == [CartOperationResult(op="delete", deleted=True)]
+        assert self.scripts[hash_cart_scripts.APPLY_OPERATIONS].call_args.kwargs["keys"] == [
+            str(cart_id),
+            f"{{{cart_id}}}:summary"
+        ]
@@ -0,0 +1,138 @@
+import uuid
+
+import fakeredis
+
+from app.repositories.cart_event_repository import CartEventRepository
+from app.repositories.cart_repository import CartRepository
+from app.repositories.hash_cart_repository import HashCartRepository
+from app.schemas.models import AddItemOperation, DeleteItemOperation, RemoveQuantityOperation
+from app.tools.migrate_hash_layout import migrate
+from tests.utils import stubbed_cart
+
+
+class TestHashCartScripts:
+
+    def setup_method(self):
+        self.redis_client = fakeredis.FakeRedis(decode_responses=True)
+        self.cart_id = uuid.uuid4()
+        self.key = f"cart:{self.cart_id}"
+        self.test_object = HashCartRepository(self.redis_client, key_prefix="cart:")
+
+    def counts(self) -> list:
+        return self.redis_client.hmget(self.key, "version", "lines", "quantity")
+
+    def test_add_item_merges_lines_by_name_and_keeps_counts(self):
+        apple = self.test_object.add_item(self.cart_id, "apple", 2)
+        merged = self.test_object.add_item(self.cart_id, "apple", 3)
+        pear = self.test_object.add_item(self.cart_id, "pear", 1)
+
+        assert merged.item_id == apple.item_id
+        assert merged.quantity == 5
+        assert self.test_object.get_cart(self.cart_id).items == [merged, pear]
+        assert self.counts() == ["3", "2", "6"]
+        assert self.redis_client.ttl(self.key) == -1
+
+    def test_remove_quantity_and_delete_item_drop_fields_and_keep_counts(self):
+        apple = self.test_object.add_item(self.cart_id, "apple", 3)
+        pear = self.test_object.add_item(self.cart_id, "pear", 1)
+
+        assert self.test_object.remove_quantity(self.cart_id, apple.item_id, 2) == 2
+        assert self.counts() == ["3", "2", "2"]
+        assert self.test_object.remove_quantity(self.cart_id, apple.item_id, 5) == 1
+        assert self.test_object.remove_quantity(self.cart_id, apple.item_id, 1) == 0
+        assert self.test_object.delete_item(self.cart_id, pear.item_id) is True
+        assert self.test_object.delete_item(self.cart_id, pear.item_id) is False
+
+        assert self.counts() == ["5", "0", "0"]
+        assert [field for field in self.redis_client.hkeys(self.key) if ":" in field] == []
+
+    def test_writes_count_lines_of_carts_stored_before_counts_existed(self):
+        item_id = str(uuid.uuid4())
+        self.redis_client.hset(self.key, mapping={
+            "cart_id": str(self.cart_id),
+            "version": 1,
+            "id:apple": item_id,
+            "name:" + item_id: "apple",
+            "qty:" + item_id: 4
+        })
+
+        self.test_object.add_item(self.cart_id, "pear", 1)
+
+        assert self.counts() == ["2", "2", "5"]
+
+    def test_writes_renew_expiry_when_ttl_is_set(self):
+        test_object = HashCartRepository(self.redis_client, ttl=600, key_prefix="cart:")
+        item = test_object.add_item(self.cart_id, "apple", 3)
+        self.redis_client.expire(self.key, 10)
+
+        test_object.remove_quantity(self.cart_id, item.item_id, 1)
+
+        assert 590 < self.redis_client.ttl(self.key) <= 600
+
+    def test_apply_operations_applies_batch_and_keeps_counts(self):
+        apple = self.test_object.add_item(self.cart_id, "apple", 5)
+        pear = self.test_object.add_item(self.cart_id, "pear", 1)
+
+        results = self.test_object.apply_operations(self.cart_id, [
+            AddItemOperation(op="add", item_name="plum", quantity=2),
+            RemoveQuantityOperation(op="remove", item_id=apple.item_id, quantity=2),
+            DeleteItemOperation(op="delete", item_id=pear.item_id),
+            RemoveQuantityOperation(op="remove", item_id=uuid.uuid4(), quantity=1)
+        ], expected_version=2)
+
+        assert [(result.removed, result.deleted) for result in results[1:]] == [(2, None), (None, True), (0, None)]
+        cart = self.test_object.get_cart(self.cart_id)
+        assert [(item.item_name, item.quantity) for item in cart.items] == [("apple", 3), ("plum", 2)]
+        assert self.counts() == ["3", "2", "5"]
+
+    def test_apply_operations_writes_nothing_on_stale_version_or_without_changes(self):
+        apple = self.test_object.add_item(self.cart_id, "apple", 5)
+
+        assert self.test_object.apply_operations(
+            self.cart_id,
+            [DeleteItemOperation(op="delete", item_id=apple.item_id)],
+            expected_version=4
+        ) is None
+        self.test_object.apply_operations(self.cart_id, [DeleteItemOperation(op="delete", item_id=uuid.uuid4())])
+
+        assert self.counts() == ["1", "1", "5"]
+
+    def test_migrate_cart_converts_json_cart_and_keeps_its_ttl(self):
+        json_repository = CartRepository(self.redis_client, ttl=600, key_prefix="cart:")
+        apple = json_repository.add_item(self.cart_id, "apple", 3)
+        pear = json_repository.add_item(self.cart_id, "pear", 2)
+        epoch = json_repository.get_cart(self.cart_id).epoch
+
+        assert migrate(self.redis_client, key_prefix="cart:") == {"migrated": 1, "failed": 0}
+
+        cart = self.test_object.get_cart(self.cart_id)
+        assert cart.items == [apple, pear]
+        assert cart.version == 2
+        assert cart.epoch == epoch != ""
+        assert self.counts() == ["2", "2", "5"]
+        assert 590 < self.redis_client.ttl(self.key) <= 600
+        assert self.redis_client.exists(f"{{{self.key}}}:summary") == 0
+
+    def test_events_of_every_script_read_back_in_order(self):
+        test_object = HashCartRepository(self.redis_client, key_prefix="cart:", events_key="cart-events")
+        cart = stubbed_cart()
+
+        test_object.save_cart(cart)
+        item = test_object.add_item(cart.cart_id, "apple", 3)
+        test_object.remove_quantity(cart.cart_id, item.item_id, 1)
+        test_object.apply_operations(cart.cart_id, [
+            AddItemOperation(op="add", item_name="pear", quantity=2),
+            DeleteItemOperation(op="delete", item_id=item.item_id)
+        ])
+        test_object.delete_cart(cart.cart_id)
+
+        events = CartEventRepository(self.redis_client, key="cart-events").read_events().events
+        assert [(event.type, event.cart_id, event.version, event.quantity) for event in events] == [
+            ("replace", cart.cart_id, 1, None),
+            ("add", cart.cart_id, 2, 3),
+            ("remove", cart.cart_id, 3, 2),
+            ("add", cart.cart_id, 4, 2),
+            ("delete_item", cart.cart_id, 4, None),
+            ("delete_cart", cart.cart_id, None, None)
+        ]
+        assert events[4].item_id == item.item_id
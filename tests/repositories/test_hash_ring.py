@@ -0,0 +1,32 @@
+import uuid
+from collections import Counter
+
+from app.repositories.hash_ring import HashRing
+
+
+def test_node_spreads_keys_evenly():
+    ring = HashRing(["a:6379", "b:6379", "c:6379"])
+    keys = [str(uuid.uuid4()) for _ in range(30000)]
+
+    shares = Counter(ring.node(key) for key in keys)
+
+    assert set(shares) == {"a:6379", "b:6379", "c:6379"}
+    assert all(8000 < share < 12000 for share in shares.values())
+    assert [ring.node(key) for key in keys[:100]] == [ring.node(key) for key in keys[:100]]
+
+
+def test_adding_a_node_only_moves_keys_to_that_node():
+    before = HashRing(["a:6379", "b:6379", "c:6379"])
+    after = HashRing(["a:6379", "b:6379", "c:6379", "d:6379"])
+    keys = [str(uuid.uuid4()) for _ in range(20000)]
+
+    moved = [key for key in keys if before.node(key) != after.node(key)]
+
+    assert {after.node(key) for key in moved} == {"d:6379"}
+    assert 4000 < len(moved) < 6000
+
+
+def test_ring_does_not_depend_on_node_order():
+    key = str(uuid.uuid4())
+
+    assert HashRing(["a:1", "b:1", "c:1"]).node(key) == HashRing(["c:1", "a:1", "b:1"]).node(key)
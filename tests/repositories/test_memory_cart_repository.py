@@ -0,0 +1,66 @@
+import uuid
+from unittest.mock import patch
+
+from app.repositories.memory_cart_repository import MemoryCartRepository
+
+
+class TestMemoryCartRepository:
+
+    def test_expired_cart_is_gone(self):
+        test_object = MemoryCartRepository(shards=2, ttl=60)
+        with patch("app.repositories.memory_cart_repository.time") as mock_time:
+            mock_time.monotonic.return_value = 1000.0
+            cart_id = uuid.uuid4()
+            test_object.add_item(cart_id, "apple", 1)
+
+            mock_time.monotonic.return_value = 1061.0
+            assert test_object.get_cart(cart_id) is None
+            assert test_object.get_carts().carts == []
+            assert test_object.add_item(cart_id, "apple", 1).quantity == 1
+
+    def test_sliding_ttl_renews_on_read(self):
+        test_object = MemoryCartRepository(shards=2, ttl=60, sliding_ttl=True)
+        with patch("app.repositories.memory_cart_repository.time") as mock_time:
+            mock_time.monotonic.return_value = 1000.0
+            cart_id = uuid.uuid4()
+            test_object.add_item(cart_id, "apple", 1)
+
+            mock_time.monotonic.return_value = 1050.0
+            test_object.get_summary(cart_id)
+            mock_time.monotonic.return_value = 1100.0
+            assert test_object.get_cart(cart_id) is not None
+
+    def test_page_cursor_resumes_within_a_shard(self):
+        test_object = MemoryCartRepository(shards=1)
+        cart_ids = [uuid.uuid4() for _ in range(3)]
+        for cart_id in cart_ids:
+            test_object.add_item(cart_id, "apple", 1)
+
+        first = test_object.get_carts(limit=2)
+        test_object.delete_cart(cart_ids[0])
+        second = test_object.get_carts(cursor=first.next_cursor, limit=2)
+
+        assert [cart.cart_id for cart in first.carts] == cart_ids[:2]
+        assert first.next_cursor == 3
+        assert [cart.cart_id for cart in second.carts] == cart_ids[2:]
+        assert second.next_cursor is None
+
+    def test_paging_skips_dropped_carts_and_compacts_the_index(self):
+        test_object = MemoryCartRepository(shards=1)
+        cart_ids = [uuid.uuid4() for _ in range(4)]
+        for cart_id in cart_ids:
+            test_object.add_item(cart_id, "apple", 1)
+
+        test_object.delete_cart(cart_ids[0])
+        test_object.delete_cart(cart_ids[1])
+        test_object.add_item(cart_ids[0], "pear", 1)
+        page = test_object.get_carts(limit=2)
+
+        assert [cart.cart_id for cart in page.carts] == [cart_ids[2], cart_ids[3]]
+        assert [cart.cart_id for cart in test_object.get_carts(cursor=page.next_cursor).carts] == [cart_ids[0]]
+
+        test_object.delete_cart(cart_ids[2])
+        shard = test_object._shards[0]
+        assert shard.ids == [cart_ids[3], cart_ids[0]]
+        assert shard.seqs == [4, 5]
+        assert shard.dropped == 0
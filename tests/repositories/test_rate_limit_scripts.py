@@ -0,0 +1,35 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.repositories.async_rate_limit_repository import AsyncRateLimitRepository
+
+
+@pytest.mark.anyio
+class TestRateLimitScripts:
+
+    def setup_method(self):
+        self.redis_client = fakeredis.FakeAsyncRedis()
+        self.test_object = AsyncRateLimitRepository(self.redis_client, rate=1, burst=2, key_prefix="rate:")
+
+    async def test_take_token_allows_a_burst_then_waits_for_the_next_token(self):
+        assert await self.test_object.take_token("ip:10.0.0.1") == 0
+        assert await self.test_object.take_token("ip:10.0.0.1") == 0
+
+        assert 0.9 < await self.test_object.take_token("ip:10.0.0.1") <= 1
+        assert await self.test_object.take_token("ip:10.0.0.2") == 0
+
+    async def test_tokens_refill_at_the_configured_rate(self):
+        test_object = AsyncRateLimitRepository(self.redis_client, rate=100, burst=1, key_prefix="rate:")
+
+        assert await test_object.take_token("ip:10.0.0.1") == 0
+        assert await test_object.take_token("ip:10.0.0.1") > 0
+        await asyncio.sleep(0.02)
+
+        assert await test_object.take_token("ip:10.0.0.1") == 0
+
+    async def test_bucket_expires_once_it_would_be_full_again(self):
+        await self.test_object.take_token("ip:10.0.0.1")
+
+        assert 2000 < await self.redis_client.pttl("rate:ip:10.0.0.1") <= 3000
@@ -0,0 +1,157 @@
+import uuid
+from unittest.mock import Mock
+
+import pytest
+from redis import ResponseError
+
+from app.repositories.hash_ring import HashRing
+from app.repositories.sharded_cart_repository import ShardedCartRepository
+from app.schemas.models import CartAgeBucket, CartAgeReport, CartBulkResult, CartPage
+from tests.utils import stubbed_cart
+
+NODES = ["a:6379", "b:6379", "c:6379"]
+
+
+class TestShardedCartRepository:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.shards = {node: Mock() for node in NODES}
+        self.ring = HashRing(NODES)
+        self.test_object = ShardedCartRepository(self.shards, self.ring)
+
+    def test_single_cart_calls_go_to_the_owning_shard(self):
+        cart = stubbed_cart()
+        owner = self.shards[self.ring.node(str(cart.cart_id))]
+
+        assert self.test_object.get_cart(cart.cart_id) == owner.get_cart.return_value
+        self.test_object.save_cart(cart, expected_version=2)
+        self.test_object.add_item(cart.cart_id, "apple", 1)
+
+        owner.get_cart.assert_called_once_with(cart.cart_id)
+        owner.save_cart.assert_called_once_with(cart, expected_version=2, expected_epoch=None)
+        owner.add_item.assert_called_once_with(cart.cart_id, "apple", 1)
+        assert all(not shard.method_calls for shard in self.shards.values() if shard is not owner)
+
+    def test_get_many_asks_each_shard_for_its_carts_and_keeps_request_order(self):
+        carts = [stubbed_cart() for _ in range(12)]
+        for shard in self.shards.values():
+            shard.get_many.side_effect = lambda cart_ids: CartBulkResult(
+                carts=[cart for cart in carts if cart.cart_id in cart_ids],
+                missing_cart_ids=[]
+            )
+        missing_cart_id = uuid.uuid4()
+
+        result = self.test_object.get_many([missing_cart_id] + [cart.cart_id for cart in reversed(carts)])
+
+        assert result.carts == list(reversed(carts))
+        assert result.missing_cart_ids == [missing_cart_id]
+        for node, shard in self.shards.items():
+            for call in shard.get_many.call_args_list:
+                assert {self.ring.node(str(cart_id)) for cart_id in call.args[0]} == {node}
+
+    def test_get_carts_moves_on_to_the_next_shard_until_the_page_is_full(self):
+        carts = [stubbed_cart() for _ in range(4)]
+        self.shards["a:6379"].get_carts.return_value = CartPage(carts=carts[:1])
+        self.shards["b:6379"].get_carts.return_value = CartPage(carts=carts[1:3], next_cursor=17)
+
+        actual = self.test_object.get_carts(limit=3)
+
+        assert actual == CartPage(carts=carts[:3], next_cursor=17 * 3 + 1)
+        self.shards["a:6379"].get_carts.assert_called_once_with(cursor=0, limit=3)
+        self.shards["b:6379"].get_carts.assert_called_once_with(cursor=0, limit=2)
+
+    def test_get_carts_resumes_inside_a_shard_and_ends_after_the_last_one(self):
+        self.shards["b:6379"].get_carts.return_value = CartPage(carts=[])
+        self.shards["c:6379"].get_carts.return_value = CartPage(carts=[])
+
+        actual = self.test_object.get_carts(cursor=17 * 3 + 1, limit=10)
+
+        assert actual == CartPage(carts=[])
+        self.shards["b:6379"].get_carts.assert_called_once_with(cursor=17, limit=10)
+        self.shards["a:6379"].get_carts.assert_not_called()
+
+    def test_get_carts_points_at_the_next_shard_when_a_shard_fills_the_page(self):
+        self.shards["a:6379"].get_carts.return_value = CartPage(carts=[stubbed_cart(), stubbed_cart()])
+
+        assert self.test_object.get_carts(limit=2).next_cursor == 1
+        self.shards["b:6379"].get_carts.assert_not_called()
+
+    def test_unlink_carts_walks_the_shards_in_turn(self):
+        self.shards["a:6379"].unlink_carts.return_value = (5, 10)
+        self.shards["c:6379"].unlink_carts.return_value = (0, 3)
+
+        assert self.test_object.unlink_carts(count=10) == (5 * 3, 10)
+        assert self.test_object.unlink_carts(cursor=2, count=10) == (0, 3)
+        self.shards["a:6379"].unlink_carts.assert_called_once_with(cursor=0, count=10)
+
+    def test_sample_ages_walks_the_shards_one_batch_at_a_time(self):
+        report = CartAgeReport(buckets=[CartAgeBucket(max_age=60, count=1), CartAgeBucket(count=2)], without_expiry=3)
+        self.shards["b:6379"].sample_ages.return_value = (5, report)
+        self.shards["c:6379"].sample_ages.return_value = (0, report)
+
+        assert self.test_object.sample_ages(cursor=1, count=10, bounds=[60]) == (16, report)
+        self.shards["b:6379"].sample_ages.assert_called_once_with(cursor=0, count=10, bounds=[60])
+        assert self.test_object.sample_ages(cursor=5, count=10, bounds=[60]) == (0, report)
+        self.shards["c:6379"].sample_ages.assert_called_once_with(cursor=1, count=10, bounds=[60])
+
+    def test_cart_is_moved_from_its_previous_node_before_use(self):
+        previous_ring = HashRing(NODES[:2])
+        test_object = ShardedCartRepository(self.shards, self.ring, previous_ring, db=2, auth="secret")
+        cart_id = next(
+            cart_id for cart_id in iter(uuid.uuid4, None)
+            if self.ring.node(str(cart_id)) == "c:6379"
+        )
+        previous = self.shards[previous_ring.node(str(cart_id))]
+
+        test_object.get_cart(cart_id)
+
+        previous.move_carts.assert_called_once_with([cart_id], "c", 6379, db=2, auth="secret")
+        self.shards["c:6379"].get_cart.assert_called_once_with(cart_id)
+
+    def test_cart_that_already_exists_on_its_new_node_stays_there(self):
+        test_object = ShardedCartRepository(self.shards, self.ring, HashRing(NODES[:1]))
+        cart_id = next(cart_id for cart_id in iter(uuid.uuid4, None) if self.ring.node(str(cart_id)) != "a:6379")
+        self.shards["a:6379"].move_carts.side_effect = ResponseError("BUSYKEY Target key name already exists.")
+
+        test_object.get_cart(cart_id)
+
+        self.shards[self.ring.node(str(cart_id))].get_cart.assert_called_once_with(cart_id)
+
+    def test_failed_move_fails_the_call(self):
+        test_object = ShardedCartRepository(self.shards, self.ring, HashRing(NODES[:1]))
+        cart_id = next(cart_id for cart_id in iter(uuid.uuid4, None) if self.ring.node(str(cart_id)) != "a:6379")
+        self.shards["a:6379"].move_carts.side_effect = ResponseError("IOERR error or timeout reading to target")
+
+        with pytest.raises(ResponseError):
+            test_object.get_cart(cart_id)
+
+    def test_cart_is_moved_once_and_not_again_on_later_use(self):
+        test_object = ShardedCartRepository(self.shards, self.ring, HashRing(NODES[:1]))
+        cart_id = next(cart_id for cart_id in iter(uuid.uuid4, None) if self.ring.node(str(cart_id)) != "a:6379")
+        self.shards[self.ring.node(str(cart_id))].get_many.return_value = CartBulkResult(
+            carts=[],
+            missing_cart_ids=[cart_id]
+        )
+
+        test_object.get_cart(cart_id)
+        test_object.add_item(cart_id, "apple", 1)
+        test_object.get_many([cart_id])
+
+        self.shards["a:6379"].move_carts.assert_called_once()
+
+    def test_get_many_moves_carts_in_one_batch_per_node(self):
+        test_object = ShardedCartRepository(self.shards, self.ring, HashRing(NODES[:1]))
+        cart_ids = [uuid.uuid4() for _ in range(20)]
+        for node in NODES:
+            self.shards[node].get_many.return_value = CartBulkResult(carts=[], missing_cart_ids=[])
+
+        test_object.get_many(cart_ids)
+
+        moved = {
+            (call.args[1], tuple(call.args[0])) for call in self.shards["a:6379"].move_carts.call_args_list
+        }
+        assert moved == {
+            (node.partition(":")[0], tuple(cart_id for cart_id in cart_ids if self.ring.node(str(cart_id)) == node))
+            for node in NODES[1:]
+        }
@@ -0,0 +1,51 @@
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+from app.repositories.sqlite_cart_repository import SqliteCartRepository, SqliteDatabase
+
+
+class TestSqliteCartRepository:
+
+    def test_database_uses_write_ahead_logging(self, tmp_path):
+        database = SqliteDatabase(str(tmp_path / "carts.db"))
+
+        assert database.connection().execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert database.connection().execute("PRAGMA synchronous").fetchone() == (1,)
+
+    def test_failed_transaction_is_rolled_back(self, tmp_path):
+        test_object = SqliteCartRepository(SqliteDatabase(str(tmp_path / "carts.db")))
+        cart_id = uuid.uuid4()
+        test_object.add_item(cart_id, "apple", 1)
+
+        with patch("app.repositories.sqlite_cart_repository.add_line", side_effect=RuntimeError("boom")):
+            with pytest.raises(RuntimeError):
+                test_object.add_item(cart_id, "pear", 1)
+
+        assert [item.item_name for item in test_object.get_cart(cart_id).items] == ["apple"]
+        assert test_object.get_cart(cart_id).version == 1
+
+    def test_expired_cart_is_gone(self, tmp_path):
+        test_object = SqliteCartRepository(SqliteDatabase(str(tmp_path / "carts.db")), ttl=60)
+        with patch("app.repositories.sqlite_cart_repository.time") as mock_time:
+            mock_time.time.return_value = 1000.0
+            cart_id = uuid.uuid4()
+            test_object.add_item(cart_id, "apple", 1)
+
+            mock_time.time.return_value = 1061.0
+            assert test_object.get_cart(cart_id) is None
+            assert test_object.get_many([cart_id]).missing_cart_ids == [cart_id]
+            assert test_object.add_item(cart_id, "apple", 1).quantity == 1
+
+    def test_sliding_ttl_renews_on_read(self, tmp_path):
+        test_object = SqliteCartRepository(SqliteDatabase(str(tmp_path / "carts.db")), ttl=60, sliding_ttl=True)
+        with patch("app.repositories.sqlite_cart_repository.time") as mock_time:
+            mock_time.time.return_value = 1000.0
+            cart_id = uuid.uuid4()
+            test_object.add_item(cart_id, "apple", 1)
+
+            mock_time.time.return_value = 1050.0
+            test_object.get_item(cart_id, uuid.uuid4())
+            mock_time.time.return_value = 1100.0
+            assert test_object.get_cart(cart_id) is not None
@@ -0,0 +1,43 @@
+import uuid
+
+from app.schemas.cart_lines import CartLines, lines_from_cart, lines_from_fields
+from tests.utils import stubbed_cart, stubbed_item
+
+
+def test_cart_lines_round_trip_a_cart():
+    cart = stubbed_cart(items=[stubbed_item() for _ in range(3)])
+    cart.version = 7
+
+    lines = lines_from_cart(cart)
+
+    assert len(lines) == 3
+    assert lines.version == 7
+    assert lines.to_cart() == cart
+    assert lines_from_fields(cart.model_dump(mode="json")).to_cart() == cart
+
+
+def test_cart_lines_find_items_by_id_and_name():
+    items = [stubbed_item(), stubbed_item()]
+    lines = lines_from_cart(stubbed_cart(items=items))
+
+    assert lines.item(items[1].item_id) == items[1]
+    assert lines.item(uuid.uuid4()) is None
+    assert lines.ids_by_name() == {item.item_name: str(item.item_id) for item in items}
+
+
+def test_cart_lines_keep_plain_values_in_columns():
+    lines = CartLines(str(uuid.uuid4()), lines=[("a-id", "apple", 2)])
+    lines.append("p-id", "pear", 3)
+
+    assert lines.item_ids == ["a-id", "p-id"]
+    assert lines.item_names == ["apple", "pear"]
+    assert list(lines.quantities) == [2, 3]
+    assert lines.total_quantity() == 5
+    assert not hasattr(lines, "__dict__")
+
+
+def test_cart_lines_read_an_empty_items_object():
+    lines = lines_from_fields({"cart_id": str(uuid.uuid4()), "items": {}})
+
+    assert len(lines) == 0
+    assert lines.version == 0
@@ -0,0 +1,15 @@
+from app.schemas.models import CartSummary
+from tests.utils import stubbed_cart, stubbed_item
+
+
+def test_cart_summary_counts_lines_and_quantity():
+    items = [stubbed_item(), stubbed_item()]
+    cart = stubbed_cart(items=items)
+    cart.version = 5
+
+    assert cart.summary() == CartSummary(
+        cart_id=cart.cart_id,
+        version=5,
+        line_count=2,
+        total_quantity=items[0].quantity + items[1].quantity
+    )
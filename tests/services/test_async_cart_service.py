@@ -0,0 +1,144 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.schemas.cart_lines import lines_from_cart
+from app.schemas.models import CartBulkResult, CartEventPage, CartOperationResult, CartPage, ClearJob, ItemQuantity
+from app.services.async_cart_service import AsyncCartService, ThreadPoolCartService
+from tests.utils import stubbed_cart, random_int, stubbed_item
+
+
+@pytest.mark.anyio
+class TestAsyncCartService:
+    def setup_method(self):
+        self.mock_cart_repo = AsyncMock()
+        self.mock_clear_job_repo = AsyncMock()
+        self.mock_cart_event_repo = AsyncMock()
+        self.test_object = AsyncCartService(
+            self.mock_cart_repo,
+            self.mock_clear_job_repo,
+            self.mock_cart_event_repo
+        )
+
+    async def test_get_carts_returns_page_from_repo(self):
+        page = CartPage(carts=[stubbed_cart()], next_cursor=None)
+        self.mock_cart_repo.get_carts.return_value = page
+
+        assert await self.test_object.get_carts(cursor=1, limit=5) == page
+        self.mock_cart_repo.get_carts.assert_awaited_once_with(cursor=1, limit=5)
+
+    async def test_get_cart_returns_cart(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_cart.return_value = cart
+
+        assert await self.test_object.get_cart(cart_id=cart.cart_id) == cart
+
+    async def test_get_many_returns_result_from_repo(self):
+        result = CartBulkResult(carts=[stubbed_cart()], missing_cart_ids=[])
+        self.mock_cart_repo.get_many.return_value = result
+
+        assert await self.test_object.get_many([result.carts[0].cart_id]) == result
+
+    async def test_add_item_returns_item_from_repo(self):
+        cart_id = uuid.uuid4()
+        item = stubbed_item()
+        self.mock_cart_repo.add_item.return_value = item
+
+        assert await self.test_object.add_item(cart_id, item.item_name, item.quantity) == item
+        self.mock_cart_repo.add_item.assert_awaited_once_with(
+            cart_id=cart_id,
+            item_name=item.item_name,
+            quantity=item.quantity
+        )
+
+    async def test_get_summary_returns_summary_from_repo(self):
+        summary = stubbed_cart().summary()
+        self.mock_cart_repo.get_summary.return_value = summary
+
+        assert await self.test_object.get_summary(summary.cart_id) == summary
+
+    async def test_get_item_returns_item_from_repo(self):
+        item = stubbed_item()
+        self.mock_cart_repo.get_item.return_value = item
+
+        assert await self.test_object.get_item(cart_id=uuid.uuid4(), item_id=item.item_id) == item
+
+    async def test_delete_cart_returns_result_from_repo(self):
+        self.mock_cart_repo.delete_cart.return_value = True
+        assert await self.test_object.delete_cart(cart_id=uuid.uuid4())
+
+    async def test_delete_item_returns_result_from_repo(self):
+        self.mock_cart_repo.delete_item.return_value = False
+        assert not await self.test_object.delete_item(cart_id=uuid.uuid4(), item_id=uuid.uuid4())
+
+    async def test_remove_quantity_returns_result_from_repo(self):
+        quantity = random_int(low=1)
+        self.mock_cart_repo.remove_quantity.return_value = quantity
+
+        actual = await self.test_object.remove_quantity(cart_id=uuid.uuid4(), item_id=uuid.uuid4(), quantity=quantity)
+
+        assert actual == quantity
+
+    async def test_apply_operations_returns_results_from_repo(self):
+        results = [CartOperationResult(op="delete", deleted=True)]
+        self.mock_cart_repo.apply_operations.return_value = results
+
+        assert await self.test_object.apply_operations(cart_id=uuid.uuid4(), operations=[]) == results
+
+    async def test_replace_items_retries_when_cart_changes_between_read_and_write(self):
+        cart = stubbed_cart()
+        self.mock_cart_repo.get_lines.return_value = lines_from_cart(cart)
+        self.mock_cart_repo.save_lines.side_effect = [None, 2]
+
+        actual = await self.test_object.replace_items(cart.cart_id, [ItemQuantity(item_name="a", quantity=1)])
+
+        assert actual.version == 2
+        assert self.mock_cart_repo.save_lines.await_count == 2
+
+    async def test_clear_carts_unlinks_carts_in_background_task(self):
+        self.mock_cart_repo.unlink_carts.side_effect = [(5, 1000), (0, 20)]
+
+        job = await self.test_object.clear_carts()
+        assert job.status == "running"
+        await asyncio.wait(set(self.test_object._clear_tasks))
+
+        assert job == ClearJob(job_id=job.job_id, status="done", unlinked=1020)
+        assert self.mock_clear_job_repo.save_job.await_count == 3
+
+    async def test_get_clear_job_returns_job_from_repo(self):
+        job = ClearJob(job_id=uuid.uuid4(), status="done")
+        self.mock_clear_job_repo.get_job.return_value = job
+
+        assert await self.test_object.get_clear_job(job.job_id) == job
+
+    async def test_get_events_reads_events_from_repo(self):
+        page = CartEventPage(events=[], last_event_id="7-0")
+        self.mock_cart_event_repo.read_events.return_value = page
+
+        assert await self.test_object.get_events(after="7-0", wait=1) == page
+        self.mock_cart_event_repo.read_events.assert_awaited_once_with(after="7-0", count=100, wait=1)
+
+
+@pytest.mark.anyio
+class TestThreadPoolCartService:
+    async def test_runs_sync_service_methods_in_threadpool(self):
+        cart = stubbed_cart()
+        mock_cart_service = Mock()
+        mock_cart_service.get_cart.return_value = cart
+
+        assert await ThreadPoolCartService(mock_cart_service, AsyncMock()).get_cart(cart.cart_id) == cart
+        mock_cart_service.get_cart.assert_called_once_with(cart.cart_id)
+
+    async def test_reads_events_from_async_repo_instead_of_threadpool(self):
+        page = CartEventPage(events=[], last_event_id="7-0")
+        mock_cart_service = Mock()
+        mock_cart_event_repo = AsyncMock()
+        mock_cart_event_repo.read_events.return_value = page
+
+        test_object = ThreadPoolCartService(mock_cart_service, mock_cart_event_repo)
+
+        assert await test_object.get_events(after="7-0", wait=15) == page
+        mock_cart_event_repo.read_events.assert_awaited_once_with(after="7-0", count=100, wait=15)
+        mock_cart_service.get_events.assert_not_called()
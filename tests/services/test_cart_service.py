@@ -1,6 +1,19 @@
 import uuid
-from unittest.mock import Mock
-
+from unittest.mock import Mock, patch
+
+from app.schemas.cart_lines import lines_from_cart
+from app.schemas.models import (
+    AddItemOperation,
+    CartAgeBucket,
+    CartAgeReport,
+    CartBulkResult,
+    CartEvent,
+    CartEventPage,
+    CartOperationResult,
+    CartPage,
+    ClearJob,
+    ItemQuantity
+)
 from app.services.cart_service import CartService
 from tests.utils import stubbed_cart, random_int, random_string, stubbed_item
 
@@ -8,13 +21,20 @@ from tests.utils import stubbed_cart, random_int, random_string, stubbed_item
 class TestCartService:
     def setup_method(self):
         self.mock_cart_repo = Mock()
-        self.test_object = CartService(self.mock_cart_repo)
+        self.mock_clear_job_repo = Mock()
+        self.mock_cart_event_repo = Mock()
+        self.test_object = CartService(
+            self.mock_cart_repo,
+            self.mock_clear_job_repo,
+            self.mock_cart_event_repo
+        )
 
-    def test_get_carts_returns_carts(self):
-        carts = [stubbed_cart(), stubbed_cart()]
-        self.mock_cart_repo.get_carts.return_value = carts
+    def test_get_carts_returns_page_from_repo(self):
+        page = CartPage(carts=[stubbed_cart(), stubbed_cart()], next_cursor=random_int(low=1))
+        self.mock_cart_repo.get_carts.return_value = page
 
-        assert self.test_object.get_carts() == carts
+        assert self.test_object.get_carts(cursor=3, limit=2) == page
+        self.mock_cart_repo.get_carts.assert_called_once_with(cursor=3, limit=2)
 
     def test_get_cart_returns_cart(self):
         cart = stubbed_cart()
@@ -30,75 +50,60 @@ class TestCartService:
 
         assert self.test_object.get_cart(cart_id=cart_id) is None
 
-    def test_add_item_adds_quantity_to_existing_item(self):
-        cart = stubbed_cart()
+    def test_sample_ages_returns_sample_from_repo(self):
+        report = CartAgeReport(buckets=[CartAgeBucket(count=3)], without_expiry=1)
+        self.mock_cart_repo.sample_ages.return_value = (7, report)
 
-        self.mock_cart_repo.get_cart.return_value = cart
+        assert self.test_object.sample_ages(cursor=3, count=10) == (7, report)
+        self.mock_cart_repo.sample_ages.assert_called_once_with(cursor=3, count=10)
 
-        expected = cart.items[0]
-        quantity = random_int()
-        expected.quantity += quantity
-        actual = self.test_object.add_item(
-            cart_id=cart.cart_id,
-            item_name=cart.items[0].item_name,
-            quantity=quantity
-        )
+    def test_get_many_returns_result_from_repo(self):
+        cart = stubbed_cart()
+        missing_cart_id = uuid.uuid4()
+        result = CartBulkResult(carts=[cart], missing_cart_ids=[missing_cart_id])
+        self.mock_cart_repo.get_many.return_value = result
 
-        assert actual == expected
-        cart.items[0] = expected
-        self.mock_cart_repo.save_cart.assert_called_once_with(cart=cart)
+        assert self.test_object.get_many([cart.cart_id, missing_cart_id]) == result
+        self.mock_cart_repo.get_many.assert_called_once_with([cart.cart_id, missing_cart_id])
 
-    def test_add_item_creates_new_item_when_cart_does_not_exist(self):
-        self.mock_cart_repo.get_cart.return_value = None
+    def test_add_item_returns_item_from_repo(self):
+        cart_id = uuid.uuid4()
+        item = stubbed_item()
+        self.mock_cart_repo.add_item.return_value = item
 
-        item_name = random_string()
-        quantity = random_int()
         actual = self.test_object.add_item(
-            cart_id=uuid.uuid4(),
-            item_name=item_name,
-            quantity=quantity
+            cart_id=cart_id,
+            item_name=item.item_name,
+            quantity=item.quantity
         )
 
-        assert actual.quantity == quantity
-        assert actual.item_name == item_name
-        self.mock_cart_repo.save_cart.assert_called_once()
-
-    def test_add_item_creates_new_item_when_item_does_not_exist(self):
-        cart = stubbed_cart()
-        self.mock_cart_repo.get_cart.return_value = cart
-
-        item_name = random_string()
-        quantity = random_int()
-        actual = self.test_object.add_item(
-            cart_id=cart.cart_id,
-            item_name=item_name,
-            quantity=quantity
+        assert actual == item
+        self.mock_cart_repo.add_item.assert_called_once_with(
+            cart_id=cart_id,
+            item_name=item.item_name,
+            quantity=item.quantity
         )
+        self.mock_cart_repo.save_cart.assert_not_called()
 
-        assert actual.quantity == quantity
-        assert actual.item_name == item_name
-        self.mock_cart_repo.save_cart.assert_called_once()
-
-    def test_get_item_returns_item(self):
-        cart = stubbed_cart()
-        self.mock_cart_repo.get_cart.return_value = cart
-
-        actual = self.test_object.get_item(cart_id=cart.cart_id, item_id=cart.items[0].item_id)
+    def test_get_item_returns_item_from_repo(self):
+        cart_id = uuid.uuid4()
+        item = stubbed_item()
+        self.mock_cart_repo.get_item.return_value = item
 
-        assert actual == cart.items[0]
+        actual = self.test_object.get_item(cart_id=cart_id, item_id=item.item_id)
 
-    def test_get_item_returns_none_when_cart_does_not_exist(self):
-        self.mock_cart_repo.get_cart.return_value = None
+        assert actual == item
+        self.mock_cart_repo.get_item.assert_called_once_with(cart_id=cart_id, item_id=item.item_id)
 
-        actual = self.test_object.get_item(
-            cart_id=uuid.uuid4(),
-            item_id=uuid.uuid4()
-        )
+    def test_get_summary_returns_summary_from_repo(self):
+        summary = stubbed_cart().summary()
+        self.mock_cart_repo.get_summary.return_value = summary
 
-        assert actual is None
+        assert self.test_object.get_summary(summary.cart_id) == summary
+        self.mock_cart_repo.get_summary.assert_called_once_with(summary.cart_id)
 
     def test_get_item_returns_none_when_item_does_not_exist(self):
-        self.mock_cart_repo.get_cart.return_value = stubbed_cart()
+        self.mock_cart_repo.get_item.return_value = None
 
         actual = self.test_object.get_item(
             cart_id=uuid.uuid4(),
@@ -109,92 +114,145 @@ class TestCartService:
 
     def test_delete_cart_returns_result_from_repo(self):
         self.mock_cart_repo.delete_cart.return_value = True
-        assert CartService(self.mock_cart_repo).delete_cart(cart_id=uuid.uuid4())
+        assert self.test_object.delete_cart(cart_id=uuid.uuid4())
         self.mock_cart_repo.delete_cart.assert_called_once()
 
-    def test_delete_item_returns_true_when_item_exists(self):
-        cart = stubbed_cart()
-        self.mock_cart_repo.get_cart.return_value = cart
-        actual = self.test_object.delete_item(
-            cart_id=cart.cart_id,
-            item_id=cart.items[0].item_id
-        )
+    def test_delete_item_returns_result_from_repo(self):
+        cart_id = uuid.uuid4()
+        item_id = uuid.uuid4()
+        self.mock_cart_repo.delete_item.return_value = True
+
+        assert self.test_object.delete_item(cart_id=cart_id, item_id=item_id)
+        self.mock_cart_repo.delete_item.assert_called_once_with(cart_id=cart_id, item_id=item_id)
+        self.mock_cart_repo.save_cart.assert_not_called()
 
-        assert actual
-        cart.items = []
-        self.mock_cart_repo.save_cart.assert_called_once_with(cart=cart)
+    def test_remove_quantity_returns_result_from_repo(self):
+        cart_id = uuid.uuid4()
+        item_id = uuid.uuid4()
+        quantity = random_int(low=1)
+        self.mock_cart_repo.remove_quantity.return_value = quantity
 
-    def test_delete_item_returns_false_when_item_does_not_exist(self):
-        cart = stubbed_cart()
-        self.mock_cart_repo.get_cart.return_value = cart
-        actual = self.test_object.delete_item(
-            cart_id=cart.cart_id,
-            item_id=uuid.uuid4()
+        actual = self.test_object.remove_quantity(
+            cart_id=cart_id,
+            item_id=item_id,
+            quantity=quantity
         )
 
-        assert not actual
+        assert actual == quantity
+        self.mock_cart_repo.remove_quantity.assert_called_once_with(
+            cart_id=cart_id,
+            item_id=item_id,
+            quantity=quantity
+        )
         self.mock_cart_repo.save_cart.assert_not_called()
 
-    def test_delete_item_returns_false_when_cart_does_not_exist(self):
-        self.mock_cart_repo.get_cart.return_value = None
-        actual = self.test_object.delete_item(
-            cart_id=uuid.uuid4(),
-            item_id=uuid.uuid4()
+    def test_apply_operations_returns_results_from_repo(self):
+        cart_id = uuid.uuid4()
+        operations = [AddItemOperation(op="add", item_name=random_string(), quantity=random_int(low=1))]
+        results = [CartOperationResult(op="add", item=stubbed_item())]
+        self.mock_cart_repo.apply_operations.return_value = results
+
+        assert self.test_object.apply_operations(cart_id=cart_id, operations=operations) == results
+        self.mock_cart_repo.apply_operations.assert_called_once_with(
+            cart_id=cart_id,
+            operations=operations,
+            expected_version=None,
+            expected_epoch=None
         )
 
-        assert not actual
-        self.mock_cart_repo.save_cart.assert_not_called()
-
-    def test_remove_quantity_returns_0_when_cart_does_not_exist(self):
-        self.mock_cart_repo.get_cart.return_value = None
-        actual = self.test_object.remove_quantity(
-            cart_id=uuid.uuid4(),
-            item_id=uuid.uuid4(),
-            quantity=random_int(low=1)
+    def test_replace_items_keeps_item_ids_and_saves_against_read_version(self):
+        item = stubbed_item()
+        cart = stubbed_cart(items=[item])
+        cart.version = 3
+        cart.epoch = "5f3a"
+        self.mock_cart_repo.get_lines.return_value = lines_from_cart(cart)
+        self.mock_cart_repo.save_lines.return_value = 4
+
+        actual = self.test_object.replace_items(
+            cart.cart_id,
+            [ItemQuantity(item_name=item.item_name, quantity=2), ItemQuantity(item_name="new", quantity=1)]
         )
 
-        assert actual == 0
+        assert (actual.epoch, actual.version) == ("5f3a", 4)
+        assert actual.items[0].item_id == item.item_id
+        assert [(x.item_name, x.quantity) for x in actual.items] == [(item.item_name, 2), ("new", 1)]
+        assert self.mock_cart_repo.save_lines.call_args.kwargs == {"expected_version": 3, "expected_epoch": "5f3a"}
+
+    def test_replace_items_retries_when_cart_changes_between_read_and_write(self):
+        self.mock_cart_repo.get_lines.return_value = None
+        self.mock_cart_repo.save_lines.side_effect = [None, 1]
 
-    def test_remove_quantity_returns_0_when_item_does_not_exist(self):
+        actual = self.test_object.replace_items(uuid.uuid4(), [ItemQuantity(item_name="a", quantity=1)])
+
+        assert actual.version == 1
+        assert actual.epoch == self.mock_cart_repo.save_lines.call_args.args[0].epoch != ""
+        assert self.mock_cart_repo.save_lines.call_count == 2
+
+    def test_replace_items_gives_up_after_bounded_attempts(self):
+        self.mock_cart_repo.get_lines.return_value = None
+        self.mock_cart_repo.save_lines.return_value = None
+
+        assert self.test_object.replace_items(uuid.uuid4(), []) is None
+        assert self.mock_cart_repo.save_lines.call_count == 3
+
+    def test_replace_items_returns_none_when_expected_version_is_stale(self):
         cart = stubbed_cart()
-        self.mock_cart_repo.get_cart.return_value = cart
-        actual = self.test_object.remove_quantity(
-            cart_id=cart.cart_id,
-            item_id=uuid.uuid4(),
-            quantity=random_int(low=1)
-        )
+        cart.version = 5
+        self.mock_cart_repo.get_lines.return_value = lines_from_cart(cart)
 
-        assert actual == 0
+        assert self.test_object.replace_items(cart.cart_id, [], expected_version=4) is None
+        self.mock_cart_repo.save_lines.assert_not_called()
 
-    def test_remove_quantity_returns_quantity_requested_when_quantity_is_greater_or_equal_than_requested(self):
-        cart = stubbed_cart(items=[stubbed_item(quantity=random_int(low=10))])
-        quantity_to_remove = random_int(high=9)
-        self.mock_cart_repo.get_cart.return_value = cart
-        actual = self.test_object.remove_quantity(
-            cart_id=cart.cart_id,
-            item_id=cart.items[0].item_id,
-            quantity=quantity_to_remove
-        )
+    def test_replace_items_returns_none_when_expected_epoch_belongs_to_an_earlier_cart(self):
+        cart = stubbed_cart()
+        cart.version = 5
+        cart.epoch = "77c1"
+        self.mock_cart_repo.get_lines.return_value = lines_from_cart(cart)
 
-        assert actual == quantity_to_remove
-        cart.items[0].quantity -= quantity_to_remove
-        self.mock_cart_repo.save_cart.assert_called_with(cart=cart)
+        assert self.test_object.replace_items(cart.cart_id, [], expected_version=5, expected_epoch="5f3a") is None
+        self.mock_cart_repo.save_lines.assert_not_called()
 
-    def test_remove_quantity_returns_item_quantity_when_requested_is_more_than_quantity(self):
-        quantity = random_int(high=9)
-        cart = stubbed_cart(items=[stubbed_item(quantity=quantity)])
-        quantity_to_remove = random_int(low=10)
-        self.mock_cart_repo.get_cart.return_value = cart
-        actual = self.test_object.remove_quantity(
-            cart_id=cart.cart_id,
-            item_id=cart.items[0].item_id,
-            quantity=quantity_to_remove
-        )
+    def test_clear_carts_starts_background_job(self):
+        with patch("app.services.cart_service.threading.Thread") as mock_thread:
+            job = self.test_object.clear_carts()
 
-        assert actual == quantity
-        cart.items = []
-        self.mock_cart_repo.save_cart.assert_called_with(cart=cart)
+        assert job.status == "running"
+        self.mock_clear_job_repo.save_job.assert_called_once_with(job)
+        mock_thread.return_value.start.assert_called_once()
+        self.mock_cart_repo.unlink_carts.assert_not_called()
+
+    def test_clear_job_unlinks_carts_until_scan_completes(self):
+        self.mock_cart_repo.unlink_carts.side_effect = [(5, 1000), (0, 20)]
+        with patch("app.services.cart_service.threading.Thread") as mock_thread:
+            job = self.test_object.clear_carts()
+
+        mock_thread.call_args.kwargs["target"](*mock_thread.call_args.kwargs["args"])
+
+        assert job == ClearJob(job_id=job.job_id, status="done", unlinked=1020)
+        self.mock_cart_repo.unlink_carts.assert_called_with(cursor=5)
+        assert self.mock_clear_job_repo.save_job.call_count == 3
+
+    def test_clear_job_records_failure(self):
+        self.mock_cart_repo.unlink_carts.side_effect = Exception("Test Exception")
+        with patch("app.services.cart_service.threading.Thread") as mock_thread:
+            job = self.test_object.clear_carts()
+
+        mock_thread.call_args.kwargs["target"](*mock_thread.call_args.kwargs["args"])
+
+        assert job.status == "failed"
+        assert job.error == "Test Exception"
+
+    def test_get_clear_job_returns_job_from_repo(self):
+        job = ClearJob(job_id=uuid.uuid4())
+        self.mock_clear_job_repo.get_job.return_value = job
+
+        assert self.test_object.get_clear_job(job.job_id) == job
+        self.mock_clear_job_repo.get_job.assert_called_once_with(job.job_id)
+
+    def test_get_events_reads_events_from_repo(self):
+        event = CartEvent(event_id="1-0", type="delete_cart", cart_id=uuid.uuid4())
+        page = CartEventPage(events=[event], last_event_id="1-0")
+        self.mock_cart_event_repo.read_events.return_value = page
 
-    def test_clear_carts_calls_repo_clear_carts(self):
-        self.test_object.clear_carts()
-        self.mock_cart_repo.clear_carts.assert_called_once()
+        assert self.test_object.get_events(after="0-0", limit=10, wait=2.5) == page
+        self.mock_cart_event_repo.read_events.assert_called_once_with(after="0-0", count=10, wait=2.5)
@@ -0,0 +1,89 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.schemas.models import AddItemOperation, CartOperationResult
+from app.services import coalescing_cart_service
+from app.services.coalescing_cart_service import CoalescingCartService
+from tests.utils import stubbed_cart, stubbed_item
+
+
+def added(operations):
+    return [CartOperationResult(op="add", item=stubbed_item()) for _ in operations]
+
+
+@pytest.mark.anyio
+class TestCoalescingCartService:
+    def setup_method(self):
+        self.mock_cart_service = AsyncMock()
+        self.mock_cart_service.apply_operations.side_effect = lambda cart_id, operations: added(operations)
+        self.test_object = CoalescingCartService(self.mock_cart_service, max_delay=0.01)
+
+    async def test_add_item_merges_concurrent_adds_to_one_cart_into_one_write(self):
+        cart_id = uuid.uuid4()
+
+        items = await asyncio.gather(
+            self.test_object.add_item(cart_id, "apple", 1),
+            self.test_object.add_item(cart_id, "apple", 2),
+            self.test_object.add_item(cart_id, "pear", 1)
+        )
+
+        self.mock_cart_service.apply_operations.assert_awaited_once()
+        cart_id_arg, operations = self.mock_cart_service.apply_operations.call_args.args
+        assert cart_id_arg == cart_id
+        assert operations == [
+            AddItemOperation(op="add", item_name="apple", quantity=1),
+            AddItemOperation(op="add", item_name="apple", quantity=2),
+            AddItemOperation(op="add", item_name="pear", quantity=1)
+        ]
+        assert len(set(item.item_id for item in items)) == 3
+
+    async def test_add_item_writes_each_cart_separately(self):
+        await asyncio.gather(
+            self.test_object.add_item(uuid.uuid4(), "apple", 1),
+            self.test_object.add_item(uuid.uuid4(), "apple", 1)
+        )
+
+        assert self.mock_cart_service.apply_operations.await_count == 2
+
+    async def test_add_item_flushes_full_batch_without_waiting(self, monkeypatch):
+        monkeypatch.setattr(coalescing_cart_service, "MAX_COALESCED_OPERATIONS", 2)
+        test_object = CoalescingCartService(self.mock_cart_service, max_delay=60)
+        cart_id = uuid.uuid4()
+
+        await asyncio.wait_for(
+            asyncio.gather(test_object.add_item(cart_id, "a", 1), test_object.add_item(cart_id, "b", 1)),
+            timeout=1
+        )
+
+        self.mock_cart_service.apply_operations.assert_awaited_once()
+
+    async def test_add_item_raises_write_error_to_every_caller(self):
+        self.mock_cart_service.apply_operations.side_effect = ConnectionError("down")
+        cart_id = uuid.uuid4()
+
+        results = await asyncio.gather(
+            self.test_object.add_item(cart_id, "a", 1),
+            self.test_object.add_item(cart_id, "b", 1),
+            return_exceptions=True
+        )
+
+        assert [type(result) for result in results] == [ConnectionError, ConnectionError]
+
+    async def test_close_flushes_pending_adds_immediately(self):
+        test_object = CoalescingCartService(self.mock_cart_service, max_delay=60)
+        add = asyncio.create_task(test_object.add_item(uuid.uuid4(), "a", 1))
+        await asyncio.sleep(0)
+
+        await asyncio.wait_for(test_object.close(), timeout=1)
+
+        assert (await add).item_name
+        self.mock_cart_service.apply_operations.assert_awaited_once()
+
+    async def test_other_methods_are_delegated(self):
+        cart = stubbed_cart()
+        self.mock_cart_service.get_cart.return_value = cart
+
+        assert await self.test_object.get_cart(cart.cart_id) == cart
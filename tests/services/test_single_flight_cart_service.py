@@ -0,0 +1,143 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services.single_flight_cart_service import SingleFlightCartService
+from tests.utils import stubbed_cart, stubbed_item
+
+
+def read_loads(operation: str, outcome: str) -> float:
+    return REGISTRY.get_sample_value(
+        "cart_read_loads_total",
+        {"operation": operation, "outcome": outcome}
+    ) or 0.0
+
+
+@pytest.mark.anyio
+class TestSingleFlightCartService:
+    def setup_method(self):
+        self.release = asyncio.Event()
+        self.mock_cart_service = AsyncMock()
+        self.test_object = SingleFlightCartService(self.mock_cart_service)
+
+    def hold(self, result):
+        async def load(*args):
+            await self.release.wait()
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return load
+
+    async def test_get_cart_shares_one_load_between_concurrent_reads(self):
+        cart = stubbed_cart()
+        self.mock_cart_service.get_cart.side_effect = self.hold(cart)
+        coalesced = read_loads("get_cart", "coalesced")
+
+        reads = asyncio.gather(*(self.test_object.get_cart(cart.cart_id) for _ in range(3)))
+        await asyncio.sleep(0)
+        self.release.set()
+
+        assert await reads == [cart, cart, cart]
+        self.mock_cart_service.get_cart.assert_awaited_once_with(cart.cart_id)
+        assert read_loads("get_cart", "coalesced") == coalesced + 2
+
+    async def test_get_cart_loads_again_once_the_previous_load_finished(self):
+        cart = stubbed_cart()
+        self.mock_cart_service.get_cart.return_value = cart
+
+        await self.test_object.get_cart(cart.cart_id)
+        await self.test_object.get_cart(cart.cart_id)
+
+        assert self.mock_cart_service.get_cart.await_count == 2
+
+    async def test_get_cart_raises_load_error_for_every_waiting_read(self):
+        cart_id = uuid.uuid4()
+        self.mock_cart_service.get_cart.side_effect = self.hold(ConnectionError("down"))
+
+        reads = asyncio.gather(*(self.test_object.get_cart(cart_id) for _ in range(2)), return_exceptions=True)
+        await asyncio.sleep(0)
+        self.release.set()
+
+        assert [type(result) for result in await reads] == [ConnectionError, ConnectionError]
+        self.mock_cart_service.get_cart.assert_awaited_once()
+
+    async def test_get_cart_keeps_load_running_when_one_reader_is_cancelled(self):
+        cart = stubbed_cart()
+        self.mock_cart_service.get_cart.side_effect = self.hold(cart)
+
+        first = asyncio.ensure_future(self.test_object.get_cart(cart.cart_id))
+        second = asyncio.ensure_future(self.test_object.get_cart(cart.cart_id))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.release.set()
+
+        assert await second == cart
+
+    async def test_get_item_takes_item_from_cart_load_in_flight(self):
+        item = stubbed_item()
+        cart = stubbed_cart(items=[item])
+        self.mock_cart_service.get_cart.side_effect = self.hold(cart)
+
+        reads = asyncio.gather(
+            self.test_object.get_cart(cart.cart_id),
+            self.test_object.get_item(cart.cart_id, item.item_id),
+            self.test_object.get_item(cart.cart_id, uuid.uuid4())
+        )
+        await asyncio.sleep(0)
+        self.release.set()
+
+        assert await reads == [cart, item, None]
+        self.mock_cart_service.get_item.assert_not_awaited()
+
+    async def test_get_item_shares_one_load_per_item(self):
+        cart_id = uuid.uuid4()
+        item = stubbed_item()
+        self.mock_cart_service.get_item.side_effect = self.hold(item)
+
+        reads = asyncio.gather(
+            self.test_object.get_item(cart_id, item.item_id),
+            self.test_object.get_item(cart_id, item.item_id),
+            self.test_object.get_item(cart_id, uuid.uuid4())
+        )
+        await asyncio.sleep(0)
+        self.release.set()
+
+        assert (await reads)[:2] == [item, item]
+        assert self.mock_cart_service.get_item.await_count == 2
+
+    async def test_item_loads_of_distinct_carts_leave_nothing_behind(self):
+        item = stubbed_item()
+        self.mock_cart_service.get_item.side_effect = self.hold(item)
+
+        reads = asyncio.gather(*(self.test_object.get_item(uuid.uuid4(), item.item_id) for _ in range(5)))
+        await asyncio.sleep(0)
+        self.release.set()
+
+        assert await reads == [item] * 5
+        assert self.test_object._item_loads == {}
+
+    async def test_write_starts_a_new_load_for_reads_after_it(self):
+        cart = stubbed_cart()
+        self.mock_cart_service.get_cart.side_effect = self.hold(cart)
+
+        before = asyncio.ensure_future(self.test_object.get_cart(cart.cart_id))
+        await asyncio.sleep(0)
+        await self.test_object.add_item(cart.cart_id, "apple", 1)
+        after = asyncio.ensure_future(self.test_object.get_cart(cart.cart_id))
+        await asyncio.sleep(0)
+        self.release.set()
+
+        assert await asyncio.gather(before, after) == [cart, cart]
+        assert self.mock_cart_service.get_cart.await_count == 2
+        self.mock_cart_service.add_item.assert_awaited_once_with(cart.cart_id, "apple", 1)
+
+    async def test_delegates_other_calls(self):
+        cart_id = uuid.uuid4()
+
+        await self.test_object.get_summary(cart_id)
+
+        self.mock_cart_service.get_summary.assert_awaited_once_with(cart_id)
@@ -0,0 +1,124 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError
+
+from app.admission import AdmissionController, AdmissionMiddleware, client_id
+
+
+def admitted_client(admission: AdmissionController) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, admission=lambda: admission)
+
+    @app.get("/cart")
+    async def get_all():
+        return {"in_flight": admission.in_flight}
+
+    @app.get("/metrics")
+    async def metrics():
+        return {}
+
+    return TestClient(app=app)
+
+
+def test_admits_requests_while_client_has_tokens():
+    rate_limit_repo = AsyncMock()
+    rate_limit_repo.take_token.return_value = 0
+
+    response = admitted_client(AdmissionController(rate_limit_repo)).get("/cart", headers={"X-API-Key": "secret"})
+
+    assert response.status_code == 200
+    assert response.json() == {"in_flight": 1}
+    rate_limit_repo.take_token.assert_awaited_once_with(client_id({"headers": [(b"x-api-key", b"secret")]}))
+
+
+def test_rejects_limited_client_and_refuses_it_locally_until_tokens_refill():
+    rate_limit_repo = AsyncMock()
+    rate_limit_repo.take_token.return_value = 2.5
+    client = admitted_client(AdmissionController(rate_limit_repo))
+
+    first = client.get("/cart")
+    second = client.get("/cart")
+
+    assert first.status_code == 429
+    assert first.headers["Retry-After"] == "3"
+    assert second.status_code == 429
+    rate_limit_repo.take_token.assert_awaited_once()
+
+
+def test_fails_open_when_rate_limit_store_is_unavailable():
+    rate_limit_repo = AsyncMock()
+    rate_limit_repo.take_token.side_effect = ConnectionError()
+
+    assert admitted_client(AdmissionController(rate_limit_repo)).get("/cart").status_code == 200
+
+
+def test_sheds_load_when_in_flight_limit_is_reached():
+    admission = AdmissionController(max_in_flight=2)
+    admission.in_flight = 2
+
+    response = admitted_client(admission).get("/cart")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.anyio
+async def test_in_flight_limit_holds_for_requests_waiting_on_the_rate_limiter():
+    async def slow_take_token(client):
+        await asyncio.sleep(0.01)
+        return 0
+
+    rate_limit_repo = AsyncMock()
+    rate_limit_repo.take_token.side_effect = slow_take_token
+    admission = AdmissionController(rate_limit_repo, max_in_flight=1)
+    transport = httpx.ASGITransport(app=admitted_client(admission).app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(client.get("/cart"), client.get("/cart"))
+
+    assert sorted(response.status_code for response in responses) == [200, 503]
+    assert admission.in_flight == 0
+
+
+def test_rate_limited_requests_give_their_slot_back():
+    rate_limit_repo = AsyncMock()
+    rate_limit_repo.take_token.return_value = 2.5
+    admission = AdmissionController(rate_limit_repo, max_in_flight=1)
+
+    assert admitted_client(admission).get("/cart").status_code == 429
+    assert admission.in_flight == 0
+
+
+def test_sheds_load_when_redis_latency_exceeds_limit():
+    async def slow_take_token(client):
+        await asyncio.sleep(0.01)
+        return 0
+
+    rate_limit_repo = AsyncMock()
+    rate_limit_repo.take_token.side_effect = slow_take_token
+    admission = AdmissionController(rate_limit_repo, redis_latency_limit=0.001)
+
+    assert admitted_client(admission).get("/cart").status_code == 503
+    assert admission.redis_latency > 0.001
+
+
+def test_metrics_are_exempt_from_admission():
+    admission = AdmissionController(max_in_flight=1)
+    admission.in_flight = 1
+
+    assert admitted_client(admission).get("/metrics").status_code == 200
+
+
+def test_client_id_prefers_hashed_api_key():
+    scope = {"headers": [(b"x-api-key", b"secret")], "client": ("10.0.0.1", 5000)}
+
+    actual = client_id(scope)
+
+    assert actual.startswith("key:")
+    assert "secret" not in actual
+    assert client_id({"headers": [], "client": ("10.0.0.1", 5000)}) == "ip:10.0.0.1"
@@ -0,0 +1,62 @@
+import asyncio
+import uuid
+from unittest.mock import patch
+
+import pytest
+from redis import ConnectionError
+
+from app.admission import AdmissionController
+from app.app_container import AppContainer
+from app.repositories.cart_store import CartStore
+from app.repositories.memory_cart_repository import MemoryCartRepository
+from app.services.async_cart_service import AsyncCartService
+from app.settings import Settings
+
+
+@pytest.mark.anyio
+class TestAppContainer:
+    def setup_method(self):
+        self.test_object = AppContainer(Settings(storage_backend="memory", shutdown_drain_timeout=1.0))
+
+    async def test_wires_nothing_until_first_used(self):
+        cart_service = self.test_object.lazy(AsyncCartService)
+
+        assert self.test_object._injector is None
+        assert await cart_service.get_cart(uuid.uuid4()) is None
+        assert self.test_object.get(AsyncCartService) is self.test_object.get(AsyncCartService)
+
+    async def test_start_warms_up_store_and_reports_ready(self):
+        with patch.object(MemoryCartRepository, "warm_up") as warm_up:
+            await self.test_object.start()
+
+        warm_up.assert_called_once_with(2)
+        assert await self.test_object.check_ready() == "ready"
+
+    async def test_start_leaves_unreachable_store_to_readiness(self):
+        with patch.object(MemoryCartRepository, "warm_up", side_effect=ConnectionError("down")), \
+                patch.object(MemoryCartRepository, "ping", side_effect=ConnectionError("down")):
+            await self.test_object.start()
+
+            assert await self.test_object.check_ready() == "unavailable"
+
+    async def test_stop_reports_draining_and_waits_for_requests_in_flight(self):
+        await self.test_object.start()
+        admission = self.test_object.get(AdmissionController)
+        admission.in_flight = 1
+
+        async def finish_request():
+            await asyncio.sleep(0.1)
+            assert await self.test_object.check_ready() == "draining"
+            admission.in_flight = 0
+
+        request = asyncio.ensure_future(finish_request())
+        await self.test_object.stop()
+
+        assert request.done()
+        assert isinstance(self.test_object.get(CartStore), MemoryCartRepository)
+
+    async def test_stop_without_start_wires_nothing(self):
+        await self.test_object.stop()
+
+        assert self.test_object._injector is None
+        assert await self.test_object.check_ready() == "draining"
@@ -0,0 +1,114 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.main import app
+from app.metrics import CART_CACHE_COLLECTOR, CartAgeCollector, configure_metrics, instrumented, timed
+from app.repositories.cart_cache import CartCache
+from app.schemas.models import CartAgeBucket, CartAgeReport
+
+
+def sample_count(layer: str, operation: str) -> float:
+    return REGISTRY.get_sample_value(
+        "cart_stage_duration_seconds_count",
+        {"layer": layer, "operation": operation}
+    ) or 0
+
+
+def teardown_function():
+    configure_metrics(0.1)
+
+
+def test_timed_observes_sampled_calls():
+    configure_metrics(1.0)
+
+    @timed("test", "sampled")
+    def call(value):
+        return value
+
+    before = sample_count("test", "sampled")
+    assert call(3) == 3
+    assert sample_count("test", "sampled") == before + 1
+
+
+def test_timed_skips_calls_that_are_not_sampled():
+    configure_metrics(0.0)
+
+    @timed("test", "skipped")
+    def call():
+        return 1
+
+    call()
+    assert sample_count("test", "skipped") == 0
+
+
+def test_timed_observes_failing_calls():
+    configure_metrics(1.0)
+
+    @timed("test", "failing")
+    def call():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        call()
+    assert sample_count("test", "failing") == 1
+
+
+@pytest.mark.anyio
+async def test_instrumented_times_public_async_methods():
+    configure_metrics(1.0)
+
+    @instrumented("test")
+    class Service:
+        async def get_thing(self):
+            return 1
+
+        async def _helper(self):
+            return 2
+
+    assert await Service().get_thing() == 1
+    assert await Service()._helper() == 2
+    assert sample_count("test", "get_thing") == 1
+    assert sample_count("test", "_helper") == 0
+
+
+def test_request_duration_is_labelled_with_route_template():
+    client = TestClient(app=app)
+    with patch("app.services.cart_service.CartService.get_cart", return_value=None):
+        client.get("/cart/0d5d4c30-3b7a-4a4e-8d5c-7f6f1c6d2c11")
+
+    assert REGISTRY.get_sample_value(
+        "cart_request_duration_seconds_count",
+        {"method": "GET", "route": "/cart/{cart_id}", "status": "404"}
+    ) >= 1
+
+
+def test_collector_reports_cart_cache_stats():
+    cart_cache = CartCache()
+    CART_CACHE_COLLECTOR.track(cart_cache)
+    cart_cache.get("missing")
+
+    assert REGISTRY.get_sample_value("cart_cache_misses_total") == 1
+    assert REGISTRY.get_sample_value("cart_cache_size") == 0
+
+
+@pytest.mark.anyio
+async def test_age_collector_samples_one_batch_per_scrape_and_resumes_the_scan():
+    report = CartAgeReport(buckets=[CartAgeBucket(max_age=3600, count=4), CartAgeBucket(count=1)], without_expiry=2)
+    sample = AsyncMock(side_effect=[(17, report), (0, report), ConnectionError()])
+    collector = CartAgeCollector()
+    assert list(collector.collect()) == []
+
+    collector.track(sample, count=5)
+    await collector.refresh()
+    await collector.refresh()
+
+    assert [call.kwargs for call in sample.call_args_list] == [{"cursor": 0, "count": 5}, {"cursor": 17, "count": 5}]
+    idle, without_expiry = collector.collect()
+    assert [(sample.labels["max_age"], sample.value) for sample in idle.samples] == [("3600", 4), ("+Inf", 1)]
+    assert without_expiry.samples[0].value == 2
+
+    await collector.refresh()
+    assert list(collector.collect()) == []
@@ -0,0 +1,109 @@
+from unittest.mock import Mock
+
+from redis import BlockingConnectionPool, Redis
+from redis import asyncio as aioredis
+from redis.cluster import RedisCluster
+from redis.sentinel import SentinelConnectionPool
+
+from app.redis_clients import close_client, create_async_redis_client, create_redis_client, warm_up_client
+from app.settings import Settings
+
+
+def test_create_redis_client_builds_blocking_pool_from_settings():
+    settings = Settings(
+        redis_host="redis.internal",
+        redis_port=6380,
+        redis_db=2,
+        redis_max_connections=80,
+        redis_pool_timeout=1.5,
+        redis_socket_timeout=0.25,
+        redis_health_check_interval=10
+    )
+
+    client = create_redis_client(settings)
+
+    assert isinstance(client, Redis)
+    pool = client.connection_pool
+    assert isinstance(pool, BlockingConnectionPool)
+    assert pool.max_connections == 80
+    assert pool.timeout == 1.5
+    assert pool.connection_kwargs["host"] == "redis.internal"
+    assert pool.connection_kwargs["port"] == 6380
+    assert pool.connection_kwargs["db"] == 2
+    assert pool.connection_kwargs["socket_timeout"] == 0.25
+    assert pool.connection_kwargs["socket_keepalive"] is True
+    assert pool.connection_kwargs["health_check_interval"] == 10
+    assert pool.connection_kwargs["decode_responses"] is True
+
+
+def test_create_redis_client_returns_raw_bytes_for_msgpack_codec():
+    client = create_redis_client(Settings(storage_codec="msgpack"))
+
+    assert client.connection_pool.connection_kwargs["decode_responses"] is False
+
+
+def test_create_redis_client_builds_sentinel_master_client():
+    settings = Settings(
+        redis_mode="sentinel",
+        redis_sentinels=["s1:26379", "s2:26380"],
+        redis_sentinel_service_name="carts",
+        redis_max_connections=20
+    )
+
+    client = create_redis_client(settings)
+
+    pool = client.connection_pool
+    assert isinstance(pool, SentinelConnectionPool)
+    assert pool.service_name == "carts"
+    assert pool.max_connections == 20
+    assert [sentinel.connection_pool.connection_kwargs["host"] for sentinel in pool.sentinel_manager.sentinels] == [
+        "s1",
+        "s2"
+    ]
+
+
+def test_create_redis_client_does_not_connect_to_cluster_until_used(monkeypatch):
+    created = {}
+    monkeypatch.setattr(RedisCluster, "__init__", lambda self, **kwargs: created.update(kwargs))
+    settings = Settings(redis_mode="cluster", redis_cluster_nodes=["n1:7000", "n2:7001"], redis_max_connections=30)
+
+    create_redis_client(settings)
+
+    assert [(node.host, node.port) for node in created["startup_nodes"]] == [("n1", 7000), ("n2", 7001)]
+    assert created["max_connections"] == 30
+    assert created["decode_responses"] is True
+
+
+def test_create_async_redis_client_builds_blocking_pool_from_settings():
+    client = create_async_redis_client(Settings(redis_max_connections=64))
+
+    assert isinstance(client, aioredis.Redis)
+    assert isinstance(client.connection_pool, aioredis.BlockingConnectionPool)
+    assert client.connection_pool.max_connections == 64
+
+
+def test_warm_up_client_opens_pool_connections_before_first_use():
+    redis_client = Mock(spec=Redis, connection_pool=Mock())
+    connections = [Mock(), Mock()]
+    redis_client.connection_pool.get_connection.side_effect = connections
+
+    warm_up_client(redis_client, 2)
+
+    assert redis_client.connection_pool.get_connection.call_count == 2
+    assert [call.args[0] for call in redis_client.connection_pool.release.call_args_list] == connections
+
+
+def test_warm_up_client_pings_every_cluster_node():
+    redis_client = Mock(spec=RedisCluster)
+
+    warm_up_client(redis_client, 2)
+
+    redis_client.ping.assert_called_once_with(target_nodes=RedisCluster.ALL_NODES)
+
+
+def test_close_client_disconnects_pool():
+    redis_client = Mock(spec=Redis, connection_pool=Mock())
+
+    close_client(redis_client)
+
+    redis_client.connection_pool.disconnect.assert_called_once_with()
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from app.settings import Settings, load_settings
+
+
+def test_load_settings_returns_defaults():
+    assert load_settings({}) == Settings()
+
+
+def test_load_settings_reads_environment_variables():
+    settings = load_settings({
+        "CART_STORAGE_LAYOUT": "hash",
+        "CART_REDIS_MODE": "cluster",
+        "CART_REDIS_MAX_CONNECTIONS": "200",
+        "CART_REDIS_SOCKET_TIMEOUT": "0.5",
+        "CART_REDIS_SOCKET_KEEPALIVE": "false",
+        "CART_REDIS_CLUSTER_NODES": "10.0.0.1:7000,10.0.0.2:7000"
+    })
+
+    assert settings.storage_layout == "hash"
+    assert settings.redis_mode == "cluster"
+    assert settings.redis_max_connections == 200
+    assert settings.redis_socket_timeout == 0.5
+    assert settings.redis_socket_keepalive is False
+    assert settings.redis_cluster_nodes == ["10.0.0.1:7000", "10.0.0.2:7000"]
+
+
+def test_load_settings_layers_environment_over_config_file(tmp_path):
+    config_file = tmp_path / "cart.json"
+    config_file.write_text(json.dumps({"redis_host": "redis.internal", "redis_port": 6380}))
+
+    settings = load_settings({"CART_CONFIG_FILE": str(config_file), "CART_REDIS_PORT": "6381"})
+
+    assert settings.redis_host == "redis.internal"
+    assert settings.redis_port == 6381
+
+
+def test_load_settings_reads_toml_config_file(tmp_path):
+    config_file = tmp_path / "cart.toml"
+    config_file.write_text('io_mode = "async"\nredis_sentinels = ["s1:26379", "s2:26379"]\n')
+
+    settings = load_settings({"CART_CONFIG_FILE": str(config_file)})
+
+    assert settings.io_mode == "async"
+    assert settings.redis_sentinels == ["s1:26379", "s2:26379"]
+
+
+def test_load_settings_rejects_unknown_storage_layout():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_STORAGE_LAYOUT": "csv"})
+
+
+def test_load_settings_rejects_cart_cache_in_cluster_mode():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_CACHE_ENABLED": "true", "CART_REDIS_MODE": "cluster"})
+
+
+def test_load_settings_rejects_storage_codec_for_hash_layout():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_STORAGE_CODEC": "msgpack", "CART_STORAGE_LAYOUT": "hash"})
+
+
+def test_load_settings_rejects_cart_cache_with_sliding_expiry():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_CACHE_ENABLED": "true", "CART_CART_TTL": "3600", "CART_CART_TTL_SLIDING": "true"})
+
+
+def test_load_settings_rejects_overlapping_key_prefixes():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_KEY_PREFIX": "", "CART_JOB_KEY_PREFIX": "cart-job:"})
+
+
+def test_load_settings_rejects_events_key_inside_key_prefix():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_EVENTS_KEY": "cart:events"})
+
+
+def test_load_settings_rejects_cart_events_in_cluster_mode():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_EVENTS_ENABLED": "true", "CART_REDIS_MODE": "cluster"})
+
+
+def test_load_settings_rejects_redis_latency_limit_without_rate_limiting():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_ADMISSION_REDIS_LATENCY": "0.05"})
+
+
+def test_load_settings_rejects_local_storage_backends_in_async_mode_or_with_redis_features():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_STORAGE_BACKEND": "memory", "CART_IO_MODE": "async"})
+    with pytest.raises(ValidationError):
+        load_settings({"CART_STORAGE_BACKEND": "sqlite", "CART_EVENTS_ENABLED": "true"})
+
+    assert load_settings({"CART_STORAGE_BACKEND": "sqlite"}).sqlite_path == "carts.db"
+
+
+def test_load_settings_checks_sharded_mode():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_REDIS_MODE": "sharded"})
+    with pytest.raises(ValidationError):
+        load_settings({"CART_REDIS_MODE": "sharded", "CART_REDIS_SHARDS": "a:6379", "CART_IO_MODE": "async"})
+    with pytest.raises(ValidationError):
+        load_settings({"CART_REDIS_MODE": "sharded", "CART_REDIS_SHARDS": "a:6379", "CART_CACHE_ENABLED": "true"})
+
+    settings = load_settings({"CART_REDIS_MODE": "sharded", "CART_REDIS_SHARDS": "a:6379,b:6379"})
+    assert settings.redis_shards == ["a:6379", "b:6379"]
+
+
+def test_load_settings_rejects_add_item_coalesce_delay_above_one_second():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_ADD_ITEM_COALESCE_DELAY": "5"})
+
+
+def test_load_settings_rejects_metrics_sample_rate_outside_unit_interval():
+    with pytest.raises(ValidationError):
+        load_settings({"CART_METRICS_SAMPLE_RATE": "1.5"})
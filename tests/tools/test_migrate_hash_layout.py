@@ -0,0 +1,27 @@
+from unittest.mock import Mock
+
+from redis import ResponseError
+
+from app.repositories import hash_cart_scripts
+from app.tools.migrate_hash_layout import migrate
+
+
+def test_migrate_converts_string_keys():
+    mock_redis_client = Mock()
+    mock_redis_client.scan_iter.return_value = iter(["a", "b"])
+    migrate_cart = mock_redis_client.register_script.return_value
+    migrate_cart.return_value = 1
+
+    assert migrate(mock_redis_client, key_prefix="cart:", batch_size=10) == {"migrated": 2, "failed": 0}
+    mock_redis_client.register_script.assert_called_once_with(hash_cart_scripts.MIGRATE_CART)
+    mock_redis_client.scan_iter.assert_called_once_with(match="cart:*", count=10, _type="string")
+    migrate_cart.assert_any_call(keys=["a", "{a}:summary"])
+    migrate_cart.assert_any_call(keys=["b", "{b}:summary"])
+
+
+def test_migrate_counts_keys_that_are_not_carts():
+    mock_redis_client = Mock()
+    mock_redis_client.scan_iter.return_value = iter(["cart", "not-a-cart"])
+    mock_redis_client.register_script.return_value.side_effect = [1, ResponseError("invalid JSON")]
+
+    assert migrate(mock_redis_client) == {"migrated": 1, "failed": 1}
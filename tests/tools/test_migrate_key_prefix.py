@@ -0,0 +1,26 @@
+import uuid
+from unittest.mock import Mock
+
+from redis import ResponseError
+
+from app.tools.migrate_key_prefix import migrate
+
+
+def test_migrate_moves_bare_cart_ids_under_prefix():
+    cart_ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    mock_redis_client = Mock()
+    mock_redis_client.scan_iter.return_value = iter([cart_ids[0], f"cart:{cart_ids[1]}", "session:1", cart_ids[1]])
+    mock_redis_client.renamenx.side_effect = [True, False]
+
+    assert migrate(mock_redis_client, key_prefix="cart:", batch_size=10) == {"moved": 1, "skipped": 1, "failed": 0}
+    mock_redis_client.scan_iter.assert_called_once_with(count=10)
+    mock_redis_client.renamenx.assert_any_call(cart_ids[0], f"cart:{cart_ids[0]}")
+    assert mock_redis_client.renamenx.call_count == 2
+
+
+def test_migrate_counts_keys_that_cannot_be_renamed():
+    mock_redis_client = Mock()
+    mock_redis_client.scan_iter.return_value = iter([str(uuid.uuid4()).encode()])
+    mock_redis_client.renamenx.side_effect = ResponseError("CROSSSLOT")
+
+    assert migrate(mock_redis_client, key_prefix="cart:") == {"moved": 0, "skipped": 0, "failed": 1}
@@ -0,0 +1,46 @@
+import uuid
+from unittest.mock import Mock, call
+
+from redis import ResponseError
+
+from app.repositories.hash_ring import HashRing
+from app.tools.rebalance_shards import rebalance
+
+NODES = ["a:6379", "b:6380"]
+
+
+def cart_key_owned_by(ring: HashRing, node: str) -> str:
+    return next(f"cart:{cart_id}" for cart_id in iter(uuid.uuid4, None) if ring.node(str(cart_id)) == node)
+
+
+def test_rebalance_moves_carts_to_their_owner_in_batches():
+    ring = HashRing(NODES)
+    misplaced = [cart_key_owned_by(ring, "b:6380") for _ in range(3)]
+    kept = cart_key_owned_by(ring, "a:6379")
+    shard_clients = {node: Mock() for node in NODES}
+    shard_clients["a:6379"].scan_iter.return_value = iter([misplaced[0], kept.encode(), misplaced[1], misplaced[2]])
+    shard_clients["b:6380"].scan_iter.return_value = iter([])
+
+    actual = rebalance(shard_clients, ring, key_prefix="cart:", db=1, auth="secret", batch_size=2)
+
+    assert actual == {"moved": 3, "kept": 1, "conflicts": 0}
+    shard_clients["a:6379"].scan_iter.assert_called_once_with(match="cart:*", count=2)
+    assert shard_clients["a:6379"].migrate.call_args_list == [
+        call("b", 6380, misplaced[:2] + [f"{{{key}}}:summary" for key in misplaced[:2]], 1, 5000, auth="secret"),
+        call("b", 6380, [misplaced[2], f"{{{misplaced[2]}}}:summary"], 1, 5000, auth="secret")
+    ]
+
+
+def test_rebalance_retries_a_batch_key_by_key_and_counts_conflicts():
+    ring = HashRing(NODES)
+    misplaced = [cart_key_owned_by(ring, "b:6380") for _ in range(2)]
+    shard_clients = {node: Mock() for node in NODES}
+    shard_clients["a:6379"].scan_iter.return_value = iter(misplaced)
+    shard_clients["b:6380"].scan_iter.return_value = iter([])
+    busy = ResponseError("BUSYKEY Target key name already exists.")
+    shard_clients["a:6379"].migrate.side_effect = [busy, "NOKEY", busy]
+
+    actual = rebalance(shard_clients, ring, key_prefix="cart:")
+
+    assert actual == {"moved": 1, "kept": 0, "conflicts": 1}
+    assert shard_clients["a:6379"].migrate.call_count == 3
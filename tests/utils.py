@@ -23,7 +23,7 @@ def stubbed_item(
 ) -> Item:
     item_id = uuid.uuid4() if item_id is None else item_id
     item_name = random_string() if item_name is None else item_name
-    quantity = random_int() if quantity is None else quantity
+    quantity = random_int(low=1) if quantity is None else quantity
     return Item(item_id=item_id, item_name=item_name, quantity=quantity)
 
 